@@ -7,6 +7,7 @@ from starlette.datastructures import FormData
 from api.auth.schemas.inputs import UserLogin, Token, UserEmail, UserResetPassword
 from api.auth.schemas.outputs import TokensResponse
 from api.auth.services.auth_service import AuthService
+from api.dependencies import get_auth_service
 from api.users.schemas.outputs import UserResponse
 from core.auth import get_current_user
 from models.responde_model import ResponseModel
@@ -27,11 +28,11 @@ async def login(
         request: Request,
         response: Response,
         user_login: UserLogin,
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[TokensResponse]:
     api_response.logger.info("Received data to log")
-    auth_service = AuthService(request.app.database, api_response)
-    user_tokens = await auth_service.login(user_login)
+    user_tokens = await auth_service.login(user_login, request.client.host if request.client else None)
     api_response.logger.info(f"User successfully logged in: {user_login.username_or_email}")
     return user_tokens
 
@@ -46,10 +47,10 @@ async def refresh_token(
         request: Request,
         response: Response,
         refresh_token: Token,
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[TokensResponse]:
     api_response.logger.info("Received data to refresh token")
-    auth_service = AuthService(request.app.database, api_response)
     user_tokens = await auth_service.refresh_token(refresh_token.token)
     api_response.logger.info(f"Refresh token successfully refreshed: {user_tokens.refresh_token}")
     return user_tokens
@@ -65,11 +66,11 @@ async def logout(
         request: Request,
         response: Response,
         token_data: Annotated[TokenData, Depends(get_current_user)],
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info("Received data to logout")
-    auth_service = AuthService(request.app.database, api_response)
-    await auth_service.logout(token_data.id)
+    await auth_service.logout(token_data)
     api_response.logger.info(f"User successfully logged out: {token_data.id}")
     return
 
@@ -84,10 +85,10 @@ async def forgot_password(
         request: Request,
         response: Response,
         user_email: UserEmail,
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info("Received data to forgot password")
-    auth_service = AuthService(request.app.database, api_response)
     await auth_service.forgot_password(user_email.email)
     api_response.logger.info(f"Message successfully sent to: {user_email.email}")
     return
@@ -103,10 +104,10 @@ async def reset_password(
         request: Request,
         response: Response,
         user_password: UserResetPassword,
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to reset password")
-    auth_service = AuthService(request.app.database, api_response)
     updated_password = await auth_service.reset_password(user_password)
     api_response.logger.info(f"Password updated successfully")
     return updated_password
@@ -123,10 +124,11 @@ async def authenticate_user_token(
         request: Request,
         response: Response,
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+        auth_service: Annotated[AuthService, Depends(get_auth_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> dict:
     api_response.logger.info("Received data to authenticate")
-    auth_service = AuthService(request.app.database, api_response)
-    user_tokens = await auth_service.authenticate_user_token(form_data)
+    user_tokens = await auth_service.authenticate_user_token(form_data,
+                                                             request.client.host if request.client else None)
     api_response.logger.info(f"User successfully authenticated: {form_data.username}")
     return user_tokens.model_dump()
@@ -1,101 +1,154 @@
-from motor.motor_asyncio import AsyncIOMotorDatabase
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
 from pydantic import EmailStr
 
 from api.auth.schemas.inputs import UserLogin, UserResetPassword
 from api.auth.schemas.outputs import TokensResponse
 from api.users.schemas.outputs import UserResponse
-from core.errors import InvalidTokenError
+from core.dependencies import AppDependencies
+from core.errors import InvalidTokenError, InvalidCredentialsError, InvalidParameterError
+from core.rate_limiter import login_rate_limiter, normalize_account, locked_until
 from models.responde_model import LocationError
-from models.users import TokenData
+from models.users import TokenData, UserCredentials
+from repositories.login_attempts import LoginAttemptsRepository
+from repositories.revoked_tokens import RevokedTokensRepository
+from repositories.sessions import SessionsRepository
 from repositories.users import UsersRepository
 from schemas.api_response import ApiResponse
-from services.email_sending_service import EmailSendingService
 from utils.security import compare_password, hash_password, verified_user_confirmation
-from utils.tokens_jwt import create_token, TokenType, decode_token, create_random_token
+from utils.tokens_jwt import create_token, TokenType, decode_token, create_random_token, hash_token, \
+    REFRESH_TOKEN_EXPIRE_DAYS
 
 
 class AuthService:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
-        self.db = db
+    def __init__(self, dependencies: AppDependencies, api_response: ApiResponse):
         self.api_response = api_response
-        self.user_repository = UsersRepository(self.db, self.api_response)
-        self.send_email = EmailSendingService()
+        self.user_repository = UsersRepository(dependencies.collection(UsersRepository), self.api_response)
+        self.login_attempts_repository = LoginAttemptsRepository(dependencies.collection(LoginAttemptsRepository),
+                                                                 self.api_response)
+        self.sessions_repository = SessionsRepository(dependencies.collection(SessionsRepository), self.api_response)
+        self.revoked_tokens_repository = RevokedTokensRepository(dependencies.collection(RevokedTokensRepository),
+                                                                 self.api_response)
+        self.send_email = dependencies.email_sender
 
-    async def login(self, user_login: UserLogin) -> TokensResponse:
-        self.api_response.logger.info("Check if user or email exists")
-        await self.user_repository.confirm_if_username_or_email_exists(user_login.username_or_email)
-        self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_username_or_email(user_login.username_or_email)
-        self.api_response.logger.info("Compare passwords and user confirmation")
-        await compare_password(user_found.password, user_login.password)
-        await verified_user_confirmation(user_found.is_verified)
-        self.api_response.logger.info("Create tokens")
-        token_data = TokenData(**user_found.model_dump())
-        access_token = await create_token(data=token_data.model_dump(), token_type=TokenType.access_token)
-        refresh_token = await create_token(data=token_data.model_dump(), token_type=TokenType.refresh_token)
-        self.api_response.logger.info("Save refresh token")
-        user_found.refresh_token = refresh_token
-        await self.user_repository.patch(user_found.id, user_found)
+    async def _create_tokens(self, token_data: TokenData, family_id: str) -> TokensResponse:
+        access_token = await create_token(data={**token_data.model_dump(), "fid": family_id},
+                                          token_type=TokenType.access_token)
+        refresh_token = await create_token(data={**token_data.model_dump(), "fid": family_id},
+                                           token_type=TokenType.refresh_token)
         return TokensResponse(access_token=access_token, refresh_token=refresh_token)
 
+    async def _start_session(self, user_found: UserCredentials) -> TokensResponse:
+        self.api_response.logger.info("Create tokens")
+        family_id = str(uuid.uuid4())
+        tokens = await self._create_tokens(TokenData(**user_found.model_dump()), family_id)
+        self.api_response.logger.info("Save session")
+        await self.sessions_repository.create({
+            "user_id": user_found.id,
+            "family_id": family_id,
+            "token_hash": hash_token(tokens.refresh_token),
+            "expires_at": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        })
+        return tokens
+
+    async def _check_credentials(self, username_or_email: str, password: str,
+                                 client_ip: Optional[str]) -> UserCredentials:
+        self.api_response.logger.info("Check login rate limits")
+        account = normalize_account(username_or_email)
+        await login_rate_limiter.check(client_ip, account)
+        attempt = None
+        if await login_rate_limiter.has_failures(account):
+            attempt = await self.login_attempts_repository.get_attempt(account)
+        if attempt is not None:
+            login_rate_limiter.check_lockout(account, locked_until(attempt.failures, attempt.updated_at))
+        try:
+            self.api_response.logger.info("Get user credentials")
+            user_found = await self.user_repository.get_credentials(username_or_email)
+            self.api_response.logger.info("Compare passwords")
+            await compare_password(user_found.password, password)
+        except (InvalidCredentialsError, InvalidParameterError):
+            await login_rate_limiter.remember_failure(account)
+            account_locked_until = await self.login_attempts_repository.record_failure(account)
+            if account_locked_until is not None:
+                login_rate_limiter.remember_lockout(account, account_locked_until)
+            raise
+        # The hint goes first, a failure racing with the clear then leaves a hint rather than an unread record
+        await login_rate_limiter.forget(account)
+        if attempt is not None:
+            await self.login_attempts_repository.clear(account)
+        return user_found
+
+    async def login(self, user_login: UserLogin, client_ip: Optional[str] = None) -> TokensResponse:
+        user_found = await self._check_credentials(user_login.username_or_email, user_login.password, client_ip)
+        self.api_response.logger.info("Check user confirmation")
+        await verified_user_confirmation(user_found.is_verified)
+        return await self._start_session(user_found)
+
     async def refresh_token(self, refresh_token: str) -> TokensResponse:
         self.api_response.logger.info("Verify token")
         payload = await decode_token(token=refresh_token, token_type=TokenType.refresh_token)
-        self.api_response.logger.info("Get user with token information")
-        user_id = payload.get("id")
-        user_found = await self.user_repository.get_by_id(user_id)
-        self.api_response.logger.info("Compare tokens")
-        if user_found.refresh_token != refresh_token:
+        family_id = payload.get("fid")
+        if not family_id:
             raise InvalidTokenError(message="Invalid refresh token", location=LocationError.Body)
+        self.api_response.logger.info("Get user")
+        # Claims come from the current user document, a renamed or deleted user never gets the old ones back
+        user_found = await self.user_repository.get_by_id(payload["id"], raise_exception=False, use_cache=False)
+        if user_found is None:
+            await self.sessions_repository.revoke_family(family_id)
+            raise InvalidTokenError(message="Invalid refresh token", location=LocationError.Body)
+        self.api_response.logger.info("Check user confirmation")
+        await verified_user_confirmation(user_found.is_verified)
         self.api_response.logger.info("Create tokens")
-        token_data = TokenData(**user_found.model_dump())
-        access_token = await create_token(data=token_data.model_dump(), token_type=TokenType.access_token)
-        refresh_token = await create_token(data=token_data.model_dump(), token_type=TokenType.refresh_token)
-        self.api_response.logger.info("Save refresh token")
-        user_found.refresh_token = refresh_token
-        await self.user_repository.patch(user_found.id, user_found)
-        return TokensResponse(access_token=access_token, refresh_token=refresh_token)
+        tokens = await self._create_tokens(TokenData(**user_found.model_dump()), family_id)
+        self.api_response.logger.info("Rotate session")
+        expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        if not await self.sessions_repository.rotate(family_id, hash_token(refresh_token),
+                                                     hash_token(tokens.refresh_token), expires_at):
+            # A signed token that is no longer the current one was reused, the whole family is revoked
+            await self.sessions_repository.revoke_family(family_id)
+            raise InvalidTokenError(message="Invalid refresh token", location=LocationError.Body)
+        return tokens
 
-    async def logout(self, user_id: str) -> None:
-        self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_id(user_id)
+    async def logout(self, token_data: TokenData) -> None:
         self.api_response.logger.info("Delete or disable tokens")
-        user_found.refresh_token = None
-        await self.user_repository.patch(user_id, user_found)
+        if token_data.jti is None or token_data.fid is None:
+            # Token issued before sessions and jti existed, only a user wide revocation reaches it
+            await self.sessions_repository.revoke_user_sessions(token_data.id)
+            await self.revoked_tokens_repository.revoke_user_tokens([token_data.id])
+            return
+        await self.sessions_repository.revoke_family(token_data.fid)
+        await self.revoked_tokens_repository.revoke_token(token_data.jti, token_data.id)
 
     async def forgot_password(self, email: EmailStr) -> None:
-        self.api_response.logger.info("Check if email exists")
-        await self.user_repository.confirm_if_username_or_email_exists(email)
-        self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_username_or_email(email)
+        self.api_response.logger.info("Get user credentials")
+        user_found = await self.user_repository.get_credentials(email)
         self.api_response.logger.info("Save email token")
         token_for_email = create_random_token()
-        user_found.password_reset_token = token_for_email
-        await self.user_repository.patch(user_found.id, user_found)
+        await self.user_repository.patch(user_found.id, {"password_reset_token": token_for_email})
         self.api_response.logger.info("Sending email to user")
         await self.send_email.send_email_to_reset_password(user_found.id, email, token_for_email, user_found.full_name)
 
     async def reset_password(self, user_password: UserResetPassword) -> UserResponse:
         self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_id(user_password.user_id)
+        user_found = await self.user_repository.get_by_id(user_password.user_id, use_cache=False)
         self.api_response.logger.info("Compare tokens")
         if user_found.password_reset_token != user_password.password_reset_token:
             raise InvalidTokenError(message="Invalid password reset token", location=LocationError.Body)
         self.api_response.logger.info("Save new password and delete token")
-        user_found.password = await hash_password(user_password.new_password)
-        user_found.password_reset_token = None
-        updated_user = await self.user_repository.patch(user_found.id, user_found)
+        new_password = await hash_password(user_password.new_password)
+        updated_user = await self.user_repository.patch(user_found.id,
+                                                        {"password": new_password, "password_reset_token": None},
+                                                        expected_updated_at=user_found.updated_at)
+        self.api_response.logger.info("Revoke sessions and tokens")
+        await self.sessions_repository.revoke_user_sessions(user_found.id)
+        await self.revoked_tokens_repository.revoke_user_tokens([user_found.id])
         user = UserResponse(**updated_user.model_dump())
         return user
 
-    async def authenticate_user_token(self, form_data) -> TokensResponse:
-        self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_username_or_email(form_data.username)
-        self.api_response.logger.info("Compare passwords and user confirmation")
-        await compare_password(user_found.password, form_data.password)
+    async def authenticate_user_token(self, form_data, client_ip: Optional[str] = None) -> TokensResponse:
+        user_found = await self._check_credentials(form_data.username, form_data.password, client_ip)
+        self.api_response.logger.info("Check user confirmation")
         await verified_user_confirmation(user_found.is_verified)
-        self.api_response.logger.info("Create tokens")
-        token_data = TokenData(**user_found.model_dump())
-        access_token = await create_token(data=token_data.model_dump(), token_type=TokenType.access_token)
-        refresh_token = await create_token(data=token_data.model_dump(), token_type=TokenType.refresh_token)
-        return TokensResponse(access_token=access_token, refresh_token=refresh_token)
+        return await self._start_session(user_found)
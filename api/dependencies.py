@@ -0,0 +1,56 @@
+from typing import Annotated
+
+from fastapi import Request, Depends
+
+from api.auth.services.auth_service import AuthService
+from api.health.services.health_service import HealthService
+from api.users.services.users_service import UsersService
+from api.workspaces.services.workspaces_service import WorkspaceService
+from core.auth import get_current_user
+from models.users import TokenData
+from schemas.api_response import ApiResponse
+
+
+# Providers are async so FastAPI resolves them on the event loop instead of the threadpool
+async def get_auth_service(
+        request: Request,
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> AuthService:
+    return AuthService(request.app.dependencies, api_response)
+
+
+async def get_users_service(
+        request: Request,
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> UsersService:
+    return UsersService(request.app.dependencies, api_response)
+
+
+async def get_authenticated_users_service(
+        request: Request,
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> UsersService:
+    return UsersService(request.app.dependencies, api_response, token_data)
+
+
+async def get_workspace_service(
+        request: Request,
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> WorkspaceService:
+    return WorkspaceService(request.app.dependencies, api_response)
+
+
+async def get_authenticated_workspace_service(
+        request: Request,
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> WorkspaceService:
+    return WorkspaceService(request.app.dependencies, api_response, token_data)
+
+
+async def get_health_service(
+        request: Request,
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> HealthService:
+    return HealthService(request.app.dependencies, api_response)
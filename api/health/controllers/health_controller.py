@@ -0,0 +1,28 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Request, Response, Depends
+
+from api.dependencies import get_health_service
+from api.health.schemas.outputs import HealthResponse
+from api.health.services.health_service import HealthService
+from models.responde_model import ResponseModel
+from schemas.api_response import ApiResponse
+from utils.reponse_handler import response_handler
+
+health_router: APIRouter = APIRouter(prefix="/health")
+
+
+@health_router.get(
+    path="",
+    tags=["health"],
+    description="Database connectivity, connection pool and token cache statistics",
+)
+@response_handler()
+async def get_health(
+        request: Request,
+        response: Response,
+        health_service: Annotated[HealthService, Depends(get_health_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[HealthResponse]:
+    health = await health_service.get_health()
+    return health
@@ -0,0 +1,40 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class PoolStatsResponse(BaseModel):
+    open_connections: int
+    in_use: int
+    checkouts: int
+    checkout_failures: int
+    avg_checkout_wait_ms: float
+    max_checkout_wait_ms: float
+
+
+class TokenCacheStatsResponse(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+
+class TokenRevocationStatsResponse(BaseModel):
+    revoked_tokens: int
+    revoked_users: int
+    rejected: int
+    synced_at: Optional[float]
+
+
+class DocumentCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class HealthResponse(BaseModel):
+    database: str
+    pool: PoolStatsResponse
+    token_cache: TokenCacheStatsResponse
+    document_cache: Dict[str, DocumentCacheStatsResponse]
+    token_revocation: TokenRevocationStatsResponse
@@ -0,0 +1,26 @@
+from api.health.schemas.outputs import HealthResponse
+from core.database import pool_metrics
+from core.dependencies import AppDependencies
+from core.document_cache import document_cache
+from core.token_cache import verified_token_cache
+from core.token_revocation import token_revocation_list
+from models.responde_model import StatusRequest
+from schemas.api_response import ApiResponse
+
+
+class HealthService:
+    def __init__(self, dependencies: AppDependencies, api_response: ApiResponse):
+        self.dependencies = dependencies
+        self.api_response = api_response
+
+    async def get_health(self) -> HealthResponse:
+        self.api_response.logger.info("Ping database")
+        try:
+            await self.dependencies.db.command("ping")
+            database = "ok"
+        except Exception as error:
+            self.api_response.logger.error(error)
+            self.api_response.status = StatusRequest.SERVICE_UNAVAILABLE
+            database = "unavailable"
+        return HealthResponse(database=database, pool=pool_metrics.stats, token_cache=verified_token_cache.stats,
+                              document_cache=document_cache.stats, token_revocation=token_revocation_list.stats)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from core.config import settings
+from core.signing_keys import signing_keys
+
+jwks_router: APIRouter = APIRouter(prefix="/.well-known")
+
+
+@jwks_router.get(
+    path="/jwks.json",
+    tags=["auth"],
+    description="Public keys that verify access tokens, selected by the kid of the token header",
+)
+async def get_jwks() -> Response:
+    # Serialized once per key set reload, verifiers may cache it for a reload interval
+    return Response(signing_keys.jwks, media_type="application/json",
+                    headers={"Cache-Control": f"public, max-age={int(settings.JWT_KEYS_RELOAD_SECONDS)}"})
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import metrics_registry
+
+metrics_router: APIRouter = APIRouter(prefix="/metrics")
+
+
+@metrics_router.get(
+    path="",
+    tags=["metrics"],
+    description="Prometheus metrics of every worker",
+    response_class=PlainTextResponse,
+)
+async def get_metrics() -> PlainTextResponse:
+    content = await metrics_registry.scrape()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
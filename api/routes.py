@@ -1,5 +1,7 @@
 from api.auth.controllers.auth_controller import auth_router
+from api.health.controllers.health_controller import health_router
+from api.metrics.controllers.metrics_controller import metrics_router
 from api.users.controllers.users_controller import users_router
 from api.workspaces.controllers.workspaces_controller import workspaces_router
 
-routes = [users_router, auth_router, workspaces_router]
+routes = [users_router, auth_router, workspaces_router, health_router, metrics_router]
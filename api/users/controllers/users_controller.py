@@ -1,11 +1,17 @@
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 
-from fastapi import APIRouter, Request, Response, Depends
+from fastapi import APIRouter, Request, Response, Depends, Query, Body
+from fastapi.responses import StreamingResponse
 
-from api.users.schemas.inputs import UserCreation, UserUpdate, UserChangePassword
-from api.users.schemas.outputs import UserResponse
+from api.dependencies import get_authenticated_users_service, get_users_service, \
+    get_authenticated_workspace_service
+from api.users.schemas.inputs import UserCreation, UserUpdate, UserChangePassword, UserBulkUpdate, UserBulkDelete
+from api.users.schemas.outputs import UserResponse, UserSearchResponse
 from api.users.services.users_service import UsersService
+from api.workspaces.schemas.outputs import UserWorkspaceResponse
+from api.workspaces.services.workspaces_service import WorkspaceService
 from core.auth import get_current_user
+from core.config import settings
 from models.responde_model import ResponseModel
 from models.users import TokenData
 from schemas.api_response import ApiResponse
@@ -24,10 +30,10 @@ async def create_user(
         request: Request,
         response: Response,
         user_data: UserCreation,
+        user_service: Annotated[UsersService, Depends(get_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to create user")
-    user_service = UsersService(request.app.database, api_response)
     user = await user_service.create_user(user_data)
     api_response.logger.info(f"User created successfully: {user}")
     return user
@@ -44,10 +50,10 @@ async def verify_user(
         response: Response,
         _id: str,
         token: str,
+        user_service: Annotated[UsersService, Depends(get_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to verify user")
-    user_service = UsersService(request.app.database, api_response)
     user = await user_service.verify_user(_id, token)
     api_response.logger.info(f"User verified successfully: {user}")
     return user
@@ -64,10 +70,10 @@ async def get_user_by_id(
         response: Response,
         user_id: str,
         token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to get user")
-    user_service = UsersService(request.app.database, api_response, token_data)
     user = await user_service.get_user_by_id(user_id)
     api_response.logger.info(f"User found successfully: {user}")
     return user
@@ -83,15 +89,64 @@ async def get_all_users(
         request: Request,
         response: Response,
         token_data: Annotated[TokenData, Depends(get_current_user)],
-        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+        user_service: Annotated[UsersService, Depends(get_users_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None,
+        stream: bool = False
 ) -> ResponseModel[List[UserResponse]]:
     api_response.logger.info("Received data to get all users")
-    user_service = UsersService(request.app.database, api_response)
-    users = await user_service.get_all_users()
+    if stream:
+        return StreamingResponse(user_service.stream_all_users(after), media_type="application/x-ndjson")
+    users = await user_service.get_all_users(limit, after)
     api_response.logger.info(f"All users found successfully: {users}")
     return users
 
 
+@users_router.get(
+    path="/search",
+    tags=['users'],
+    description='Search users by the start of their username or full name, or anywhere in them with infix',
+)
+@response_handler()
+async def search_users(
+        request: Request,
+        response: Response,
+        q: Annotated[str, Query(min_length=1, max_length=100)],
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_users_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None,
+        infix: bool = False
+) -> ResponseModel[List[UserSearchResponse]]:
+    api_response.logger.info("Received data to search users")
+    users = await user_service.search_users(q, limit, after, infix)
+    api_response.logger.info(f"Users found successfully: {len(users)}")
+    return users
+
+
+@users_router.get(
+    path="/id={user_id}/workspaces",
+    tags=['users'],
+    description='Get the workspaces of a user',
+)
+@response_handler()
+async def get_user_workspaces(
+        request: Request,
+        response: Response,
+        user_id: str,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None
+) -> ResponseModel[List[UserWorkspaceResponse]]:
+    api_response.logger.info("Received data to get user workspaces")
+    workspaces = await workspace_service.get_user_workspaces(user_id, limit, after)
+    api_response.logger.info(f"User workspaces found successfully: {len(workspaces)}")
+    return workspaces
+
+
 @users_router.patch(
     path="/id={user_id}",
     tags=['users'],
@@ -104,10 +159,10 @@ async def update_user(
         user_id: str,
         user_data: UserUpdate,
         token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to update user")
-    user_service = UsersService(request.app.database, api_response, token_data)
     user = await user_service.update_user(user_id, user_data)
     api_response.logger.info(f"User updated successfully: {user}")
     return user
@@ -124,10 +179,10 @@ async def delete_user(
         response: Response,
         user_id: str,
         token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel:
     api_response.logger.info("Received data to delete user")
-    user_service = UsersService(request.app.database, api_response, token_data)
     await user_service.delete_user(user_id)
     api_response.logger.info(f"User deleted successfully: {user_id}")
     return
@@ -145,10 +200,69 @@ async def change_password(
         user_id: str,
         user_password: UserChangePassword,
         token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[UserResponse]:
     api_response.logger.info("Received data to change the user password")
-    user_service = UsersService(request.app.database, api_response, token_data)
     user = await user_service.change_password(user_id, user_password)
     api_response.logger.info(f"Password updated successfully: {user}")
     return user
+
+
+@users_router.post(
+    path="/bulk",
+    tags=['users'],
+    description='Create several users, items that fail are reported in errors with their index',
+)
+@response_handler()
+async def create_users(
+        request: Request,
+        response: Response,
+        users_data: Annotated[List[UserCreation], Body(min_length=1, max_length=settings.MAX_BULK_SIGNUP_SIZE)],
+        user_service: Annotated[UsersService, Depends(get_users_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[List[UserResponse]]:
+    api_response.logger.info("Received data to create users")
+    users = await user_service.create_users(users_data, request.client.host if request.client else None)
+    api_response.logger.info(f"{len(users)} users created successfully")
+    return users
+
+
+@users_router.patch(
+    path="/bulk",
+    tags=['users'],
+    description='Update several users, items that fail are reported in errors with their index',
+)
+@response_handler()
+async def update_users(
+        request: Request,
+        response: Response,
+        users_data: Annotated[List[UserBulkUpdate], Body(min_length=1, max_length=settings.MAX_BULK_SIZE)],
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[List[UserResponse]]:
+    api_response.logger.info("Received data to update users")
+    users = await user_service.update_users(users_data)
+    api_response.logger.info(f"{len(users)} users updated successfully")
+    return users
+
+
+@users_router.delete(
+    path="/bulk",
+    tags=['users'],
+    description='Delete several users, ids that fail are reported in errors with their index',
+)
+@response_handler()
+async def delete_users(
+        request: Request,
+        response: Response,
+        users_data: UserBulkDelete,
+        token_data: Annotated[TokenData, Depends(get_current_user)],
+        user_service: Annotated[UsersService, Depends(get_authenticated_users_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel:
+    api_response.logger.info("Received data to delete users")
+    await user_service.delete_users(users_data.ids)
+    api_response.logger.info("Users deleted")
+    return
@@ -1,8 +1,10 @@
 import re
+from typing import List
 
-from pydantic import BaseModel, EmailStr, model_validator
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing_extensions import Self
 
+from core.config import settings
 from core.errors import InvalidParameterError, InvalidCredentialsError
 from models.responde_model import LocationError
 
@@ -40,6 +42,14 @@ class UserUpdate(BaseModel):
     profile_picture: str | None = None
 
 
+class UserBulkUpdate(UserUpdate):
+    id: str
+
+
+class UserBulkDelete(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=settings.MAX_BULK_SIZE)
+
+
 class UserChangePassword(BaseModel):
     current_password: str
     new_password: str
@@ -1,8 +1,16 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, AliasChoices
 
 
 class UserResponse(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     username: str
     full_name: str
     email: EmailStr
     profile_picture: str
+
+
+class UserSearchResponse(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    username: str
+    full_name: str
+    profile_picture: str
@@ -1,27 +1,37 @@
-from typing import List, Optional
+from typing import List, Optional, AsyncIterator
 
-from motor.motor_asyncio import AsyncIOMotorDatabase
-
-from api.users.schemas.inputs import UserCreation, UserUpdate, UserChangePassword
-from api.users.schemas.outputs import UserResponse
+from api.users.schemas.inputs import UserCreation, UserUpdate, UserChangePassword, UserBulkUpdate
+from api.users.schemas.outputs import UserResponse, UserSearchResponse
 from core.auth import verify_active_user
-from core.errors import InvalidTokenError
+from core.dependencies import AppDependencies
+from core.errors import InvalidTokenError, NotAvailableError, UnauthorizedError, ServiceUnavailableError
+from core.rate_limiter import login_rate_limiter
 from models.responde_model import LocationError
 from models.users import TokenData
+from repositories.revoked_tokens import RevokedTokensRepository
+from repositories.sessions import SessionsRepository
 from repositories.users import UsersRepository
+from repositories.workspace_members import WorkspaceMembersRepository
+from repositories.workspaces import WorkspacesRepository
 from schemas.api_response import ApiResponse
-from services.email_sending_service import EmailSendingService
-from utils.security import hash_password, compare_password
+from utils.security import hash_password, compare_password, hash_passwords
 from utils.tokens_jwt import create_random_token
 
 
 class UsersService:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse, token_data: Optional[TokenData] = None):
-        self.db = db
+    def __init__(self, dependencies: AppDependencies, api_response: ApiResponse,
+                 token_data: Optional[TokenData] = None):
         self.api_response = api_response
         self.token_data = token_data
-        self.user_repository = UsersRepository(self.db, self.api_response)
-        self.send_email = EmailSendingService()
+        self.user_repository = UsersRepository(dependencies.collection(UsersRepository), self.api_response)
+        self.sessions_repository = SessionsRepository(dependencies.collection(SessionsRepository), self.api_response)
+        self.revoked_tokens_repository = RevokedTokensRepository(dependencies.collection(RevokedTokensRepository),
+                                                                 self.api_response)
+        self.members_repository = WorkspaceMembersRepository(dependencies.collection(WorkspaceMembersRepository),
+                                                             self.api_response)
+        self.workspace_repository = WorkspacesRepository(dependencies.collection(WorkspacesRepository),
+                                                         self.api_response)
+        self.send_email = dependencies.email_sender
 
     async def create_user(self, user_data: UserCreation) -> UserResponse:
         self.api_response.logger.info("Check if the user already exists")
@@ -41,14 +51,13 @@ class UsersService:
 
     async def verify_user(self, user_id: str, user_token: str) -> UserResponse:
         self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_id(user_id)
+        user_found = await self.user_repository.get_by_id(user_id, use_cache=False)
         self.api_response.logger.info("Compare tokens")
         if user_found.user_verify_token != user_token:
             raise InvalidTokenError(message="Invalid token", location=LocationError.Query)
         self.api_response.logger.info("Confirm verification and delete token")
-        user_found.user_verify_token = None
-        user_found.is_verified = True
-        verified_user = await self.user_repository.patch(user_id, user_found)
+        verified_user = await self.user_repository.patch(user_id, {"user_verify_token": None, "is_verified": True},
+                                                         expected_updated_at=user_found.updated_at)
         user = UserResponse(**verified_user.model_dump())
         return user
 
@@ -60,14 +69,22 @@ class UsersService:
         user = UserResponse(**user_found.model_dump())
         return user
 
-    async def get_all_users(self) -> List[UserResponse]:
+    async def get_all_users(self, limit: int, after: Optional[str] = None) -> List[UserResponse]:
         self.api_response.logger.info("Get all users")
-        users_found = await self.user_repository.get_all()
-        users = []
-        for user in users_found:
-            users.append(UserResponse(**user.model_dump()))
+        users = await self.user_repository.get_all(limit=limit, after=after, output_model=UserResponse)
         return users
 
+    async def search_users(self, query: str, limit: int, after: Optional[str] = None,
+                           infix: bool = False) -> List[UserSearchResponse]:
+        self.api_response.logger.info("Search users")
+        users = await self.user_repository.search(query, limit, UserSearchResponse, after, infix)
+        return users
+
+    async def stream_all_users(self, after: Optional[str] = None) -> AsyncIterator[bytes]:
+        self.api_response.logger.info("Stream all users")
+        async for user in self.user_repository.stream_all(UserResponse, after=after):
+            yield user.model_dump_json().encode() + b"\n"
+
     async def update_user(self, user_id: str, user_data: UserUpdate) -> UserResponse:
         self.api_response.logger.info("Verify authenticated user")
         await verify_active_user(user_id, self.token_data)
@@ -82,20 +99,120 @@ class UsersService:
     async def delete_user(self, user_id: str) -> None:
         self.api_response.logger.info("Verify authenticated user")
         await verify_active_user(user_id, self.token_data)
-        self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_id(user_id)
-        user_found.is_deleted = True
         self.api_response.logger.info("Delete user")
-        await self.user_repository.patch(user_id, user_found)
+        await self.user_repository.patch(user_id, {"is_deleted": True})
+        await self.sessions_repository.revoke_user_sessions(user_id)
+        await self.revoked_tokens_repository.revoke_user_tokens([user_id])
+        await self._remove_memberships([user_id])
+
+    async def _remove_memberships(self, user_ids: List[str]) -> None:
+        if not user_ids:
+            return
+        self.api_response.logger.info("Remove workspace memberships")
+        # Owned workspaces pass to another member, the ones nobody else is in are soft deleted like their owner
+        owned_ids = await self.members_repository.get_owned_workspaces(user_ids)
+        if owned_ids:
+            orphan_ids = await self.members_repository.transfer_ownership(owned_ids, user_ids)
+            if orphan_ids:
+                await self.workspace_repository.delete_many(orphan_ids, soft_delete=True)
+        await self.members_repository.remove_users_members(user_ids)
 
     async def change_password(self, user_id: str, user_password: UserChangePassword) -> UserResponse:
         self.api_response.logger.info("Verify authenticated user")
         await verify_active_user(user_id, self.token_data)
         self.api_response.logger.info("Get user")
-        user_found = await self.user_repository.get_by_id(user_id)
+        user_found = await self.user_repository.get_by_id(user_id, use_cache=False)
         self.api_response.logger.info("Received data to update user")
         await compare_password(user_found.password, user_password.current_password)
-        user_found.password = await hash_password(user_password.new_password)
-        updated_user = await self.user_repository.patch(user_id, user_found)
+        new_password = await hash_password(user_password.new_password)
+        updated_user = await self.user_repository.patch(user_id, {"password": new_password},
+                                                        expected_updated_at=user_found.updated_at)
+        self.api_response.logger.info("Revoke sessions and tokens")
+        await self.sessions_repository.revoke_user_sessions(user_id)
+        await self.revoked_tokens_repository.revoke_user_tokens([user_id])
         user = UserResponse(**updated_user.model_dump())
         return user
+
+    async def _available_users(self, users_data: List[UserCreation | UserUpdate], positions: List[int]) -> List[int]:
+        # One query for the whole batch, values repeated inside the batch are rejected after the first one
+        users = [users_data[index] for index in positions]
+        unavailable_usernames, unavailable_emails = await self.user_repository.unavailable_usernames_and_emails(
+            [user.username for user in users if user.username is not None],
+            [user.email for user in users if user.email is not None])
+        available = []
+        for index, user in zip(positions, users):
+            if user.username is not None and user.username in unavailable_usernames:
+                message = f"The user {user.username} is not available, it already exists"
+            elif user.email is not None and user.email in unavailable_emails:
+                message = f"The email {user.email} is not available, it already exists"
+            else:
+                if user.username is not None:
+                    unavailable_usernames.add(user.username)
+                if user.email is not None:
+                    unavailable_emails.add(user.email)
+                available.append(index)
+                continue
+            self.api_response.add_error(NotAvailableError(message=message, location=LocationError.Body), index)
+        return available
+
+    def _authorized(self, user_ids: List[str]) -> List[int]:
+        authorized = []
+        for index, user_id in enumerate(user_ids):
+            if user_id != self.token_data.id:
+                self.api_response.add_error(UnauthorizedError(
+                    message="Access denied: You are not allowed to access this resource",
+                    location=LocationError.Body), index)
+                continue
+            authorized.append(index)
+        return authorized
+
+    async def create_users(self, users_data: List[UserCreation], client_ip: Optional[str] = None) -> List[UserResponse]:
+        self.api_response.logger.info("Check bulk signup rate limits")
+        await login_rate_limiter.check_bulk_signup(client_ip)
+        self.api_response.logger.info("Check if the users already exist")
+        positions = await self._available_users(users_data, list(range(len(users_data))))
+        self.api_response.logger.info("Received data to create users")
+        passwords = await hash_passwords([users_data[index].password for index in positions])
+        users_add = []
+        for index, password in zip(positions, passwords):
+            user_add = users_data[index].model_dump()
+            user_add["password"] = password
+            user_add["user_verify_token"] = create_random_token()
+            users_add.append(user_add)
+        created_users, errors = await self.user_repository.create_many(users_add)
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        created_positions = [index for position, index in enumerate(positions) if position not in errors]
+        self.api_response.logger.info("Sending emails to users")
+        email_errors = await self.send_email.send_emails_to_verify_users(
+            (user.id, user.email, user.user_verify_token, user.full_name) for user in created_users)
+        for position, error in email_errors.items():
+            self.api_response.add_error(ServiceUnavailableError(
+                message=f"The user was created but the verification email was not sent: {error.message}",
+                location=error.location), created_positions[position])
+        return [UserResponse(**user.model_dump()) for user in created_users]
+
+    async def update_users(self, users_data: List[UserBulkUpdate]) -> List[UserResponse]:
+        self.api_response.logger.info("Verify authenticated user")
+        authorized = self._authorized([user.id for user in users_data])
+        self.api_response.logger.info("Check if data is available")
+        positions = await self._available_users(users_data, authorized)
+        self.api_response.logger.info("Received data to update users")
+        updated_users, errors = await self.user_repository.patch_many(
+            [(users_data[index].id, users_data[index].model_dump(exclude_unset=True, exclude={"id"}))
+             for index in positions])
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        return [UserResponse(**updated_users[position].model_dump()) for position in sorted(updated_users)]
+
+    async def delete_users(self, user_ids: List[str]) -> None:
+        self.api_response.logger.info("Verify authenticated user")
+        positions = self._authorized(user_ids)
+        self.api_response.logger.info("Delete users")
+        errors = await self.user_repository.delete_many([user_ids[index] for index in positions], soft_delete=True)
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        deleted_ids = [user_ids[index] for position, index in enumerate(positions) if position not in errors]
+        await self.sessions_repository.revoke_users_sessions(deleted_ids)
+        await self.revoked_tokens_repository.revoke_user_tokens(deleted_ids)
+        await self._remove_memberships(deleted_ids)
@@ -1,13 +1,16 @@
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
-from fastapi import Request, Response, Depends
+from fastapi import Request, Response, Depends, Query, Body
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 
-from api.workspaces.schemas.inputs import WorkspaceCreation, WorkspaceUpdate
-from api.workspaces.schemas.outputs import WorkspaceResponse
+from api.dependencies import get_workspace_service, get_authenticated_workspace_service
+from api.workspaces.schemas.inputs import WorkspaceCreation, WorkspaceUpdate, WorkspaceBulkUpdate, \
+    WorkspaceBulkDelete, WorkspaceMemberCreation
+from api.workspaces.schemas.outputs import WorkspaceResponse, WorkspaceMemberResponse
 from api.workspaces.services.workspaces_service import WorkspaceService
+from core.config import settings
 from models.responde_model import ResponseModel
-from schemas import api_response
 from schemas.api_response import ApiResponse
 from utils.reponse_handler import response_handler
 
@@ -17,17 +20,17 @@ workspaces_router: APIRouter = APIRouter(prefix="/workspaces")
 @workspaces_router.post(
     path="",
     tags=["workspaces"],
-    description="Create a new Workspace",
+    description="Create a new Workspace. Requires a bearer token, the caller becomes its owner",
 )
 @response_handler()
 async def create_workspace(
         request: Request,
         response: Response,
         workspace_data: WorkspaceCreation,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[WorkspaceResponse]:
     api_response.logger.info("Received data to create workspace")
-    workspace_service = WorkspaceService(request.app.database, api_response)
     workspace = await workspace_service.create_workspace(workspace_data)
     return workspace
 
@@ -42,10 +45,10 @@ async def get_workspace_by_id(
         request: Request,
         response: Response,
         workspace_id: str,
+        workspace_service: Annotated[WorkspaceService, Depends(get_workspace_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 ) -> ResponseModel[WorkspaceResponse]:
     api_response.logger.info("Received data to get workspace")
-    workspace_service = WorkspaceService(request.app.database, api_response)
     workspace = await workspace_service.get_workspace_by_id(workspace_id)
     return workspace
 
@@ -59,17 +62,43 @@ async def get_workspace_by_id(
 async def get_all_workspaces(
         request: Request,
         response: Response,
-        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+        workspace_service: Annotated[WorkspaceService, Depends(get_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None,
+        stream: bool = False
 ) -> ResponseModel[List[WorkspaceResponse]]:
     api_response.logger.info("Received data to get all workspaces")
-    workspace_service = WorkspaceService(request.app.database, api_response)
-    workspaces = await workspace_service.get_all_workspaces()
+    if stream:
+        return StreamingResponse(workspace_service.stream_all_workspaces(after), media_type="application/x-ndjson")
+    workspaces = await workspace_service.get_all_workspaces(limit, after)
+    return workspaces
+
+
+@workspaces_router.get(
+    path="/search",
+    tags=["workspaces"],
+    description="Search Workspaces by the start of their name, or anywhere in it with infix",
+)
+@response_handler()
+async def search_workspaces(
+        request: Request,
+        response: Response,
+        q: Annotated[str, Query(min_length=1, max_length=100)],
+        workspace_service: Annotated[WorkspaceService, Depends(get_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None,
+        infix: bool = False
+) -> ResponseModel[List[WorkspaceResponse]]:
+    api_response.logger.info("Received data to search workspaces")
+    workspaces = await workspace_service.search_workspaces(q, limit, after, infix)
     return workspaces
 
 @workspaces_router.patch(
     path="/id={workspace_id}",
     tags=["workspaces"],
-    description="Update a Workspace",
+    description="Update a Workspace. Requires a bearer token of its owner or an admin",
 )
 @response_handler()
 async def update_workspace(
@@ -77,25 +106,141 @@ async def update_workspace(
         response: Response,
         workspace_id: str,
         workspace_data:WorkspaceUpdate,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
         api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 )->ResponseModel[WorkspaceResponse]:
     api_response.logger.info("Received data to update workspace")
-    workspace_service = WorkspaceService(request.app.database, api_response)
     workspace = await workspace_service.update_workspace(workspace_id, workspace_data)
     return workspace
 
 @workspaces_router.delete(
     path="/id={workspace_id}",
     tags=["workspaces"],
-    description="Delete a Workspace",
+    description="Delete a Workspace. Requires a bearer token of its owner",
 )
 @response_handler()
 async def delete_workspace(
         request: Request,
         response: Response,
         workspace_id: str,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
 )->ResponseModel:
     api_response.logger.info("Received data to delete workspace")
-    workspace_service = WorkspaceService(request.app.database, api_response)
     await workspace_service.delete_workspace(workspace_id)
-    return
\ No newline at end of file
+    return
+
+
+@workspaces_router.post(
+    path="/bulk",
+    tags=["workspaces"],
+    description="Create several Workspaces, items that fail are reported in errors with their index. "
+                "Requires a bearer token, the caller becomes their owner",
+)
+@response_handler()
+async def create_workspaces(
+        request: Request,
+        response: Response,
+        workspaces_data: Annotated[List[WorkspaceCreation], Body(min_length=1, max_length=settings.MAX_BULK_SIZE)],
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[List[WorkspaceResponse]]:
+    api_response.logger.info("Received data to create workspaces")
+    workspaces = await workspace_service.create_workspaces(workspaces_data)
+    return workspaces
+
+
+@workspaces_router.patch(
+    path="/bulk",
+    tags=["workspaces"],
+    description="Update several Workspaces, items that fail are reported in errors with their index. "
+                "Requires a bearer token of their owner or an admin",
+)
+@response_handler()
+async def update_workspaces(
+        request: Request,
+        response: Response,
+        workspaces_data: Annotated[List[WorkspaceBulkUpdate], Body(min_length=1, max_length=settings.MAX_BULK_SIZE)],
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[List[WorkspaceResponse]]:
+    api_response.logger.info("Received data to update workspaces")
+    workspaces = await workspace_service.update_workspaces(workspaces_data)
+    return workspaces
+
+
+@workspaces_router.delete(
+    path="/bulk",
+    tags=["workspaces"],
+    description="Delete several Workspaces, ids that fail are reported in errors with their index. "
+                "Requires a bearer token of their owner",
+)
+@response_handler()
+async def delete_workspaces(
+        request: Request,
+        response: Response,
+        workspaces_data: WorkspaceBulkDelete,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel:
+    api_response.logger.info("Received data to delete workspaces")
+    await workspace_service.delete_workspaces(workspaces_data.ids)
+    return
+
+
+@workspaces_router.post(
+    path="/id={workspace_id}/members",
+    tags=["workspaces"],
+    description="Add a member to a Workspace",
+)
+@response_handler()
+async def add_workspace_member(
+        request: Request,
+        response: Response,
+        workspace_id: str,
+        member_data: WorkspaceMemberCreation,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel[WorkspaceMemberResponse]:
+    api_response.logger.info("Received data to add a workspace member")
+    member = await workspace_service.add_workspace_member(workspace_id, member_data)
+    return member
+
+
+@workspaces_router.get(
+    path="/id={workspace_id}/members",
+    tags=["workspaces"],
+    description="Get the members of a Workspace",
+)
+@response_handler()
+async def get_workspace_members(
+        request: Request,
+        response: Response,
+        workspace_id: str,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)],
+        limit: Annotated[int, Query(ge=1, le=settings.MAX_PAGE_SIZE)] = settings.PAGE_SIZE,
+        after: Optional[str] = None
+) -> ResponseModel[List[WorkspaceMemberResponse]]:
+    api_response.logger.info("Received data to get workspace members")
+    members = await workspace_service.get_workspace_members(workspace_id, limit, after)
+    return members
+
+
+@workspaces_router.delete(
+    path="/id={workspace_id}/members/id={user_id}",
+    tags=["workspaces"],
+    description="Remove a member from a Workspace",
+)
+@response_handler()
+async def remove_workspace_member(
+        request: Request,
+        response: Response,
+        workspace_id: str,
+        user_id: str,
+        workspace_service: Annotated[WorkspaceService, Depends(get_authenticated_workspace_service)],
+        api_response: Annotated[ApiResponse, Depends(ApiResponse)]
+) -> ResponseModel:
+    api_response.logger.info("Received data to remove a workspace member")
+    await workspace_service.remove_workspace_member(workspace_id, user_id)
+    return
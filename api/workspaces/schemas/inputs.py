@@ -1,6 +1,9 @@
-from typing import Optional
+from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from core.config import settings
+from models.workspace_members import WorkspaceRole
 
 
 class WorkspaceCreation(BaseModel):
@@ -13,3 +16,16 @@ class WorkspaceUpdate(BaseModel):
     workspace_name: Optional[str] = None
     description: Optional[str] = None
     workspace_image: Optional[str] = None
+
+
+class WorkspaceBulkUpdate(WorkspaceUpdate):
+    id: str
+
+
+class WorkspaceBulkDelete(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=settings.MAX_BULK_SIZE)
+
+
+class WorkspaceMemberCreation(BaseModel):
+    user_id: str
+    role: WorkspaceRole = WorkspaceRole.Member
@@ -1,7 +1,21 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field, AliasChoices
+
+from models.workspace_members import WorkspaceRole
 
 
 class WorkspaceResponse(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
     workspace_name: str
     workspace_image: str = "url"
 
+
+class UserWorkspaceResponse(WorkspaceResponse):
+    role: WorkspaceRole
+
+
+class WorkspaceMemberResponse(BaseModel):
+    user_id: str
+    role: WorkspaceRole
+    created_at: datetime
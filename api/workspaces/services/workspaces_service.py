@@ -1,24 +1,45 @@
-from typing import List
+from typing import List, Optional, AsyncIterator, Iterable
 
-from motor.motor_asyncio import AsyncIOMotorDatabase
-
-from api.workspaces.schemas.inputs import WorkspaceCreation, WorkspaceUpdate
-from api.workspaces.schemas.outputs import WorkspaceResponse
+from api.workspaces.schemas.inputs import WorkspaceCreation, WorkspaceUpdate, WorkspaceBulkUpdate, \
+    WorkspaceMemberCreation
+from api.workspaces.schemas.outputs import WorkspaceResponse, UserWorkspaceResponse, WorkspaceMemberResponse
+from core.auth import verify_active_user
+from core.dependencies import AppDependencies
+from core.errors import NotAvailableError, ForbiddenError
+from models.responde_model import LocationError
+from models.users import TokenData
+from models.workspace_members import WorkspaceRole
+from repositories.users import UsersRepository
+from repositories.workspace_members import WorkspaceMembersRepository
 from repositories.workspaces import WorkspacesRepository
 from schemas.api_response import ApiResponse
 
+MANAGER_ROLES = (WorkspaceRole.Owner, WorkspaceRole.Admin)
+
 
 class WorkspaceService:
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
-        self.db = db
+    def __init__(self, dependencies: AppDependencies, api_response: ApiResponse,
+                 token_data: Optional[TokenData] = None):
         self.api_response = api_response
-        self.workspace_repository = WorkspacesRepository(self.db, self.api_response)
+        self.token_data = token_data
+        self.workspace_repository = WorkspacesRepository(dependencies.collection(WorkspacesRepository),
+                                                         self.api_response)
+        self.members_repository = WorkspaceMembersRepository(dependencies.collection(WorkspaceMembersRepository),
+                                                             self.api_response)
+        self.user_repository = UsersRepository(dependencies.collection(UsersRepository), self.api_response)
 
     async def create_workspace(self, workspace_data: WorkspaceCreation) -> WorkspaceResponse:
         self.api_response.logger.info("Check if the workspace already exists")
         await self.workspace_repository.workspace_available(workspace_data.workspace_name)
         self.api_response.logger.info('Creating workspace')
         created_workspace = await self.workspace_repository.create(workspace_data.model_dump())
+        self.api_response.logger.info("Adding the creator as owner")
+        try:
+            await self.members_repository.add_member(created_workspace.id, self.token_data.id, WorkspaceRole.Owner)
+        except Exception:
+            # A workspace without owner could never be managed, undo the creation
+            await self.workspace_repository.delete(created_workspace.id)
+            raise
         workspace = WorkspaceResponse(**created_workspace.model_dump())
         return workspace
 
@@ -28,15 +49,26 @@ class WorkspaceService:
         workspace = WorkspaceResponse(**found_workspace.model_dump())
         return workspace
 
-    async def get_all_workspaces(self) -> List[WorkspaceResponse]:
+    async def get_all_workspaces(self, limit: int, after: Optional[str] = None) -> List[WorkspaceResponse]:
         self.api_response.logger.info("Get all workspaces")
-        found_workspaces = await self.workspace_repository.get_all()
-        workspaces = []
-        for workspace in found_workspaces:
-            workspaces.append(WorkspaceResponse(**workspace.model_dump()))
+        workspaces = await self.workspace_repository.get_all(limit=limit, after=after,
+                                                             output_model=WorkspaceResponse)
+        return workspaces
+
+    async def search_workspaces(self, query: str, limit: int, after: Optional[str] = None,
+                                infix: bool = False) -> List[WorkspaceResponse]:
+        self.api_response.logger.info("Search workspaces")
+        workspaces = await self.workspace_repository.search(query, limit, WorkspaceResponse, after, infix)
         return workspaces
 
+    async def stream_all_workspaces(self, after: Optional[str] = None) -> AsyncIterator[bytes]:
+        self.api_response.logger.info("Stream all workspaces")
+        async for workspace in self.workspace_repository.stream_all(WorkspaceResponse, after=after):
+            yield workspace.model_dump_json().encode() + b"\n"
+
     async def update_workspace(self, workspace_id: str, workspace_data: WorkspaceUpdate) -> WorkspaceResponse:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        await self.members_repository.check_role(workspace_id, self.token_data.id, MANAGER_ROLES)
         self.api_response.logger.info("Check if data is available")
         await self.workspace_repository.workspace_available(workspace_data.workspace_name)
         self.api_response.logger.info("Received data to update workspace")
@@ -45,5 +77,133 @@ class WorkspaceService:
         return workspace
 
     async def delete_workspace(self, workspace_id: str) -> None:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        await self.members_repository.check_role(workspace_id, self.token_data.id, (WorkspaceRole.Owner,))
         self.api_response.logger.info("Delete workspace")
         await self.workspace_repository.delete(workspace_id)
+        await self.members_repository.remove_workspaces_members([workspace_id])
+
+    async def _allowed(self, workspace_ids: List[str], roles: Iterable[WorkspaceRole]) -> List[int]:
+        user_roles = await self.members_repository.get_roles(workspace_ids, self.token_data.id)
+        allowed = []
+        for index, workspace_id in enumerate(workspace_ids):
+            if user_roles.get(workspace_id) not in roles:
+                self.api_response.add_error(ForbiddenError(
+                    message=f"Access denied: Your role does not allow this action on the workspace {workspace_id}",
+                    location=LocationError.Body), index)
+                continue
+            allowed.append(index)
+        return allowed
+
+    async def _available_names(self, workspace_names: List[Optional[str]]) -> List[int]:
+        # One $in query for the whole batch, names repeated inside the batch are rejected after the first one
+        unavailable = await self.workspace_repository.unavailable_workspace_names(
+            [workspace_name for workspace_name in workspace_names if workspace_name is not None])
+        available = []
+        for index, workspace_name in enumerate(workspace_names):
+            if workspace_name is not None and workspace_name in unavailable:
+                self.api_response.add_error(NotAvailableError(
+                    message=f"The workspace {workspace_name} is not available, it already exists",
+                    location=LocationError.Body), index)
+                continue
+            if workspace_name is not None:
+                unavailable.add(workspace_name)
+            available.append(index)
+        return available
+
+    async def create_workspaces(self, workspaces_data: List[WorkspaceCreation]) -> List[WorkspaceResponse]:
+        self.api_response.logger.info("Check if the workspaces already exist")
+        positions = await self._available_names([workspace.workspace_name for workspace in workspaces_data])
+        self.api_response.logger.info("Creating workspaces")
+        created_workspaces, errors = await self.workspace_repository.create_many(
+            [workspaces_data[index].model_dump() for index in positions])
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        if not created_workspaces:
+            return []
+        created_positions = [index for position, index in enumerate(positions) if position not in errors]
+        self.api_response.logger.info("Adding the creator as owner")
+        try:
+            _, member_errors = await self.members_repository.create_many(
+                [{"workspace_id": workspace.id, "user_id": self.token_data.id, "role": WorkspaceRole.Owner}
+                 for workspace in created_workspaces])
+        except Exception:
+            await self.workspace_repository.delete_many([workspace.id for workspace in created_workspaces])
+            raise
+        if member_errors:
+            # Workspaces left without owner are undone and reported like any other failed item
+            await self.workspace_repository.delete_many(
+                [created_workspaces[position].id for position in member_errors])
+            for position, error in member_errors.items():
+                self.api_response.add_error(error, created_positions[position])
+        return [WorkspaceResponse(**workspace.model_dump())
+                for position, workspace in enumerate(created_workspaces) if position not in member_errors]
+
+    async def update_workspaces(self, workspaces_data: List[WorkspaceBulkUpdate]) -> List[WorkspaceResponse]:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        allowed = set(await self._allowed([workspace.id for workspace in workspaces_data], MANAGER_ROLES))
+        self.api_response.logger.info("Check if data is available")
+        positions = [index for index in await self._available_names(
+            [workspace.workspace_name if index in allowed else None for index, workspace in enumerate(workspaces_data)])
+            if index in allowed]
+        self.api_response.logger.info("Updating workspaces")
+        updated_workspaces, errors = await self.workspace_repository.patch_many(
+            [(workspaces_data[index].id, workspaces_data[index].model_dump(exclude_unset=True, exclude={"id"}))
+             for index in positions])
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        return [WorkspaceResponse(**updated_workspaces[position].model_dump())
+                for position in sorted(updated_workspaces)]
+
+    async def delete_workspaces(self, workspace_ids: List[str]) -> None:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        positions = await self._allowed(workspace_ids, (WorkspaceRole.Owner,))
+        self.api_response.logger.info("Delete workspaces")
+        errors = await self.workspace_repository.delete_many([workspace_ids[index] for index in positions])
+        for position, error in errors.items():
+            self.api_response.add_error(error, positions[position])
+        deleted_ids = [workspace_ids[index] for position, index in enumerate(positions) if position not in errors]
+        if deleted_ids:
+            await self.members_repository.remove_workspaces_members(deleted_ids)
+
+    async def add_workspace_member(self, workspace_id: str,
+                                   member_data: WorkspaceMemberCreation) -> WorkspaceMemberResponse:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        await self.members_repository.check_role(workspace_id, self.token_data.id, MANAGER_ROLES)
+        if member_data.role == WorkspaceRole.Owner:
+            raise ForbiddenError(message="A workspace has a single owner", location=LocationError.Body)
+        self.api_response.logger.info("Check that the user exists")
+        await self.user_repository.get_by_id(member_data.user_id)
+        self.api_response.logger.info("Add member")
+        membership = await self.members_repository.add_member(workspace_id, member_data.user_id, member_data.role)
+        return WorkspaceMemberResponse(**membership.model_dump())
+
+    async def get_workspace_members(self, workspace_id: str, limit: int,
+                                    after: Optional[str] = None) -> List[WorkspaceMemberResponse]:
+        self.api_response.logger.info("Check the authenticated user is a member")
+        await self.members_repository.check_role(workspace_id, self.token_data.id, tuple(WorkspaceRole))
+        self.api_response.logger.info("Get workspace members")
+        memberships = await self.members_repository.get_workspace_members(workspace_id, limit, after)
+        return [WorkspaceMemberResponse(**membership.model_dump()) for membership in memberships]
+
+    async def remove_workspace_member(self, workspace_id: str, user_id: str) -> None:
+        self.api_response.logger.info("Check the role of the authenticated user")
+        if user_id != self.token_data.id:
+            await self.members_repository.check_role(workspace_id, self.token_data.id, MANAGER_ROLES)
+        membership = await self.members_repository.get_membership(workspace_id, user_id)
+        if membership.role == WorkspaceRole.Owner:
+            raise ForbiddenError(message="The owner can not be removed from the workspace",
+                                 location=LocationError.Path)
+        self.api_response.logger.info("Remove member")
+        await self.members_repository.remove_member(workspace_id, user_id)
+
+    async def get_user_workspaces(self, user_id: str, limit: int,
+                                  after: Optional[str] = None) -> List[UserWorkspaceResponse]:
+        self.api_response.logger.info("Verify authenticated user")
+        await verify_active_user(user_id, self.token_data)
+        self.api_response.logger.info("Get user workspaces")
+        memberships = await self.members_repository.get_user_workspaces(user_id, limit, after)
+        workspaces = await self.workspace_repository.get_many(
+            [membership.workspace_id for membership in memberships], WorkspaceResponse)
+        return [UserWorkspaceResponse(**workspaces[membership.workspace_id].model_dump(), role=membership.role)
+                for membership in memberships if membership.workspace_id in workspaces]
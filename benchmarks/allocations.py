@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import functools
+import gc
+import os
+import sys
+import tracemalloc
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, add_report_arguments, configure_environment, booted_app, \
+    compare, git_commit, report_results  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure the memory each endpoint allocates per request")
+    parser.add_argument("--requests", type=int, default=50, help="Requests sent per scenario, one at a time")
+    parser.add_argument("--warm-up", type=int, default=10, help="Untraced requests sent first, fill caches and pools")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenarios, can be repeated")
+    parser.add_argument("--top", type=int, default=5, help="Allocation sites listed for retained memory")
+    add_environment_arguments(parser)
+    add_report_arguments(parser, "Allowed increase of the mean peak in percent before the comparison fails")
+    return parser.parse_args()
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, MEMBERSHIPS_PER_USER, SCENARIOS
+    from core.config import settings
+
+    scenarios = [scenario for scenario in SCENARIOS if not arguments.scenario or scenario.name in arguments.scenario]
+    count = arguments.warm_up + arguments.requests
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(count, max(count, MEMBERSHIPS_PER_USER + 1))
+            tracemalloc.start()
+            try:
+                for scenario in scenarios:
+                    if scenario.setup is not None:
+                        await scenario.setup(ctx, count)
+                    for index in range(arguments.warm_up):
+                        await scenario.request(ctx, index)
+                    gc.collect()
+                    before = tracemalloc.take_snapshot()
+                    peaks: List[int] = []
+                    errors = 0
+                    for index in range(arguments.warm_up, count):
+                        current, _ = tracemalloc.get_traced_memory()
+                        tracemalloc.reset_peak()
+                        response = await scenario.request(ctx, index)
+                        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+                        errors += not 200 <= response.status_code < 300
+                    gc.collect()
+                    # Kept after the requests, caches filling up show here as well as real leaks
+                    retained = tracemalloc.take_snapshot().compare_to(before, "lineno")
+                    results[scenario.name] = {
+                        "errors": errors,
+                        "mean_peak_kib": round(sum(peaks) / len(peaks) / 1024, 1),
+                        "max_peak_kib": round(max(peaks) / 1024, 1),
+                        "retained_bytes_per_request": round(
+                            sum(stat.size_diff for stat in retained) / arguments.requests),
+                        "retained_sites": [
+                            {"site": str(stat.traceback[0]), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                            for stat in retained[:arguments.top] if stat.size_diff > 0],
+                    }
+                    print(f"{scenario.name}: peak {results[scenario.name]['mean_peak_kib']} KiB, retained "
+                          f"{results[scenario.name]['retained_bytes_per_request']} B/request", file=sys.stderr)
+            finally:
+                tracemalloc.stop()
+
+    return {"commit": git_commit(), "config": vars(arguments), "results": results}
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    report_results(arguments, asyncio.run(run(arguments)), functools.partial(compare, metric="mean_peak_kib"))
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, add_report_arguments, configure_environment, booted_app, \
+    compare, git_commit, percentile, report_results  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure the throughput of rejected GET /users/id= requests")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests sent per case")
+    parser.add_argument("--concurrency", type=int, default=20)
+    add_environment_arguments(parser)
+    add_report_arguments(parser, "Allowed throughput drop in percent before the comparison fails")
+    return parser.parse_args()
+
+
+def cases(ctx) -> dict:
+    valid = ctx.user(0)["access_token"]
+    header, payload, signature = valid.split(".")
+    return {
+        "missing_token": {},
+        "malformed_token": {"Authorization": "Bearer not-a-jwt"},
+        # Well formed, so the signature is checked before the request is rejected
+        "bad_signature": {"Authorization": f"Bearer {header}.{payload}.{signature[::-1]}"},
+    }
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext
+    from core.config import settings
+
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(1, 0)
+            url = f"{ctx.api}/users/id={ctx.user(0)['id']}"
+            for name, headers in cases(ctx).items():
+                semaphore = asyncio.Semaphore(arguments.concurrency)
+                latencies: List[float] = []
+                statuses: dict = {}
+
+                async def send() -> None:
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.get(url, headers=headers)
+                        latencies.append(time.perf_counter() - start)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+                start = time.perf_counter()
+                await asyncio.gather(*(send() for _ in range(arguments.requests)))
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    "requests": arguments.requests,
+                    "statuses": statuses,
+                    "throughput": round(arguments.requests / elapsed, 2),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                }
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {"commit": git_commit(), "config": vars(arguments), "results": results}
+
+
+def compare_rejections(current: dict, baseline: dict, max_regression: float) -> List[str]:
+    # Missing tokens are 401, tokens that fail to decode are InvalidTokenError's 400
+    regressions = [f"{name}: expected only rejections, got {result['statuses']}"
+                   for name, result in current["results"].items()
+                   if any(not 400 <= int(status) < 500 for status in result["statuses"])]
+    return regressions + compare(current, baseline, max_regression, "throughput", higher_is_better=True)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    report_results(arguments, asyncio.run(run(arguments)), compare_rejections)
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel, ConfigDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.base_model import BaseModelDB  # noqa: E402
+from repositories.base_repository import BaseRepository  # noqa: E402
+
+
+class Priority(Enum):
+    LOW = "low"
+    HIGH = "high"
+
+
+class Leaf(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    name: str
+    priority: Priority
+    tags: List[str]
+
+
+class Branch(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    name: str
+    priority: Priority
+    leaves: List[Leaf]
+    branches: List["Branch"] = []
+
+
+class NestedDocument(BaseModelDB):
+    _collection_name = "benchmark_nested"
+    priority: Priority
+    branches: List[Branch]
+
+
+def build_branch(depth: int, width: int) -> dict:
+    return {
+        "name": f"branch_{depth}",
+        "priority": Priority.HIGH,
+        "leaves": [{"name": f"leaf_{i}", "priority": Priority.LOW, "tags": ["a", "b", "c"]} for i in range(width)],
+        "branches": [build_branch(depth - 1, width) for _ in range(2)] if depth > 1 else [],
+    }
+
+
+def legacy_document(instance: BaseModelDB) -> dict:
+    # The previous create path: plain dump, recursive enum pass and id rename
+    document = BaseRepository.convert_enum_values(instance.model_dump())
+    document["_id"] = document.pop("id")
+    return document
+
+
+def measure(label: str, serialize, instances: List[BaseModelDB]) -> dict:
+    start = time.perf_counter()
+    documents = [serialize(instance) for instance in instances]
+    elapsed = time.perf_counter() - start
+    return {"serializer": label, "documents": len(documents), "seconds": round(elapsed, 4),
+            "documents_per_second": round(len(documents) / elapsed, 1)}
+
+
+async def measure_insert(label: str, serialize, instances: List[BaseModelDB]) -> dict:
+    from mongomock_motor import AsyncMongoMockClient
+
+    collection = AsyncMongoMockClient()["benchmark"][f"nested_{label}"]
+    start = time.perf_counter()
+    await collection.insert_many([serialize(instance) for instance in instances], ordered=False)
+    elapsed = time.perf_counter() - start
+    return {"serializer": label, "documents": len(instances), "seconds": round(elapsed, 4),
+            "inserts_per_second": round(len(instances) / elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare document serialization for inserts of deeply nested models")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=4, help="Levels of nested branches per document")
+    parser.add_argument("--width", type=int, default=5, help="Leaves per branch")
+    parser.add_argument("--insert", action="store_true", help="Also insert the documents into mongomock-motor")
+    arguments = parser.parse_args()
+
+    # The legacy pass rebuilds every nested dict and list even when there is no Enum left to unwrap
+    raw_document = {"priority": Priority.HIGH, "branches": [build_branch(arguments.depth, arguments.width)]}
+    instances = [NestedDocument.model_validate(raw_document) for _ in range(arguments.documents)]
+    report = {"config": vars(arguments), "serialization": [
+        measure("legacy", legacy_document, instances),
+        measure("model_dump", BaseRepository.to_document, instances),
+    ]}
+    if arguments.insert:
+        report["insert"] = [asyncio.run(measure_insert("legacy", legacy_document, instances)),
+                            asyncio.run(measure_insert("model_dump", BaseRepository.to_document, instances))]
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, percentile  # noqa: E402
+
+CLAIMS = {"id": "5f0c6c9e-2a57-4a8e-9a51-1f2d9c1b7e11", "username": "bench", "full_name": "Bench",
+          "email": "bench@example.com", "jti": "0" * 32, "iat": 1700000000.0, "exp": 4102444800}
+
+
+def timed(operation, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    return {"per_second": round(iterations / sum(latencies), 1),
+            "p50_us": round(percentile(latencies, 0.50) * 1e6, 2),
+            "p99_us": round(percentile(latencies, 0.99) * 1e6, 2)}
+
+
+def measure_jose(algorithm: str, iterations: int) -> dict:
+    from jose import jwk, jwt
+
+    from core.signing_keys import generate_private_key
+
+    if algorithm == "HS256":
+        material = private_material = "benchmark-secret"
+    else:
+        private_material = generate_private_key(algorithm)
+        material = jwk.construct(private_material, algorithm).public_key().to_pem()
+    private_key = jwk.construct(private_material, algorithm)
+    public_key = private_key.public_key() if algorithm != "HS256" else private_key
+    token = jwt.encode(CLAIMS, private_key, algorithm=algorithm, headers={"kid": "bench"})
+    return {
+        "algorithm": algorithm,
+        "token_bytes": len(token),
+        "sign": timed(lambda: jwt.encode(CLAIMS, private_key, algorithm=algorithm, headers={"kid": "bench"}),
+                      iterations),
+        "verify": timed(lambda: jwt.decode(token, public_key, algorithms=[algorithm]), iterations),
+        # What every request paid without the per kid cache: the key is parsed again before verifying
+        "verify_unprepared": timed(lambda: jwt.decode(token, material, algorithms=[algorithm]), iterations),
+    }
+
+
+def measure_ed25519(iterations: int) -> dict:
+    # python-jose has no EdDSA, the bare primitive shows what switching libraries would buy
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    private_key = Ed25519PrivateKey.generate()
+    public_key = private_key.public_key()
+    message = json.dumps(CLAIMS).encode()
+    signature = private_key.sign(message)
+    return {
+        "algorithm": "EdDSA (primitive only)",
+        "sign": timed(lambda: private_key.sign(message), iterations),
+        "verify": timed(lambda: public_key.verify(signature, message), iterations),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare access token sign and verify costs across algorithms")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--algorithm", action="append", choices=("HS256", "ES256", "ES384", "RS256"),
+                        help="Algorithms to measure, can be repeated")
+    add_environment_arguments(parser)
+    arguments = parser.parse_args()
+    configure_environment(arguments)
+    results = [measure_jose(algorithm, arguments.iterations)
+               for algorithm in arguments.algorithm or ("HS256", "ES256", "ES384", "RS256")]
+    results.append(measure_ed25519(arguments.iterations))
+    print(json.dumps({"config": vars(arguments), "results": results}, indent=2))
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure GET /users throughput by page size")
+    parser.add_argument("--users", type=int, default=10000, help="Users seeded before the run")
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds spent on each page size")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stream", action="store_true", help="Also measure GET /users?stream=true")
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext
+    from core.config import settings
+
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(arguments.users, 0)
+            if arguments.mongo == "mock":
+                # mongomock scans and sorts the whole collection in Python for every page
+                print("warning: mongomock dominates these timings, use --mongo real to compare page sizes",
+                      file=sys.stderr)
+
+            async def measure(params: dict) -> dict:
+                latencies: List[float] = []
+                rows = 0
+                size = 0
+                errors = 0
+                deadline = time.perf_counter() + arguments.duration
+
+                async def worker(index: int) -> None:
+                    nonlocal rows, size, errors
+                    while time.perf_counter() < deadline:
+                        start = time.perf_counter()
+                        response = await client.get(f"{ctx.api}/users", headers=ctx.auth(index), params=params)
+                        latencies.append(time.perf_counter() - start)
+                        if response.status_code != 200:
+                            errors += 1
+                            continue
+                        size += len(response.content)
+                        if params.get("stream"):
+                            rows += response.content.count(b"\n")
+                        else:
+                            rows += len(response.json()["data"])
+
+                start = time.perf_counter()
+                await asyncio.gather(*(worker(index) for index in range(arguments.concurrency)))
+                elapsed = time.perf_counter() - start
+                return {
+                    "requests": len(latencies),
+                    "errors": errors,
+                    "requests_per_second": round(len(latencies) / elapsed, 2),
+                    "users_per_second": round(rows / elapsed, 1),
+                    "mean_bytes": round(size / len(latencies)) if latencies else 0,
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                }
+
+            for limit in arguments.limits:
+                results[str(limit)] = await measure({"limit": limit})
+                print(f"limit={limit}: {results[str(limit)]}", file=sys.stderr)
+            if arguments.stream:
+                results["stream"] = await measure({"stream": "true"})
+                print(f"stream: {results['stream']}", file=sys.stderr)
+
+    return {"commit": git_commit(), "config": vars(arguments), "results": results}
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    # The largest page is above the production cap, raised for this benchmark only
+    configure_environment(arguments, MAX_PAGE_SIZE=str(max(arguments.limits)))
+    print(json.dumps(asyncio.run(run(arguments)), indent=2))
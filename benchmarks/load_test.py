@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event) -> None:
+        self.count += 1
+
+    def succeeded(self, event) -> None:
+        pass
+
+    def failed(self, event) -> None:
+        pass
+
+
+class SmtpSink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Drive every API route concurrently and report latency percentiles")
+    parser.add_argument("--users", type=int, default=200, help="Users seeded before the run")
+    parser.add_argument("--workspaces", type=int, default=200, help="Workspaces seeded before the run")
+    parser.add_argument("--requests", type=int, default=200, help="Requests sent per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight at the same time")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenarios, can be repeated")
+    add_environment_arguments(parser)
+    add_report_arguments(parser, "Allowed p95 increase in percent before the comparison fails")
+    return parser.parse_args()
+
+
+def add_report_arguments(parser: argparse.ArgumentParser, regression_help: str) -> None:
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON results from a previous run")
+    parser.add_argument("--max-regression", type=float, default=20.0, help=regression_help)
+
+
+def add_environment_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--mongo", choices=("mock", "real"), default="mock",
+                        help="mongomock-motor in memory, or a real mongod given by --mongo-uri")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="joker_task_benchmark")
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="Lower than production so the hash cost does not hide every other stage")
+    parser.add_argument("--jwt-algorithm", choices=("ES256", "ES384", "RS256", "HS256"), default="HS256")
+
+
+def configure_environment(arguments, **overrides: str) -> None:
+    # Settings are read when core.config is imported, so the environment is prepared before importing the app
+    defaults = {
+        "ENV": "benchmark",
+        "DB_CONNECTION": arguments.mongo_uri,
+        "DB_NAME": arguments.db_name,
+        "SECRET_KEY": "benchmark-secret",
+        "SECRET_KEY_REFRESH": "benchmark-refresh-secret",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(arguments.smtp_port),
+        "SMTP_USERNAME": "benchmark@example.com",
+        "SMTP_PASSWORD": "",
+        "SMTP_USE_TLS": "false",
+        "BCRYPT_ROUNDS": str(arguments.bcrypt_rounds),
+        "JWT_ALGORITHM": arguments.jwt_algorithm,
+        "JWT_KEYS_DIR": os.path.join(tempfile.gettempdir(), f"joker_task_benchmark_keys_{arguments.jwt_algorithm}"),
+        # Every benchmark request comes from the same address, login limits are exercised by login_attack.py
+        "LOGIN_MAX_ATTEMPTS_PER_IP": "1000000000",
+        "LOGIN_MAX_ATTEMPTS_PER_ACCOUNT": "1000000000",
+        **overrides,
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    if os.environ["JWT_ALGORITHM"] != "HS256":
+        # The app never generates keys itself, the benchmark provisions one like a deployment would
+        from core.signing_keys import generate_private_key, new_kid, write_key
+
+        directory = os.environ["JWT_KEYS_DIR"]
+        if not os.path.isdir(directory) or not any(name.endswith(".pem") for name in os.listdir(directory)):
+            write_key(directory, new_kid(), generate_private_key(os.environ["JWT_ALGORITHM"]))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(ctx, scenario, requests: int, concurrency: int, counter: Optional[CommandCounter]) -> dict:
+    if scenario.setup is not None:
+        await scenario.setup(ctx, requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def send(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(ctx, index)
+                failed = not 200 <= response.status_code < 300
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    commands_before = counter.count if counter is not None else 0
+    start = time.perf_counter()
+    await asyncio.gather(*(send(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mongo_ops_per_request": round((counter.count - commands_before) / requests, 2)
+        if counter is not None else None,
+    }
+
+
+@contextlib.asynccontextmanager
+async def booted_app(arguments):
+    from aiosmtpd.controller import Controller
+
+    import main
+
+    counter = None
+    if arguments.mongo == "mock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        async def skip_warm_up(client) -> None:
+            return None
+
+        main.create_mongo_client = AsyncMongoMockClient
+        main.warm_up_pool = skip_warm_up
+    else:
+        counter = CommandCounter()
+        monitoring.register(counter)
+
+    sink = SmtpSink()
+    smtp = Controller(sink, hostname="127.0.0.1", port=arguments.smtp_port)
+    smtp.start()
+    try:
+        async with main.lifespan(main.app):
+            yield main.app, sink, counter
+            if arguments.mongo == "real":
+                await main.app.mongodb_client.drop_database(arguments.db_name)
+    finally:
+        smtp.stop()
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, SCENARIOS
+    from core.config import settings
+
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not arguments.scenario or scenario.name in arguments.scenario]
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(arguments.users, arguments.workspaces)
+            for scenario in scenarios:
+                results[scenario.name] = await run_scenario(ctx, scenario, arguments.requests,
+                                                            arguments.concurrency, counter)
+                print(f"{scenario.name}: {results[scenario.name]}", file=sys.stderr)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {
+            "users": arguments.users,
+            "workspaces": arguments.workspaces,
+            "requests": arguments.requests,
+            "concurrency": arguments.concurrency,
+            "mongo": arguments.mongo,
+            "bcrypt_rounds": arguments.bcrypt_rounds,
+            "jwt_algorithm": arguments.jwt_algorithm,
+        },
+        "emails_received": sink.received,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_regression: float, metric: str = "p95_ms",
+            higher_is_better: bool = False) -> List[str]:
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get(metric):
+            continue
+        change = (result[metric] - previous[metric]) / previous[metric] * 100
+        if (-change if higher_is_better else change) > max_regression:
+            regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]} ({change:+.1f}%)")
+    return regressions
+
+
+def report_results(arguments, report: dict,
+                   compare_reports: Callable[[dict, dict, float], List[str]] = compare) -> None:
+    # Exits with 1 when --compare finds a regression, so CI can fail on it
+    output = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            regressions = compare_reports(report, json.load(baseline_file), arguments.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    report_results(arguments, asyncio.run(run(arguments)))
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, \
+    git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Send many requests and check that loggers and open files stay flat")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=10, help="Measurements taken along the run")
+    parser.add_argument("--max-fd-growth", type=int, default=5,
+                        help="Open file descriptors allowed above the first sample, e.g. pooled sockets")
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+def open_file_descriptors() -> Optional[int]:
+    # Linux only, elsewhere only the logger count is checked
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def sample(sent: int, started: float) -> dict:
+    return {
+        "requests": sent,
+        "seconds": round(time.perf_counter() - started, 1),
+        "loggers": len(logging.Logger.manager.loggerDict),
+        "open_fds": open_file_descriptors(),
+    }
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext
+    from core.config import settings
+
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(100, 0)
+            errors = 0
+
+            async def send(index: int) -> None:
+                nonlocal errors
+                # Alternates a logged in read and an anonymous error, both go through ApiResponse and its logger
+                if index % 2:
+                    response = await client.get(f"{ctx.api}/users/id={ctx.user(index)['id']}", headers=ctx.auth(index))
+                    errors += response.status_code != 200
+                else:
+                    response = await client.get(f"{ctx.api}/users/id={ctx.user(index)['id']}")
+                    errors += response.status_code != 401
+
+            # Warm up first, the first requests open the pooled connections and import lazily loaded modules
+            await asyncio.gather(*(send(index) for index in range(arguments.concurrency)))
+            started = time.perf_counter()
+            samples = [sample(0, started)]
+            step = max(1, arguments.requests // arguments.samples)
+            for sent in range(0, arguments.requests, step):
+                batch = range(sent, min(sent + step, arguments.requests))
+                for offset in range(0, len(batch), arguments.concurrency):
+                    await asyncio.gather(*(send(index) for index in batch[offset:offset + arguments.concurrency]))
+                samples.append(sample(batch.stop, started))
+                print(f"soak: {samples[-1]}", file=sys.stderr)
+
+    first, last = samples[0], samples[-1]
+    logger_growth = last["loggers"] - first["loggers"]
+    fd_growth = last["open_fds"] - first["open_fds"] if first["open_fds"] is not None else None
+    return {
+        "commit": git_commit(),
+        "config": vars(arguments),
+        "errors": errors,
+        "samples": samples,
+        "logger_growth": logger_growth,
+        "fd_growth": fd_growth,
+        "flat": logger_growth == 0 and (fd_growth is None or fd_growth <= arguments.max_fd_growth),
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    report = asyncio.run(run(arguments))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["flat"] else 1)
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure legitimate login latency while a guessing attack runs")
+    parser.add_argument("--attack-rate", type=int, default=10000, help="Guessing requests per second")
+    parser.add_argument("--attacker-ips", type=int, default=50, help="Distinct client addresses used by the attack")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds the attack runs")
+    parser.add_argument("--legit-users", type=int, default=20)
+    parser.add_argument("--legit-interval", type=float, default=2,
+                        help="Seconds between logins of a legit user, keep it under the per account limit")
+    parser.add_argument("--max-in-flight", type=int, default=2000,
+                        help="Cap on concurrent attack requests, guards the benchmark process itself")
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+def summarize(latencies: List[float], statuses: dict, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "rate": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, BENCHMARK_PASSWORD
+    from core.config import settings
+
+    async with booted_app(arguments) as (app, sink, counter):
+        def client_for(address: str) -> httpx.AsyncClient:
+            # The address is what the rate limiter sees as request.client.host
+            transport = httpx.ASGITransport(app=app, client=(address, 40000))
+            return httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60)
+
+        seed_client = client_for("10.0.0.1")
+        ctx = BenchmarkContext(seed_client, app.database, settings.API_STR)
+        legit_users = await ctx.create_users(arguments.legit_users)
+        victims = await ctx.create_users(10)
+        attackers = [client_for(f"198.51.{index // 250}.{index % 250 + 1}") for index in range(arguments.attacker_ips)]
+        legit_clients = [client_for(f"10.1.0.{index + 1}") for index in range(arguments.legit_users)]
+
+        attack_latencies: List[float] = []
+        attack_statuses: dict = {}
+        legit_latencies: List[float] = []
+        legit_statuses: dict = {}
+        in_flight = asyncio.Semaphore(arguments.max_in_flight)
+        deadline = time.perf_counter() + arguments.duration
+
+        async def guess(client: httpx.AsyncClient) -> None:
+            # Half the guesses target real accounts, half random usernames as in credential stuffing lists
+            username = random.choice(victims)["username"] if random.random() < 0.5 else f"stuffed_{random.random()}"
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{ctx.api}/auth/login",
+                                             json={"username_or_email": username, "password": "Wrong-guess1!"})
+                status = response.status_code
+            except Exception:
+                status = "error"
+            finally:
+                in_flight.release()
+            attack_latencies.append(time.perf_counter() - start)
+            attack_statuses[status] = attack_statuses.get(status, 0) + 1
+
+        async def attack() -> None:
+            # Open loop, requests are scheduled at the target rate whatever the response times are
+            tasks = set()
+            tick = 0.01
+            per_tick = max(1, int(arguments.attack_rate * tick))
+            while time.perf_counter() < deadline:
+                tick_start = time.perf_counter()
+                for _ in range(per_tick):
+                    await in_flight.acquire()
+                    task = asyncio.create_task(guess(random.choice(attackers)))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await asyncio.sleep(max(0.0, tick - (time.perf_counter() - tick_start)))
+            await asyncio.gather(*tasks)
+
+        async def legit(user: dict, client: httpx.AsyncClient) -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post(f"{ctx.api}/auth/login", json={"username_or_email": user["username"],
+                                                                           "password": BENCHMARK_PASSWORD})
+                legit_latencies.append(time.perf_counter() - start)
+                legit_statuses[response.status_code] = legit_statuses.get(response.status_code, 0) + 1
+                await asyncio.sleep(arguments.legit_interval)
+
+        start = time.perf_counter()
+        await asyncio.gather(attack(), *(legit(user, client) for user, client in zip(legit_users, legit_clients)))
+        elapsed = time.perf_counter() - start
+        for client in (seed_client, *attackers, *legit_clients):
+            await client.aclose()
+
+    return {
+        "commit": git_commit(),
+        "config": vars(arguments),
+        "attack": summarize(attack_latencies, attack_statuses, elapsed),
+        "legit": summarize(legit_latencies, legit_statuses, elapsed),
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    # Default production limits, unlike load_test.py which lifts them
+    configure_environment(arguments, LOGIN_MAX_ATTEMPTS_PER_IP="30", LOGIN_MAX_ATTEMPTS_PER_ACCOUNT="10")
+    print(json.dumps(asyncio.run(run(arguments)), indent=2, default=str))
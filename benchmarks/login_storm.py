@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure GET /users/id= latency alone and during a login storm")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of each phase")
+    parser.add_argument("--readers", type=int, default=10, help="Concurrent clients reading a user")
+    parser.add_argument("--storm-rate", type=int, default=200,
+                        help="Logins per second during the storm, well past what the hashing pool can verify")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Cap on concurrent storm requests, guards the benchmark process itself")
+    parser.add_argument("--users", type=int, default=50)
+    add_environment_arguments(parser)
+    # The storm is only meaningful at the production work factor
+    parser.set_defaults(bcrypt_rounds=12)
+    return parser.parse_args()
+
+
+def summarize(latencies: List[float], statuses: dict, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "rate": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, BENCHMARK_PASSWORD
+    from core.config import settings
+
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(arguments.users, 0)
+            if settings.PASSWORD_HASH_WORKERS >= (os.cpu_count() or 1):
+                # The hashing threads then take the event loop's core, the reads can not stay flat
+                print(f"warning: PASSWORD_HASH_WORKERS={settings.PASSWORD_HASH_WORKERS} on {os.cpu_count()} CPUs, "
+                      "keep at least one core for the event loop", file=sys.stderr)
+
+            async def phase(storm_rate: int) -> dict:
+                reads: List[float] = []
+                read_statuses: dict = {}
+                logins: List[float] = []
+                login_statuses: dict = {}
+                in_flight = asyncio.Semaphore(arguments.max_in_flight)
+                deadline = time.perf_counter() + arguments.duration
+
+                async def reader(index: int) -> None:
+                    while time.perf_counter() < deadline:
+                        start = time.perf_counter()
+                        response = await client.get(f"{ctx.api}/users/id={ctx.user(index)['id']}",
+                                                    headers=ctx.auth(index))
+                        reads.append(time.perf_counter() - start)
+                        read_statuses[response.status_code] = read_statuses.get(response.status_code, 0) + 1
+
+                async def login(index: int) -> None:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post(f"{ctx.api}/auth/login", json={
+                            "username_or_email": ctx.user(index)["username"], "password": BENCHMARK_PASSWORD})
+                    finally:
+                        in_flight.release()
+                    logins.append(time.perf_counter() - start)
+                    login_statuses[response.status_code] = login_statuses.get(response.status_code, 0) + 1
+
+                async def storm() -> None:
+                    # Open loop, logins are scheduled at the target rate whatever the response times are
+                    tasks = set()
+                    tick = 0.01
+                    per_tick = max(1, int(storm_rate * tick))
+                    index = 0
+                    while time.perf_counter() < deadline:
+                        tick_start = time.perf_counter()
+                        for _ in range(per_tick):
+                            await in_flight.acquire()
+                            task = asyncio.create_task(login(index))
+                            tasks.add(task)
+                            task.add_done_callback(tasks.discard)
+                            index += 1
+                        await asyncio.sleep(max(0.0, tick - (time.perf_counter() - tick_start)))
+                    await asyncio.gather(*tasks)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(reader(index) for index in range(arguments.readers)),
+                                     *([storm()] if storm_rate else []))
+                elapsed = time.perf_counter() - start
+                result = {"reads": summarize(reads, read_statuses, elapsed)}
+                if storm_rate:
+                    result["logins"] = summarize(logins, login_statuses, elapsed)
+                return result
+
+            # Warms the token and document caches, both phases then read the same users
+            await asyncio.gather(*(client.get(f"{ctx.api}/users/id={ctx.user(index)['id']}", headers=ctx.auth(index))
+                                   for index in range(arguments.users)))
+            baseline = await phase(0)
+            print(f"baseline: {baseline}", file=sys.stderr)
+            storm = await phase(arguments.storm_rate)
+            print(f"storm: {storm}", file=sys.stderr)
+
+    return {
+        "commit": git_commit(),
+        "config": {**vars(arguments), "cpu_count": os.cpu_count(),
+                   "password_hash_workers": settings.PASSWORD_HASH_WORKERS,
+                   "password_hash_max_pending": settings.PASSWORD_HASH_MAX_PENDING},
+        "baseline": baseline,
+        "storm": storm,
+        "read_p99_ratio": round(storm["reads"]["p99_ms"] / baseline["reads"]["p99_ms"], 2)
+        if baseline["reads"]["p99_ms"] else None,
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    print(json.dumps(asyncio.run(run(arguments)), indent=2, default=str))
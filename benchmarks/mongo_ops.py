@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import sys
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import monitoring  # noqa: E402
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, \
+    git_commit  # noqa: E402
+
+# Operations per request an endpoint may not exceed, login is one credentials read plus one session write
+BUDGETS = {
+    "login": 2,
+    "token": 2,
+    "forgot_password": 2,
+}
+MOCK_OPERATIONS = ("find", "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+                   "find_one_and_update", "find_one_and_delete", "find_one_and_replace", "delete_one", "delete_many",
+                   "count_documents", "aggregate", "bulk_write", "distinct")
+
+
+class OperationCounter(monitoring.CommandListener):
+    # Counts by command name, fed by the driver events with a real mongod or by the patched mongomock collection
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str) -> None:
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def started(self, event) -> None:
+        self.add(event.command_name)
+
+    def succeeded(self, event) -> None:
+        pass
+
+    def failed(self, event) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def count_mock_operations(counter: OperationCounter):
+    # mongomock implements some operations on top of others (find_one runs find), only the outer call is counted
+    from mongomock.collection import Collection
+
+    depth = 0
+    originals = {name: getattr(Collection, name) for name in MOCK_OPERATIONS}
+
+    def counted(name: str, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            nonlocal depth
+            if not depth:
+                counter.add(name)
+            depth += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth -= 1
+
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(Collection, name, counted(name, method))
+    try:
+        yield
+    finally:
+        for name, method in originals.items():
+            setattr(Collection, name, method)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Count the Mongo operations each endpoint runs per request")
+    parser.add_argument("--requests", type=int, default=20, help="Requests sent per scenario, one at a time")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenarios, can be repeated")
+    parser.add_argument("--compare", help="Baseline JSON results, fails if an endpoint runs more operations")
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+async def run(arguments, counter: OperationCounter) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, MEMBERSHIPS_PER_USER, SCENARIOS
+    from core.config import settings
+
+    scenarios = [scenario for scenario in SCENARIOS if not arguments.scenario or scenario.name in arguments.scenario]
+    results = {}
+    async with booted_app(arguments) as (app, sink, _):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            # The membership setup wraps around the seeded workspaces, fewer would repeat a membership
+            await ctx.seed(arguments.requests, max(arguments.requests, MEMBERSHIPS_PER_USER + 1))
+            for scenario in scenarios:
+                if scenario.setup is not None:
+                    await scenario.setup(ctx, arguments.requests)
+                before = dict(counter.counts)
+                errors = 0
+                for index in range(arguments.requests):
+                    response = await scenario.request(ctx, index)
+                    errors += not 200 <= response.status_code < 300
+                operations = {name: round((count - before.get(name, 0)) / arguments.requests, 2)
+                              for name, count in counter.counts.items() if count != before.get(name, 0)}
+                results[scenario.name] = {"errors": errors, "per_request": round(sum(operations.values()), 2),
+                                          "operations": operations}
+                print(f"{scenario.name}: {results[scenario.name]}", file=sys.stderr)
+    return results
+
+
+def over_budget(results: dict, baseline: Optional[dict]) -> list:
+    failures = []
+    for name, result in results.items():
+        budget = BUDGETS.get(name)
+        if budget is not None and result["per_request"] > budget:
+            failures.append(f"{name}: {result['per_request']} operations per request, budget {budget}")
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous is not None and result["per_request"] > previous["per_request"]:
+            failures.append(f"{name}: {previous['per_request']} -> {result['per_request']} operations per request")
+    return failures
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    operation_counter = OperationCounter()
+    if arguments.mongo == "real":
+        monitoring.register(operation_counter)
+        counting = contextlib.nullcontext()
+    else:
+        counting = count_mock_operations(operation_counter)
+    with counting:
+        report = {"commit": git_commit(), "config": vars(arguments),
+                  "results": asyncio.run(run(arguments, operation_counter))}
+    print(json.dumps(report, indent=2))
+    baseline_report = None
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline_report = json.load(baseline_file)
+    regressions = over_budget(report["results"], baseline_report)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure concurrent refresh token rotation of users with many devices")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--devices", type=int, default=50, help="Sessions logged in per user")
+    parser.add_argument("--refreshes", type=int, default=20, help="Sequential refreshes per device")
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext, BENCHMARK_PASSWORD
+    from core.config import settings
+
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            users = await ctx.create_users(arguments.users)
+
+            async def login(user: dict) -> str:
+                response = await client.post(f"{ctx.api}/auth/login", json={"username_or_email": user["username"],
+                                                                           "password": BENCHMARK_PASSWORD})
+                return response.json()["data"]["refresh_token"]
+
+            devices = await asyncio.gather(*(login(user) for user in users for _ in range(arguments.devices)))
+            first_tokens = list(devices)
+            latencies: List[float] = []
+            statuses: dict = {}
+
+            async def refresh_device(token: str) -> None:
+                for _ in range(arguments.refreshes):
+                    start = time.perf_counter()
+                    response = await client.post(f"{ctx.api}/auth/refresh-token", json={"token": token})
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    if response.status_code != 200:
+                        return
+                    token = response.json()["data"]["refresh_token"]
+
+            commands_before = counter.count if counter is not None else 0
+            start = time.perf_counter()
+            # Every device of every user rotates at the same time, each one only touches its own session document
+            await asyncio.gather(*(refresh_device(token) for token in devices))
+            elapsed = time.perf_counter() - start
+            commands = counter.count - commands_before if counter is not None else None
+
+            # Replaying a rotated token must revoke its family
+            replay = await client.post(f"{ctx.api}/auth/refresh-token", json={"token": first_tokens[0]})
+            sessions = await app.database.get_collection("sessions").count_documents({})
+
+    return {
+        "commit": git_commit(),
+        "config": vars(arguments),
+        "refreshes": len(latencies),
+        "statuses": statuses,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mongo_ops_per_refresh": round(commands / len(latencies), 2) if commands is not None and latencies else None,
+        "replayed_token_status": replay.status_code,
+        "sessions_left": sessions,
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    print(json.dumps(asyncio.run(run(arguments)), indent=2, default=str))
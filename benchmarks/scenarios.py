@@ -0,0 +1,319 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Awaitable, Optional, List, Dict
+
+import httpx
+
+from models.sessions import SessionsModel
+from models.users import UsersModel, TokenData
+from models.workspace_members import WorkspaceMembersModel, WorkspaceRole
+from models.workspaces import WorkspacesModel
+from repositories.users import UsersRepository
+from repositories.workspaces import WorkspacesRepository
+from utils.security import hash_password
+from utils.tokens_jwt import create_token, TokenType, create_random_token, hash_token, REFRESH_TOKEN_EXPIRE_DAYS
+
+BENCHMARK_PASSWORD = "Benchmark1!"
+NEW_PASSWORD = "Benchmark2!"
+BULK_SIZE = 50
+MEMBERSHIPS_PER_USER = 20
+
+
+class BenchmarkContext:
+    def __init__(self, client: httpx.AsyncClient, db, api_prefix: str):
+        self.client = client
+        self.db = db
+        self.api = api_prefix
+        self.password_hash: Optional[str] = None
+        self.users: List[dict] = []
+        self.workspaces: List[str] = []
+        self.owners: Dict[str, dict] = {}
+        self.items: Dict[str, list] = {}
+
+    def user(self, index: int) -> dict:
+        return self.users[index % len(self.users)]
+
+    def workspace(self, index: int) -> str:
+        return self.workspaces[index % len(self.workspaces)]
+
+    def auth(self, index: int) -> dict:
+        return {"Authorization": f"Bearer {self.user(index)['access_token']}"}
+
+    def owner_auth(self, workspace_id: str) -> dict:
+        return {"Authorization": f"Bearer {self.owners[workspace_id]['access_token']}"}
+
+    async def create_users(self, count: int, **fields) -> List[dict]:
+        # Users are written straight to the database, only the request under test goes through the API
+        if self.password_hash is None:
+            self.password_hash = await hash_password(BENCHMARK_PASSWORD)
+        users = []
+        for _ in range(count):
+            suffix = uuid.uuid4().hex[:12]
+            user = UsersModel(username=f"bench_{suffix}", full_name=f"Bench {suffix}",
+                              email=f"bench_{suffix}@example.com", password=self.password_hash,
+                              **{"is_verified": True, **fields})
+            users.append(user)
+        if users:
+            await self.db.get_collection("users").insert_many([UsersRepository.to_document(user) for user in users])
+        created = []
+        for user in users:
+            token_data = TokenData(**user.model_dump()).model_dump()
+            created.append({
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "token_data": token_data,
+                "access_token": await create_token(data=token_data, token_type=TokenType.access_token),
+                "fields": fields,
+            })
+        return created
+
+    async def create_workspaces(self, count: int, owners: Optional[List[dict]] = None) -> List[str]:
+        # Workspace writes check the role of the caller, every workspace is seeded with an owner
+        owners = owners or [self.user(index) for index in range(count)]
+        workspaces = [WorkspacesModel(workspace_name=f"bench_{uuid.uuid4().hex}") for _ in range(count)]
+        if workspaces:
+            await self.db.get_collection("workspaces").insert_many(
+                [WorkspacesRepository.to_document(workspace) for workspace in workspaces])
+            await self.db.get_collection("workspace_members").insert_many([
+                WorkspaceMembersModel(workspace_id=workspace.id, user_id=owner["id"],
+                                      role=WorkspaceRole.Owner).model_dump(by_alias=True)
+                for workspace, owner in zip(workspaces, owners)])
+            self.owners.update({workspace.id: owner for workspace, owner in zip(workspaces, owners)})
+        return [workspace.id for workspace in workspaces]
+
+    async def seed(self, users: int, workspaces: int) -> None:
+        self.users = await self.create_users(users)
+        self.workspaces = await self.create_workspaces(workspaces)
+
+
+Setup = Callable[[BenchmarkContext, int], Awaitable[None]]
+Request = Callable[[BenchmarkContext, int], Awaitable[httpx.Response]]
+
+
+class Scenario:
+    def __init__(self, name: str, request: Request, setup: Optional[Setup] = None):
+        self.name = name
+        self.request = request
+        self.setup = setup
+
+
+async def _setup_unverified(ctx: BenchmarkContext, count: int) -> None:
+    ctx.items["verify"] = await ctx.create_users(count, is_verified=False, user_verify_token=create_random_token())
+
+
+async def _setup_refresh(ctx: BenchmarkContext, count: int) -> None:
+    users = await ctx.create_users(count)
+    sessions = []
+    for user in users:
+        family_id = str(uuid.uuid4())
+        user["refresh_token"] = await create_token(data={**user["token_data"], "fid": family_id},
+                                                   token_type=TokenType.refresh_token)
+        sessions.append(SessionsModel(user_id=user["id"], family_id=family_id,
+                                      token_hash=hash_token(user["refresh_token"]),
+                                      expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)))
+    await ctx.db.get_collection("sessions").insert_many([session.model_dump(by_alias=True) for session in sessions])
+    ctx.items["refresh"] = users
+
+
+async def _setup_reset(ctx: BenchmarkContext, count: int) -> None:
+    ctx.items["reset"] = await ctx.create_users(count, password_reset_token=create_random_token())
+
+
+async def _setup_disposable_users(ctx: BenchmarkContext, count: int) -> None:
+    ctx.items["disposable_users"] = await ctx.create_users(count)
+
+
+async def _setup_disposable_workspaces(ctx: BenchmarkContext, count: int) -> None:
+    ctx.items["disposable_workspaces"] = await ctx.create_workspaces(count)
+
+
+async def _setup_bulk_workspaces(ctx: BenchmarkContext, count: int) -> None:
+    # One owner per batch, a bulk request only touches workspaces its caller manages
+    ctx.items["bulk_workspaces"] = await ctx.create_workspaces(
+        count * BULK_SIZE, [ctx.user(i) for i in range(count) for _ in range(BULK_SIZE)])
+
+
+async def _setup_memberships(ctx: BenchmarkContext, count: int) -> None:
+    # Every seeded user joins MEMBERSHIPS_PER_USER workspaces as member, besides the ones it owns
+    if ctx.items.get("memberships"):
+        return
+    memberships = [
+        WorkspaceMembersModel(workspace_id=ctx.workspace(index + offset), user_id=user["id"], role=WorkspaceRole.Member)
+        for index, user in enumerate(ctx.users) for offset in range(MEMBERSHIPS_PER_USER)
+        if ctx.owners[ctx.workspace(index + offset)]["id"] != user["id"]]
+    await ctx.db.get_collection("workspace_members").insert_many(
+        [membership.model_dump(by_alias=True) for membership in memberships])
+    ctx.items["memberships"] = memberships
+
+
+async def _signup(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    suffix = uuid.uuid4().hex[:12]
+    return await ctx.client.post(f"{ctx.api}/users", json={
+        "username": f"signup_{suffix}", "full_name": "Signup Bench", "email": f"signup_{suffix}@example.com",
+        "password": BENCHMARK_PASSWORD})
+
+
+async def _verify_user(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    user = ctx.items["verify"][i]
+    return await ctx.client.get(f"{ctx.api}/users/verify-user",
+                                params={"_id": user["id"], "token": user["fields"]["user_verify_token"]})
+
+
+async def _login(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.post(f"{ctx.api}/auth/login", json={"username_or_email": ctx.user(i)["username"],
+                                                                "password": BENCHMARK_PASSWORD})
+
+
+async def _token(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.post(f"{ctx.api}/auth/token", data={"username": ctx.user(i)["username"],
+                                                                "password": BENCHMARK_PASSWORD})
+
+
+async def _refresh_token(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    refresh_token = ctx.items["refresh"][i]["refresh_token"]
+    return await ctx.client.post(f"{ctx.api}/auth/refresh-token", json={"token": refresh_token})
+
+
+async def _logout(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    # A logged out token is revoked, so every request uses a user of its own
+    user = ctx.items["disposable_users"][i]
+    return await ctx.client.post(f"{ctx.api}/auth/logout", headers={"Authorization": f"Bearer {user['access_token']}"})
+
+
+async def _forgot_password(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.post(f"{ctx.api}/auth/forgot-password", json={"email": ctx.user(i)["email"]})
+
+
+async def _reset_password(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    user = ctx.items["reset"][i]
+    return await ctx.client.post(f"{ctx.api}/auth/reset-password", json={
+        "password_reset_token": user["fields"]["password_reset_token"], "user_id": user["id"],
+        "new_password": NEW_PASSWORD, "confirm_password": NEW_PASSWORD})
+
+
+async def _get_user(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/users/id={ctx.user(i)['id']}", headers=ctx.auth(i))
+
+
+async def _list_users(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/users", headers=ctx.auth(i))
+
+
+async def _update_user(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.patch(f"{ctx.api}/users/id={ctx.user(i)['id']}", headers=ctx.auth(i),
+                                  json={"full_name": f"Updated {i}"})
+
+
+async def _change_password(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    user = ctx.items["disposable_users"][i]
+    return await ctx.client.patch(f"{ctx.api}/users/change-password/id={user['id']}",
+                                  headers={"Authorization": f"Bearer {user['access_token']}"},
+                                  json={"current_password": BENCHMARK_PASSWORD, "new_password": NEW_PASSWORD,
+                                        "confirm_password": NEW_PASSWORD})
+
+
+async def _delete_user(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    user = ctx.items["disposable_users"][i]
+    return await ctx.client.delete(f"{ctx.api}/users/id={user['id']}",
+                                   headers={"Authorization": f"Bearer {user['access_token']}"})
+
+
+async def _search_users(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    # Typeahead: the shared bench_ prefix and up to three more characters of a seeded username
+    return await ctx.client.get(f"{ctx.api}/users/search", headers=ctx.auth(i),
+                                params={"q": ctx.user(i)["username"][:6 + i % 4], "limit": 10})
+
+
+async def _search_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/workspaces/search", params={"q": f"bench_{i % 16:x}", "limit": 10})
+
+
+async def _create_workspace(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.post(f"{ctx.api}/workspaces", headers=ctx.auth(i),
+                                 json={"workspace_name": f"ws_{uuid.uuid4().hex}"})
+
+
+async def _get_workspace(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/workspaces/id={ctx.workspace(i)}")
+
+
+async def _list_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/workspaces")
+
+
+async def _update_workspace(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    workspace_id = ctx.workspace(i)
+    return await ctx.client.patch(f"{ctx.api}/workspaces/id={workspace_id}", headers=ctx.owner_auth(workspace_id),
+                                  json={"workspace_name": f"ws_{uuid.uuid4().hex}"})
+
+
+async def _delete_workspace(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    workspace_id = ctx.items["disposable_workspaces"][i]
+    return await ctx.client.delete(f"{ctx.api}/workspaces/id={workspace_id}", headers=ctx.owner_auth(workspace_id))
+
+
+async def _bulk_create_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.post(f"{ctx.api}/workspaces/bulk", headers=ctx.auth(i),
+                                 json=[{"workspace_name": f"ws_{uuid.uuid4().hex}"} for _ in range(BULK_SIZE)])
+
+
+async def _bulk_update_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    ids = ctx.items["bulk_workspaces"][i * BULK_SIZE:(i + 1) * BULK_SIZE]
+    return await ctx.client.patch(f"{ctx.api}/workspaces/bulk", headers=ctx.owner_auth(ids[0]),
+                                  json=[{"id": workspace_id, "description": f"Updated {i}"} for workspace_id in ids])
+
+
+async def _bulk_delete_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    ids = ctx.items["bulk_workspaces"][i * BULK_SIZE:(i + 1) * BULK_SIZE]
+    return await ctx.client.request("DELETE", f"{ctx.api}/workspaces/bulk", headers=ctx.owner_auth(ids[0]),
+                                    json={"ids": ids})
+
+
+async def _user_workspaces(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/users/id={ctx.user(i)['id']}/workspaces", headers=ctx.auth(i))
+
+
+async def _workspace_members(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/workspaces/id={ctx.workspace(i)}/members",
+                                headers=ctx.owner_auth(ctx.workspace(i)))
+
+
+async def _health(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/health")
+
+
+async def _metrics(ctx: BenchmarkContext, i: int) -> httpx.Response:
+    return await ctx.client.get(f"{ctx.api}/metrics")
+
+
+SCENARIOS = [
+    Scenario("signup", _signup),
+    Scenario("verify_user", _verify_user, _setup_unverified),
+    Scenario("login", _login),
+    Scenario("token", _token),
+    Scenario("refresh_token", _refresh_token, _setup_refresh),
+    Scenario("forgot_password", _forgot_password),
+    Scenario("reset_password", _reset_password, _setup_reset),
+    Scenario("get_user", _get_user),
+    Scenario("list_users", _list_users),
+    Scenario("search_users", _search_users),
+    Scenario("update_user", _update_user),
+    Scenario("change_password", _change_password, _setup_disposable_users),
+    Scenario("create_workspace", _create_workspace),
+    Scenario("get_workspace", _get_workspace),
+    Scenario("list_workspaces", _list_workspaces),
+    Scenario("search_workspaces", _search_workspaces),
+    Scenario("update_workspace", _update_workspace),
+    Scenario("delete_workspace", _delete_workspace, _setup_disposable_workspaces),
+    Scenario("bulk_create_workspaces", _bulk_create_workspaces),
+    Scenario("bulk_update_workspaces", _bulk_update_workspaces, _setup_bulk_workspaces),
+    Scenario("bulk_delete_workspaces", _bulk_delete_workspaces, _setup_bulk_workspaces),
+    Scenario("user_workspaces", _user_workspaces, _setup_memberships),
+    Scenario("workspace_members", _workspace_members, _setup_memberships),
+    Scenario("health", _health),
+    Scenario("metrics", _metrics),
+    # Destructive scenarios run last, they invalidate the seeded sessions
+    Scenario("delete_user", _delete_user, _setup_disposable_users),
+    Scenario("logout", _logout, _setup_disposable_users),
+]
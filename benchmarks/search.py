@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    git_commit  # noqa: E402
+
+FIRST_NAMES = ["ana", "bruno", "carla", "diego", "elena", "fabian", "gloria", "hector", "irene", "jorge", "karen",
+               "luis", "maria", "nicolas", "olga", "pablo", "quentin", "rosa", "sofia", "tomas", "ursula", "victor"]
+LAST_NAMES = ["arciniegas", "benitez", "castro", "duarte", "espinosa", "fernandez", "garcia", "herrera", "iglesias",
+              "jimenez", "lopez", "martinez", "núñez", "ortega", "perez", "quintero", "ramirez", "sanchez", "torres"]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure typeahead search latency on large users and workspaces")
+    parser.add_argument("--documents", type=int, default=1000000, help="Users and workspaces seeded, each")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10, help="Page size of every search")
+    parser.add_argument("--target-p95-ms", type=float, default=20)
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+async def seed(db, count: int, password_hash: str) -> List[str]:
+    from models.users import UsersModel
+    from models.workspaces import WorkspacesModel
+    from repositories.users import UsersRepository
+    from repositories.workspaces import WorkspacesRepository
+
+    full_names = []
+    for start in range(0, count, 10000):
+        users, workspaces = [], []
+        for _ in range(start, min(count, start + 10000)):
+            suffix = uuid.uuid4().hex[:8]
+            first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+            full_names.append(f"{first} {last}")
+            users.append(UsersRepository.to_document(UsersModel(
+                username=f"{first}{last[:3]}_{suffix}", full_name=f"{first.title()} {last.title()}",
+                email=f"{first}.{suffix}@example.com", password=password_hash, is_verified=True)))
+            workspaces.append(WorkspacesRepository.to_document(WorkspacesModel(
+                workspace_name=f"{last} {random.choice(['labs', 'studio', 'team', 'works'])} {suffix}")))
+        await db.get_collection("users").insert_many(users, ordered=False)
+        await db.get_collection("workspaces").insert_many(workspaces, ordered=False)
+    return full_names
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    from benchmarks.scenarios import BenchmarkContext
+    from core.config import settings
+
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            searcher = (await ctx.create_users(1))[0]
+            start = time.perf_counter()
+            full_names = await seed(app.database, arguments.documents, ctx.password_hash)
+            print(f"Seeded {arguments.documents} users and workspaces in {time.perf_counter() - start:.1f}s",
+                  file=sys.stderr)
+            headers = {"Authorization": f"Bearer {searcher['access_token']}"}
+
+            def typeahead(i: int) -> str:
+                # What a client sends while the name is being typed, one to six characters
+                name = full_names[i % len(full_names)]
+                return name[:1 + i % 6]
+
+            def infix(i: int) -> str:
+                return full_names[i % len(full_names)].split()[-1][1:5]
+
+            searches = {
+                "users_prefix": lambda i: client.get(f"{ctx.api}/users/search", headers=headers,
+                                                     params={"q": typeahead(i), "limit": arguments.limit}),
+                "workspaces_prefix": lambda i: client.get(f"{ctx.api}/workspaces/search",
+                                                          params={"q": typeahead(i).split()[-1],
+                                                                  "limit": arguments.limit}),
+            }
+            if settings.SEARCH_NGRAMS:
+                searches["users_infix"] = lambda i: client.get(f"{ctx.api}/users/search", headers=headers, params={
+                    "q": infix(i), "limit": arguments.limit, "infix": "true"})
+            for name, search in searches.items():
+                semaphore = asyncio.Semaphore(arguments.concurrency)
+                latencies: List[float] = []
+                statuses: dict = {}
+
+                async def send(i: int) -> None:
+                    async with semaphore:
+                        request_start = time.perf_counter()
+                        response = await search(i)
+                        latencies.append(time.perf_counter() - request_start)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+                commands_before = counter.count if counter is not None else 0
+                elapsed_start = time.perf_counter()
+                await asyncio.gather(*(send(random.randrange(len(full_names))) for _ in range(arguments.requests)))
+                elapsed = time.perf_counter() - elapsed_start
+                results[name] = {
+                    "statuses": statuses,
+                    "throughput": round(arguments.requests / elapsed, 2),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                    "mongo_ops_per_request": round((counter.count - commands_before) / arguments.requests, 2)
+                    if counter is not None else None,
+                    "within_target": percentile(latencies, 0.95) * 1000 <= arguments.target_p95_ms,
+                }
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {"commit": git_commit(), "config": vars(arguments), "results": results}
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    report = asyncio.run(run(arguments))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all(result["within_target"] for result in report["results"].values()) else 1)
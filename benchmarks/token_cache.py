@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, booted_app, percentile, \
+    run_scenario, git_commit  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Compare authenticated requests with and without the token cache")
+    parser.add_argument("--users", type=int, default=100, help="Distinct tokens, all fit in the cache")
+    parser.add_argument("--calls", type=int, default=20000, help="Direct get_current_user calls per mode")
+    parser.add_argument("--requests", type=int, default=2000, help="GET /users/id= requests per mode")
+    parser.add_argument("--concurrency", type=int, default=20)
+    add_environment_arguments(parser)
+    return parser.parse_args()
+
+
+async def time_dependency(get_current_user, tokens: List[str], calls: int) -> dict:
+    latencies = []
+    for index in range(calls):
+        start = time.perf_counter()
+        await get_current_user(tokens[index % len(tokens)])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "calls": calls,
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 2),
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 2),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 2),
+    }
+
+
+async def run(arguments) -> dict:
+    import httpx
+
+    import core.auth
+    from benchmarks.scenarios import BenchmarkContext, SCENARIOS
+    from core.config import settings
+    from core.token_cache import VerifiedTokenCache
+
+    get_user = next(scenario for scenario in SCENARIOS if scenario.name == "get_user")
+    results = {}
+    async with booted_app(arguments) as (app, sink, counter):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            ctx = BenchmarkContext(client, app.database, settings.API_STR)
+            await ctx.seed(arguments.users, 0)
+            tokens = [user["access_token"] for user in ctx.users]
+            cached = core.auth.verified_token_cache
+            # A cache of size zero never stores a token, every call decodes and verifies the signature
+            for mode, cache in (("uncached", VerifiedTokenCache(0)), ("cached", cached)):
+                core.auth.verified_token_cache = cache
+                # The cached mode then measures hits only, the first pass fills the cache
+                await time_dependency(core.auth.get_current_user, tokens, len(tokens))
+                hits, misses = cache.hits, cache.misses
+                dependency = await time_dependency(core.auth.get_current_user, tokens, arguments.calls)
+                endpoint = await run_scenario(ctx, get_user, arguments.requests, arguments.concurrency, counter)
+                results[mode] = {"get_current_user": dependency, "get_user": endpoint,
+                                 "hits": cache.hits - hits, "misses": cache.misses - misses}
+                print(f"{mode}: {results[mode]}", file=sys.stderr)
+            core.auth.verified_token_cache = cached
+
+    uncached, cached = results["uncached"], results["cached"]
+    return {
+        "commit": git_commit(),
+        "config": vars(arguments),
+        "results": results,
+        "dependency_speedup": round(uncached["get_current_user"]["mean_us"] / cached["get_current_user"]["mean_us"], 2)
+        if cached["get_current_user"]["mean_us"] else None,
+        "throughput_ratio": round(cached["get_user"]["throughput"] / uncached["get_user"]["throughput"], 2)
+        if uncached["get_user"]["throughput"] else None,
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    print(json.dumps(asyncio.run(run(arguments)), indent=2))
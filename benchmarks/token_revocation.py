@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, percentile  # noqa: E402
+
+
+def revocation_documents(tokens: int, users: int) -> list:
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=30)
+    return [{"user_id": str(uuid.uuid4()), "jti": uuid.uuid4().hex, "expires_at": expires_at, "updated_at": now}
+            for _ in range(tokens)] + \
+        [{"user_id": str(uuid.uuid4()), "not_before": now, "expires_at": expires_at, "updated_at": now}
+         for _ in range(users)]
+
+
+def measure(size: int, checks: int) -> dict:
+    from core.errors import UnauthorizedError
+    from core.token_revocation import TokenRevocationList
+    from models.users import TokenData
+
+    revocation_list = TokenRevocationList()
+    documents = revocation_documents(size // 2, size - size // 2)
+    start = time.perf_counter()
+    revocation_list.apply(documents)
+    apply_seconds = time.perf_counter() - start
+
+    # Half the checks hit a revoked entry, the rest are live tokens of unknown users
+    tokens = [TokenData(id=document["user_id"], username="bench", full_name="Bench", email="bench@example.com",
+                        jti=document.get("jti"), iat=0) for document in documents[:checks // 2]]
+    tokens += [TokenData(id=str(uuid.uuid4()), username="bench", full_name="Bench", email="bench@example.com",
+                         jti=uuid.uuid4().hex, iat=time.time()) for _ in range(checks - len(tokens))]
+    latencies = []
+    rejected = 0
+    for token_data in tokens:
+        start = time.perf_counter()
+        try:
+            revocation_list.check(token_data)
+        except UnauthorizedError:
+            rejected += 1
+        latencies.append(time.perf_counter() - start)
+    return {
+        "revocations": size,
+        "apply_ms": round(apply_seconds * 1000, 3),
+        "checks": len(latencies),
+        "rejected": rejected,
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 3),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the in memory access token revocation check")
+    parser.add_argument("--size", type=int, action="append", help="Revocations loaded, can be repeated")
+    parser.add_argument("--checks", type=int, default=100000)
+    add_environment_arguments(parser)
+    arguments = parser.parse_args()
+    configure_environment(arguments)
+    print(json.dumps({"config": vars(arguments), "results": [
+        measure(size, arguments.checks) for size in arguments.size or (0, 1000, 100000)]}, indent=2))
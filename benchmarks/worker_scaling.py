@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import add_environment_arguments, configure_environment, percentile, \
+    git_commit  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measure requests/second of server.py over HTTP for 1..N workers")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--users", type=int, default=200, help="Users seeded in Mongo, logged in once over HTTP")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load for each worker count")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes, so the load generator scales too")
+    parser.add_argument("--concurrency", type=int, default=25, help="Requests in flight per client process")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    add_environment_arguments(parser)
+    parser.set_defaults(mongo="real")
+    return parser.parse_args()
+
+
+async def seed_users(arguments, count: int) -> List[dict]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from benchmarks.scenarios import BENCHMARK_PASSWORD
+    from models.users import UsersModel
+    from repositories.users import UsersRepository
+    from utils.security import hash_password
+
+    password = await hash_password(BENCHMARK_PASSWORD)
+    users = []
+    for _ in range(count):
+        suffix = uuid.uuid4().hex[:12]
+        users.append(UsersModel(username=f"bench_{suffix}", full_name=f"Bench {suffix}",
+                                email=f"bench_{suffix}@example.com", password=password, is_verified=True))
+    client = AsyncIOMotorClient(arguments.mongo_uri)
+    try:
+        await client[arguments.db_name].get_collection("users").insert_many(
+            [UsersRepository.to_document(user) for user in users])
+    finally:
+        client.close()
+    return [{"id": user.id, "username": user.username} for user in users]
+
+
+async def drop_database(arguments) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(arguments.mongo_uri)
+    try:
+        await client.drop_database(arguments.db_name)
+    finally:
+        client.close()
+
+
+async def log_in(base_url: str, api: str, users: List[dict]) -> List[dict]:
+    import httpx
+
+    from benchmarks.scenarios import BENCHMARK_PASSWORD
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for user in users:
+            response = await client.post(f"{api}/auth/login", json={"username_or_email": user["username"],
+                                                                   "password": BENCHMARK_PASSWORD})
+            response.raise_for_status()
+            user["access_token"] = response.json()["data"]["access_token"]
+    return users
+
+
+def start_server(arguments, workers: int) -> subprocess.Popen:
+    # The workers read the settings from the environment prepared by configure_environment
+    return subprocess.Popen(
+        [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(arguments.port), "--workers", str(workers)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(server: subprocess.Popen, base_url: str, api: str, timeout: float) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server.py exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}{api}/health", timeout=5).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server.py was not ready after {timeout}s")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def client_process(base_url: str, api: str, users: List[dict], concurrency: int, start_at: float,
+                   duration: float) -> dict:
+    return asyncio.run(drive(base_url, api, users, concurrency, start_at, duration))
+
+
+async def drive(base_url: str, api: str, users: List[dict], concurrency: int, start_at: float,
+                duration: float) -> dict:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        # Every client process starts at the same wall clock time
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        deadline = time.perf_counter() + duration
+
+        async def worker(index: int) -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                user = users[index % len(users)]
+                index += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"{api}/users/id={user['id']}",
+                                                headers={"Authorization": f"Bearer {user['access_token']}"})
+                    errors += response.status_code != 200
+                except httpx.TransportError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return {"requests": len(latencies), "errors": errors, "latencies": latencies}
+
+
+def measure(arguments, base_url: str, api: str, users: List[dict], pool) -> dict:
+    start_at = time.time() + 1
+    shares = [users[index::arguments.clients] or users for index in range(arguments.clients)]
+    outcomes = pool.starmap(client_process, [(base_url, api, share, arguments.concurrency, start_at,
+                                              arguments.duration) for share in shares])
+    latencies = [latency for outcome in outcomes for latency in outcome["latencies"]]
+    requests = sum(outcome["requests"] for outcome in outcomes)
+    return {
+        "requests": requests,
+        "errors": sum(outcome["errors"] for outcome in outcomes),
+        "requests_per_second": round(requests / arguments.duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run(arguments) -> dict:
+    from core.config import settings
+
+    if arguments.mongo != "real":
+        # Every worker is its own process, an in memory mongomock database can not be shared between them
+        raise SystemExit("worker_scaling.py needs a real mongod, pass --mongo real and --mongo-uri")
+    if arguments.max_workers + arguments.clients > (os.cpu_count() or 1):
+        print(f"warning: {arguments.max_workers} workers and {arguments.clients} clients on {os.cpu_count()} CPUs, "
+              "the load generator competes with the server for cores", file=sys.stderr)
+
+    base_url = f"http://127.0.0.1:{arguments.port}"
+    api = settings.API_STR
+    users = asyncio.run(seed_users(arguments, arguments.users))
+    results = {}
+    try:
+        with multiprocessing.get_context("spawn").Pool(arguments.clients) as pool:
+            for workers in range(1, arguments.max_workers + 1):
+                server = start_server(arguments, workers)
+                try:
+                    wait_until_ready(server, base_url, api, arguments.startup_timeout)
+                    if "access_token" not in users[0]:
+                        users = asyncio.run(log_in(base_url, api, users))
+                    # Untimed pass, every worker opens its Mongo pool and fills its caches
+                    measure(argparse.Namespace(**{**vars(arguments), "duration": 1.0}), base_url, api, users, pool)
+                    results[str(workers)] = measure(arguments, base_url, api, users, pool)
+                finally:
+                    stop_server(server)
+                print(f"workers={workers}: {results[str(workers)]}", file=sys.stderr)
+    finally:
+        asyncio.run(drop_database(arguments))
+
+    single = results["1"]["requests_per_second"]
+    return {
+        "commit": git_commit(),
+        "config": {**vars(arguments), "cpu_count": os.cpu_count()},
+        "results": results,
+        "speedup": {workers: round(result["requests_per_second"] / single, 2) if single else None
+                    for workers, result in results.items()},
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configure_environment(arguments)
+    print(json.dumps(run(arguments), indent=2))
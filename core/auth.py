@@ -4,6 +4,8 @@ from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 
 from core.errors import UnauthorizedError
+from core.token_cache import verified_token_cache
+from core.token_revocation import token_revocation_list
 from models.responde_model import LocationError
 from models.users import TokenData
 from utils.tokens_jwt import decode_token, TokenType
@@ -14,10 +16,15 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 async def get_current_user(
         access_token: Annotated[str, Depends(oauth2_scheme)]
 ) -> TokenData:
-    payload = await decode_token(access_token, TokenType.access_token)
-    if not payload or "id" not in payload:
-        raise UnauthorizedError(message="Invalid credentials", location=LocationError.Headers)
-    token_data = TokenData(**payload)
+    token_data = verified_token_cache.get(access_token)
+    if token_data is None:
+        payload = await decode_token(access_token, TokenType.access_token)
+        if not payload or "id" not in payload:
+            raise UnauthorizedError(message="Invalid credentials", location=LocationError.Headers)
+        token_data = TokenData(**payload)
+        verified_token_cache.put(access_token, token_data, payload["exp"])
+    # In memory lookup, revocations are synced in the background so no request waits on the database
+    token_revocation_list.check(token_data)
     return token_data
 
 
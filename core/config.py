@@ -6,13 +6,72 @@ class Settings(BaseSettings):
     ENV: str
     DB_CONNECTION: str
     DB_NAME: str
+    DB_MAX_POOL_SIZE: int = 100
+    DB_MIN_POOL_SIZE: int = 0
+    DB_MAX_IDLE_TIME_MS: int | None = None
+    DB_WAIT_QUEUE_TIMEOUT_MS: int | None = None
+    DB_COMPRESSORS: str | None = None
+    DB_READ_PREFERENCE: str = "primary"
+    DB_WARMUP_TIMEOUT_SECONDS: float = 5
     API_STR: str = "/api"
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int | None = None
+    SERVER_KEEP_ALIVE_SECONDS: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_LIMIT_CONCURRENCY: int | None = None
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+    MAX_BULK_SIZE: int = 1000
+    MAX_BULK_SIGNUP_SIZE: int = 20
+    SEARCH_NGRAMS: bool = False
     SECRET_KEY: str
     SECRET_KEY_REFRESH: str
+    JWT_ALGORITHM: str = "HS256"
+    JWT_KEYS_DIR: str = "keys"
+    JWT_KEYS_RELOAD_SECONDS: float = 30
+    JWT_KEY_ACTIVATION_SECONDS: float = 300
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 1
+    TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS: float = 5
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"
+    LOGIN_RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    LOGIN_RATE_LIMIT_SHARDS: int = 64
+    LOGIN_RATE_LIMIT_MAX_KEYS: int = 100000
+    LOGIN_RATE_WINDOW_SECONDS: float = 60
+    LOGIN_MAX_ATTEMPTS_PER_IP: int = 30
+    LOGIN_MAX_ATTEMPTS_PER_ACCOUNT: int = 10
+    LOGIN_LOCKOUT_THRESHOLD: int = 5
+    LOGIN_LOCKOUT_BASE_SECONDS: float = 2
+    LOGIN_LOCKOUT_MAX_SECONDS: float = 900
+    LOGIN_FAILURES_TTL_SECONDS: int = 3600
+    BULK_SIGNUP_MAX_REQUESTS_PER_IP: int = 5
+    DOCUMENT_CACHE_BACKEND: str = "memory"
+    DOCUMENT_CACHE_MAX_SIZE: int = 10000
+    DOCUMENT_CACHE_TTL_SECONDS: float = 30
+    DOCUMENT_CACHE_MEMORY_TTL_SECONDS: float = 1
+    DOCUMENT_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
     SMTP_SERVER: str
     SMTP_PORT: int
     SMTP_USERNAME: EmailStr
     SMTP_PASSWORD: str
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 10
+    SMTP_POOL_SIZE: int = 2
+    SMTP_BATCH_SIZE: int = 20
+    SMTP_QUEUE_MAX_SIZE: int = 10000
+    SMTP_MAX_RETRIES: int = 5
+    SMTP_RETRY_BACKOFF_SECONDS: float = 1
+    SMTP_SHUTDOWN_TIMEOUT_SECONDS: float = 10
+    EMAIL_TEMPLATES_COMPILED_DIR: str | None = None
+    EMAIL_TEMPLATES_BYTECODE_CACHE_DIR: str | None = None
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    METRICS_MULTIPROCESS_DIR: str | None = None
+    METRICS_FLUSH_SECONDS: float = 5
+    METRICS_SLOW_REQUEST_SECONDS: float = 1
 
 
 settings = Settings()
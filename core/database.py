@@ -0,0 +1,129 @@
+import asyncio
+import importlib
+import threading
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from core.config import settings
+
+
+class PoolMetrics(ConnectionPoolListener):
+    # PyMongo publishes pool events from its own threads
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.checkout_wait_seconds += event.duration
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            average_wait = self.checkout_wait_seconds / self.checkouts if self.checkouts else 0.0
+            return {
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": average_wait * 1000,
+                "max_checkout_wait_ms": self.max_checkout_wait_seconds * 1000,
+            }
+
+    def collect(self):
+        stats = self.stats
+        return [("mongo_pool_open_connections", (), stats["open_connections"]),
+                ("mongo_pool_in_use_connections", (), stats["in_use"]),
+                ("mongo_pool_checkouts", (), stats["checkouts"]),
+                ("mongo_pool_checkout_failures", (), stats["checkout_failures"]),
+                ("mongo_pool_max_checkout_wait_ms", (), stats["max_checkout_wait_ms"])]
+
+
+pool_metrics = PoolMetrics()
+
+# Module pymongo imports for each wire compressor, and the package that provides it
+COMPRESSOR_MODULES = {
+    "zlib": ("zlib", "zlib"),
+    "zstd": ("zstandard", "zstandard"),
+    "snappy": ("snappy", "python-snappy"),
+}
+
+
+def validate_compressors(compressors: str) -> None:
+    # PyMongo only warns and drops a compressor whose codec is missing, the connection would silently go uncompressed
+    for compressor in compressors.split(","):
+        compressor = compressor.strip()
+        if compressor not in COMPRESSOR_MODULES:
+            raise RuntimeError(f"Unknown DB_COMPRESSORS entry {compressor}, expected {', '.join(COMPRESSOR_MODULES)}")
+        module, package = COMPRESSOR_MODULES[compressor]
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            raise RuntimeError(f"DB_COMPRESSORS={compressor} requires the {package} package")
+
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    if settings.DB_COMPRESSORS:
+        validate_compressors(settings.DB_COMPRESSORS)
+    options = {
+        "maxPoolSize": settings.DB_MAX_POOL_SIZE,
+        "minPoolSize": settings.DB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.DB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.DB_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": settings.DB_COMPRESSORS,
+        "readPreference": settings.DB_READ_PREFERENCE,
+    }
+    options = {key: value for key, value in options.items() if value is not None}
+    return AsyncIOMotorClient(settings.DB_CONNECTION, event_listeners=[pool_metrics], **options)
+
+
+async def warm_up_pool(client: AsyncIOMotorClient) -> None:
+    # minPoolSize is filled by a background thread, wait for it so the first requests don't pay the handshakes
+    await client.admin.command("ping")
+    deadline = time.monotonic() + settings.DB_WARMUP_TIMEOUT_SECONDS
+    while pool_metrics.open_connections < settings.DB_MIN_POOL_SIZE and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
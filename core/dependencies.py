@@ -0,0 +1,22 @@
+from typing import Type, Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+
+from repositories.base_repository import BaseRepository
+from repositories.indexes import REPOSITORIES
+from services.email_sending_service import EmailSendingService
+from services.email_templates import build_template_environment
+
+
+class AppDependencies:
+    # Stateless collaborators built once in the lifespan hook and shared by every request
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self._collections: Dict[Type[BaseRepository], AsyncIOMotorCollection] = {
+            repository: db.get_collection(repository.collection_name()) for repository in REPOSITORIES
+        }
+        self.templates = build_template_environment()
+        self.email_sender = EmailSendingService(self.templates)
+
+    def collection(self, repository: Type[BaseRepository]) -> AsyncIOMotorCollection:
+        return self._collections[repository]
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Tuple, Optional, Iterable, Callable, Awaitable
+
+import bson
+
+from core.config import settings
+
+CacheKey = str
+# Longer than any database read, a load that started before an invalidation can not cache the old document
+TOMBSTONE_SECONDS = 5
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: CacheKey) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: CacheKey, document: dict, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[CacheKey]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    # Per worker, with several workers a write only invalidates the worker that served it. The TTL is capped short
+    # so the other workers serve a changed or deleted document for at most max_ttl, use Redis for longer TTLs
+    def __init__(self, max_size: int, max_ttl: float):
+        self._max_size = max_size
+        self._max_ttl = max_ttl
+        self._entries: OrderedDict[CacheKey, Tuple[dict, float]] = OrderedDict()
+
+    async def get(self, key: CacheKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        document, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return document
+
+    async def set(self, key: CacheKey, document: dict, ttl: float) -> None:
+        self._entries[key] = (document, time.monotonic() + min(ttl, self._max_ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, keys: Iterable[CacheKey]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    # Any client with the redis.asyncio get/set/pipeline API works, e.g. fakeredis for a local stand-in.
+    # Delete wins: an invalidation leaves an empty tombstone and set never overwrites a key, so a load that read
+    # the old document in another worker before the write can not cache it after the invalidation
+    def __init__(self, client):
+        self._client = client
+
+    async def get(self, key: CacheKey) -> Optional[dict]:
+        value = await self._client.get(key)
+        return bson.decode(value) if value else None
+
+    async def set(self, key: CacheKey, document: dict, ttl: float) -> None:
+        await self._client.set(key, bson.encode(document), px=int(ttl * 1000), nx=True)
+
+    async def delete(self, keys: Iterable[CacheKey]) -> None:
+        keys = list(keys)
+        if keys:
+            pipeline = self._client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.set(key, b"", px=TOMBSTONE_SECONDS * 1000)
+            await pipeline.execute()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_cache_backend() -> Optional[CacheBackend]:
+    if settings.DOCUMENT_CACHE_BACKEND == "none":
+        return None
+    if settings.DOCUMENT_CACHE_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("DOCUMENT_CACHE_BACKEND=redis requires the redis package")
+        return RedisCacheBackend(redis.from_url(settings.DOCUMENT_CACHE_REDIS_URL))
+    return InMemoryCacheBackend(settings.DOCUMENT_CACHE_MAX_SIZE, settings.DOCUMENT_CACHE_MEMORY_TTL_SECONDS)
+
+
+class DocumentCache:
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self._backend = backend
+        self._ttl = ttl
+        # Invalidation drops the pending load, so a read that started before a write never caches the old document
+        self._loading: Dict[CacheKey, asyncio.Future] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(collection: str, _id: str) -> CacheKey:
+        return f"document:{collection}:{_id}"
+
+    async def get_or_load(self, collection: str, _id: str,
+                          loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        if self._backend is None:
+            return await loader()
+        key = self._key(collection, _id)
+        document = await self._backend.get(key)
+        if document is not None:
+            self._hits[collection] = self._hits.get(collection, 0) + 1
+            return document
+        self._misses[collection] = self._misses.get(collection, 0) + 1
+        loading = self._loading.get(key)
+        if loading is not None:
+            # Concurrent misses share the first database read instead of stampeding Mongo
+            return await asyncio.shield(loading)
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            document = await loader()
+            if document is not None and self._loading.get(key) is loading:
+                await self._backend.set(key, document, self._ttl)
+            loading.set_result(document)
+            return document
+        except BaseException as error:
+            loading.set_exception(error)
+            # Retrieved here so a failed load without waiters is not reported as never retrieved
+            loading.exception()
+            raise
+        finally:
+            if self._loading.get(key) is loading:
+                del self._loading[key]
+
+    async def invalidate(self, collection: str, ids: Iterable[str]) -> None:
+        if self._backend is None:
+            return
+        keys = [self._key(collection, _id) for _id in ids]
+        for key in keys:
+            self._loading.pop(key, None)
+        await self._backend.delete(keys)
+
+    async def close(self) -> None:
+        if self._backend is not None:
+            await self._backend.close()
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        stats = {}
+        for collection in set(self._hits) | set(self._misses):
+            hits, misses = self._hits.get(collection, 0), self._misses.get(collection, 0)
+            stats[collection] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+        return stats
+
+    def collect(self):
+        return [metric for collection, values in self.stats.items() for metric in (
+            ("document_cache_hits", (("collection", collection),), values["hits"]),
+            ("document_cache_misses", (("collection", collection),), values["misses"]),
+        )]
+
+
+document_cache = DocumentCache(build_cache_backend(), settings.DOCUMENT_CACHE_TTL_SECONDS)
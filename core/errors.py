@@ -62,6 +62,21 @@ class InvalidTokenError(_BaseErrors):
     description = "Invalid token"
 
 
+class ConflictError(_BaseErrors):
+    status = StatusRequest.CONFLICT
+    description = "Conflict"
+
+
+class TooManyRequestsError(_BaseErrors):
+    status = StatusRequest.TOO_MANY_REQUESTS
+    description = "Too many requests"
+
+
 class NotAvailableError(_BaseErrors):
     status = StatusRequest.BAD_REQUEST
     description = "Not available"
+
+
+class ServiceUnavailableError(_BaseErrors):
+    status = StatusRequest.SERVICE_UNAVAILABLE
+    description = "Service unavailable"
@@ -1,27 +1,51 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
+LOGGER_NAME = "joker_task"
+LOG_FILE = "logs/data_processor.log"
 
-def logger_api(id_logger_: str):
-    logger = logging.getLogger(id_logger_)
 
-    # Avoid reconfiguring the logger if it has already been configured
-    if not logger.hasHandlers():
-        logger.setLevel(logging.INFO)
+class _ProcessIdFilter(logging.Filter):
+    # Records logged outside a request (startup, shutdown) carry no process id
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "process_id"):
+            record.process_id = "-"
+        return True
 
-        # Log format
-        formatter = logging.Formatter(f'%(asctime)s - %(levelname)s: {id_logger_} - %(message)s',
-                                      datefmt='%m/%d/%Y %I:%M:%S %p')
 
-        # StreamHandler to print to console
-        stream_handler = logging.StreamHandler()
-        stream_handler.setFormatter(formatter)
+def _build_logger() -> tuple[logging.Logger, QueueListener]:
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
-        # FileHandler to save logs to a file
-        file_handler = logging.FileHandler("logs/data_processor.log")
-        file_handler.setFormatter(formatter)
+    # Log format
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(process_id)s - %(message)s',
+                                  datefmt='%m/%d/%Y %I:%M:%S %p')
 
-        # Add both handlers
-        logger.addHandler(stream_handler)
-        logger.addHandler(file_handler)
+    # StreamHandler to print to console
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
 
-    return logger
+    # FileHandler to save logs to a file
+    file_handler = logging.FileHandler(LOG_FILE)
+    file_handler.setFormatter(formatter)
+
+    # Request coroutines only enqueue records, the listener thread does the I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_ProcessIdFilter())
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, stream_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger, listener
+
+
+_logger, _listener = _build_logger()
+
+
+def logger_api(id_logger_: str) -> logging.LoggerAdapter:
+    return logging.LoggerAdapter(_logger, {"process_id": id_logger_})
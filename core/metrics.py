@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Tuple, List, Callable, Iterable, Optional
+
+from core.config import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# A live worker rewrites its snapshot every METRICS_FLUSH_SECONDS, one missing this many flushes is gone
+STALE_SNAPSHOT_FLUSHES = 3
+
+Labels = Tuple[Tuple[str, str], ...]
+MetricKey = Tuple[str, Labels]
+
+
+class RequestTrace:
+    __slots__ = ("process_id", "stages")
+
+    def __init__(self, process_id: Optional[str] = None):
+        self.process_id = process_id or str(uuid.uuid4())
+        self.stages: List[Tuple[str, float]] = []
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(DEFAULT_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    # Only mutated from the worker's event loop, so plain dicts are enough and no lock is taken
+    def __init__(self):
+        self._counters: Dict[MetricKey, float] = {}
+        self._histograms: Dict[MetricKey, _Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Labels, float]]]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def inc(self, name: str, labels: Labels, value: float = 1) -> None:
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram()
+        histogram.observe(value)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Labels, float]]]) -> None:
+        # Collectors report gauges read at scrape time, e.g. pool usage
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+            "histograms": [[name, labels, histogram.counts, histogram.sum, histogram.count]
+                           for (name, labels), histogram in self._histograms.items()],
+            "gauges": [[name, labels, value] for collector in self._collectors for name, labels, value in collector()],
+        }
+
+    @staticmethod
+    def merge(snapshots: Iterable[dict]) -> dict:
+        counters: Dict[MetricKey, float] = {}
+        gauges: Dict[MetricKey, float] = {}
+        histograms: Dict[MetricKey, list] = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            # Gauges are per worker state (pool in use, cache size), summing them would mean nothing
+            for name, labels, value in snapshot["gauges"]:
+                gauges[(name, (*(tuple(label) for label in labels), ("pid", str(snapshot["pid"]))))] = value
+            for name, labels, counts, total, count in snapshot["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                current = histograms.setdefault(key, [[0] * len(DEFAULT_BUCKETS), 0.0, 0])
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+                current[2] += count
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+            "histograms": [[name, labels, *values] for (name, labels), values in histograms.items()],
+            "gauges": [[name, labels, value] for (name, labels), value in gauges.items()],
+        }
+
+    @staticmethod
+    def render(snapshot: dict) -> str:
+        def format_labels(labels, extra: Labels = ()) -> str:
+            pairs = [f'{key}="{value}"' for key, value in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        typed = set()
+        for metric_type, entries in (("counter", snapshot["counters"]), ("gauge", snapshot["gauges"])):
+            for name, labels, value in sorted(entries, key=lambda entry: entry[0]):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    typed.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for name, labels, counts, total, count in sorted(snapshot["histograms"], key=lambda entry: entry[0]):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(DEFAULT_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(settings.METRICS_MULTIPROCESS_DIR, f"{os.getpid()}.json")
+
+    def _write_snapshot(self, snapshot: dict) -> None:
+        path = self._snapshot_path()
+        with open(f"{path}.tmp", "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(f"{path}.tmp", path)
+
+    def _remove_snapshot(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._snapshot_path())
+
+    @staticmethod
+    def _read_snapshots() -> List[dict]:
+        snapshots = []
+        stale_before = time.time() - settings.METRICS_FLUSH_SECONDS * STALE_SNAPSHOT_FLUSHES
+        for file_name in os.listdir(settings.METRICS_MULTIPROCESS_DIR):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(settings.METRICS_MULTIPROCESS_DIR, file_name)
+            # Removed by its worker meanwhile, or left behind by a worker that was killed
+            with contextlib.suppress(FileNotFoundError):
+                if os.path.getmtime(path) < stale_before:
+                    os.remove(path)
+                    continue
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+        return snapshots
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+            await asyncio.to_thread(self._write_snapshot, self.snapshot())
+
+    async def start(self) -> None:
+        # With several workers each process publishes its buffers to a shared directory, merged on scrape
+        if settings.METRICS_MULTIPROCESS_DIR:
+            os.makedirs(settings.METRICS_MULTIPROCESS_DIR, exist_ok=True)
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+            await asyncio.to_thread(self._remove_snapshot)
+
+    async def scrape(self) -> str:
+        snapshot = self.snapshot()
+        if settings.METRICS_MULTIPROCESS_DIR:
+            await asyncio.to_thread(self._write_snapshot, snapshot)
+            snapshot = self.merge(await asyncio.to_thread(self._read_snapshots))
+        return self.render(snapshot)
+
+
+metrics_registry = MetricsRegistry()
+
+
+def record_stage(stage: str, duration: float) -> None:
+    metrics_registry.observe("stage_duration_seconds", (("stage", stage),), duration)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.stages.append((stage, duration))
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def timed_stage(stage: str):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
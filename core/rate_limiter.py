@@ -0,0 +1,198 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.errors import TooManyRequestsError
+from models.responde_model import LocationError
+
+# Window index, hits in that window, hits in the previous one
+_Window = List[int]
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def hit(self, key: str, window_seconds: float) -> float:
+        pass
+
+    # Hint that a key may have state stored elsewhere. A per process backend can not see hints set by other
+    # workers, so by default every key may be flagged and the caller always reads the real state
+    async def flag(self, key: str, ttl_seconds: int) -> None:
+        pass
+
+    async def is_flagged(self, key: str) -> bool:
+        return True
+
+    async def unflag(self, key: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def _sliding_count(now: float, window_seconds: float, current: int, previous: int) -> float:
+    # Sliding window approximation, the previous window weighs by the part of it still inside the window
+    elapsed = (now % window_seconds) / window_seconds
+    return current + previous * (1 - elapsed)
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    # Only touched from the event loop, no lock needed. Sharded so a burst of distinct keys (random usernames)
+    # only sweeps a small part of the table
+    def __init__(self, shards: int, max_keys: int):
+        self._shards: List[Dict[str, _Window]] = [{} for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    async def hit(self, key: str, window_seconds: float) -> float:
+        now = time.monotonic()
+        index = int(now // window_seconds)
+        windows = self._shards[hash(key) % len(self._shards)]
+        window = windows.get(key)
+        if window is None or window[0] < index - 1:
+            window = windows[key] = [index, 0, 0]
+        elif window[0] == index - 1:
+            window[:] = [index, 0, window[1]]
+        window[1] += 1
+        if len(windows) > self._max_keys_per_shard:
+            self._evict(windows, index)
+        return _sliding_count(now, window_seconds, window[1], window[2])
+
+    def _evict(self, windows: Dict[str, _Window], index: int) -> None:
+        for key in [key for key, window in windows.items() if window[0] < index - 1]:
+            del windows[key]
+        # Still full of live keys: drop the oldest inserted ones, the limiter then fails open for them
+        while len(windows) > self._max_keys_per_shard:
+            del windows[next(iter(windows))]
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    # Shared between workers and instances, any redis.asyncio compatible client works
+    def __init__(self, client):
+        self._client = client
+
+    async def hit(self, key: str, window_seconds: float) -> float:
+        now = time.time()
+        index = int(now // window_seconds)
+        current_key = f"ratelimit:{key}:{index}"
+        pipeline = self._client.pipeline()
+        pipeline.incr(current_key)
+        pipeline.expire(current_key, int(window_seconds * 2) + 1)
+        pipeline.get(f"ratelimit:{key}:{index - 1}")
+        current, _, previous = await pipeline.execute()
+        return _sliding_count(now, window_seconds, int(current), int(previous or 0))
+
+    async def flag(self, key: str, ttl_seconds: int) -> None:
+        await self._client.set(f"flag:{key}", 1, ex=ttl_seconds)
+
+    async def is_flagged(self, key: str) -> bool:
+        return bool(await self._client.exists(f"flag:{key}"))
+
+    async def unflag(self, key: str) -> None:
+        await self._client.delete(f"flag:{key}")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_rate_limit_backend() -> RateLimitBackend:
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND=redis requires the redis package")
+        return RedisRateLimitBackend(redis.from_url(settings.LOGIN_RATE_LIMIT_REDIS_URL))
+    return InMemoryRateLimitBackend(settings.LOGIN_RATE_LIMIT_SHARDS, settings.LOGIN_RATE_LIMIT_MAX_KEYS)
+
+
+def _timestamp(value: datetime) -> float:
+    # Mongo datetimes are naive UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def normalize_account(username_or_email: str) -> str:
+    return username_or_email.strip().lower()
+
+
+class LoginRateLimiter:
+    # Everything here runs before the credentials lookup and bcrypt, a rejected guess costs no database round trip
+    def __init__(self, backend: RateLimitBackend):
+        self._backend = backend
+        self._lockouts: Dict[str, float] = {}
+        self.rejected = 0
+
+    async def check(self, client_ip: Optional[str], account: str) -> None:
+        window = settings.LOGIN_RATE_WINDOW_SECONDS
+        if client_ip is not None and \
+                await self._backend.hit(f"ip:{client_ip}", window) > settings.LOGIN_MAX_ATTEMPTS_PER_IP:
+            self._reject("Too many login attempts from this address, try again later")
+        if await self._backend.hit(f"account:{account}", window) > settings.LOGIN_MAX_ATTEMPTS_PER_ACCOUNT:
+            self._reject("Too many login attempts for this account, try again later")
+        locked_until = self._lockouts.get(account)
+        if locked_until is not None:
+            if locked_until > time.time():
+                self._reject(f"Account temporarily locked, try again in {int(locked_until - time.time()) + 1}s")
+            del self._lockouts[account]
+
+    async def check_bulk_signup(self, client_ip: Optional[str]) -> None:
+        # Bulk signup is anonymous and hashes a password per user, it shares the bcrypt pool with logins
+        window = settings.LOGIN_RATE_WINDOW_SECONDS
+        if client_ip is not None and \
+                await self._backend.hit(f"bulk-signup:{client_ip}", window) > settings.BULK_SIGNUP_MAX_REQUESTS_PER_IP:
+            self._reject("Too many bulk signups from this address, try again later")
+
+    def _reject(self, message: str) -> None:
+        self.rejected += 1
+        raise TooManyRequestsError(message=message, location=LocationError.Body)
+
+    @staticmethod
+    def _remember(entries: Dict[str, float], account: str, until: float) -> Dict[str, float]:
+        if len(entries) >= settings.LOGIN_RATE_LIMIT_MAX_KEYS:
+            now = time.time()
+            entries = {key: value for key, value in entries.items() if value > now}
+        entries[account] = until
+        return entries
+
+    def remember_lockout(self, account: str, locked_until: datetime) -> None:
+        # Local copy of the lockout stored in Mongo, repeated guesses on this worker skip the lockout lookup
+        self._lockouts = self._remember(self._lockouts, account, _timestamp(locked_until))
+
+    async def remember_failure(self, account: str) -> None:
+        # Lives as long as the login attempt record in Mongo, so the hint is never gone while failures are counted
+        await self._backend.flag(f"failures:{account}", settings.LOGIN_FAILURES_TTL_SECONDS)
+
+    async def has_failures(self, account: str) -> bool:
+        # With a shared backend only accounts that failed on any worker pay the login attempt lookup
+        return await self._backend.is_flagged(f"failures:{account}")
+
+    def check_lockout(self, account: str, locked_until: Optional[datetime]) -> None:
+        if locked_until is not None and _timestamp(locked_until) > time.time():
+            self.remember_lockout(account, locked_until)
+            self._reject(f"Account temporarily locked, try again in {int(_timestamp(locked_until) - time.time()) + 1}s")
+
+    async def forget(self, account: str) -> None:
+        self._lockouts.pop(account, None)
+        await self._backend.unflag(f"failures:{account}")
+
+    async def close(self) -> None:
+        await self._backend.close()
+
+    def collect(self):
+        return [("login_rate_limit_rejected", (), self.rejected),
+                ("login_lockouts_cached", (), len(self._lockouts))]
+
+
+login_rate_limiter = LoginRateLimiter(build_rate_limit_backend())
+
+
+def lockout_seconds(failures: int) -> float:
+    # Progressive delay: doubles with every failure past the threshold, capped
+    if failures < settings.LOGIN_LOCKOUT_THRESHOLD:
+        return 0
+    exponent = failures - settings.LOGIN_LOCKOUT_THRESHOLD
+    return min(settings.LOGIN_LOCKOUT_BASE_SECONDS * (2 ** min(exponent, 32)), settings.LOGIN_LOCKOUT_MAX_SECONDS)
+
+
+def locked_until(failures: int, last_failure: datetime) -> Optional[datetime]:
+    seconds = lockout_seconds(failures)
+    return last_failure + timedelta(seconds=seconds) if seconds else None
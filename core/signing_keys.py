@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+from jose.backends.base import Key
+
+from core.config import settings
+from core.logger import logger_api
+
+ASYMMETRIC_ALGORITHMS = ("ES256", "ES384", "RS256")
+
+_Listing = Tuple[Tuple[str, float], ...]
+
+
+class SigningKey:
+    def __init__(self, kid: Optional[str], algorithm: str, private_key: Key, public_key: Key, created_at: float):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.public_key = public_key
+        self.created_at = created_at
+
+
+def generate_private_key(algorithm: str) -> bytes:
+    if algorithm == "RS256":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1() if algorithm == "ES256" else ec.SECP384R1())
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption())
+
+
+def new_kid() -> str:
+    # Unique across hosts, two hosts adding a key in the same second still publish two different kids
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+
+
+def write_key(directory: str, kid: str, pem: bytes) -> bool:
+    # Written aside then linked into place: readers never see a partial key and an existing kid is never replaced
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kid}.pem")
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as key_file:
+        key_file.write(pem)
+    try:
+        os.link(temporary, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(temporary)
+
+
+class KeySet:
+    # Every <kid>.pem of the directory verifies tokens and is published in the JWKS, the newest active one signs
+    def __init__(self, algorithm: str, directory: str):
+        self.algorithm = algorithm
+        self.directory = directory
+        self._keys: Dict[Optional[str], SigningKey] = {}
+        self._active: Optional[SigningKey] = None
+        self._listing: Optional[_Listing] = None
+        self._jwks = b'{"keys":[]}'
+        self._reload_task: Optional[asyncio.Task] = None
+        self._logger = logger_api("signing-keys")
+        self.reloads = 0
+
+    def _list_directory(self) -> _Listing:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return ()
+        return tuple(sorted((name[:-len(".pem")], os.stat(os.path.join(self.directory, name)).st_mtime)
+                            for name in names if name.endswith(".pem")))
+
+    def load(self) -> None:
+        if self.algorithm == "HS256":
+            # Shared secret, nothing to publish, kept for deployments that have not provisioned keys yet
+            if not self._keys:
+                secret = jwk.construct(settings.SECRET_KEY, "HS256")
+                self._keys = {None: SigningKey(None, "HS256", secret, secret, 0)}
+            self._active = self._keys[None]
+            return
+        if self.algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise RuntimeError(f"Unsupported JWT_ALGORITHM {self.algorithm}, use one of ES256, ES384, RS256 or HS256")
+        listing = self._list_directory()
+        if not listing:
+            # Never generated here: hosts that do not share the directory would each sign with their own key
+            raise RuntimeError(f"JWT_ALGORITHM={self.algorithm} needs a key in {self.directory}, add one with "
+                               f"python -m core.signing_keys and share the directory with every host")
+        if listing != self._listing:
+            keys = {}
+            for kid, modified_at in listing:
+                key = self._keys.get(kid)
+                if key is None or key.created_at != modified_at:
+                    # Parsed once per kid and file version, signing and verification reuse the prepared key
+                    with open(os.path.join(self.directory, f"{kid}.pem"), "rb") as key_file:
+                        private_key = jwk.construct(key_file.read(), self.algorithm)
+                    key = SigningKey(kid, self.algorithm, private_key, private_key.public_key(), modified_at)
+                keys[kid] = key
+            self._keys = keys
+            self._listing = listing
+            self._jwks = json.dumps({"keys": [{**key.public_key.to_dict(), "kid": key.kid, "use": "sig"}
+                                              for key in keys.values()]}).encode()
+            self.reloads += 1
+        self._active = self._select_active()
+
+    def _select_active(self) -> SigningKey:
+        # A new key is only published at first, verifiers that cache the JWKS learn it before it signs anything
+        now = time.time()
+        keys = list(self._keys.values())
+        active = [key for key in keys if key.created_at + settings.JWT_KEY_ACTIVATION_SECONDS <= now] or keys
+        return max(active, key=lambda key: (key.created_at, key.kid))
+
+    @property
+    def signing_key(self) -> SigningKey:
+        if self._active is None:
+            self.load()
+        return self._active
+
+    def verification_key(self, kid: Optional[str]) -> Optional[SigningKey]:
+        if self._active is None:
+            self.load()
+        return self._keys.get(kid)
+
+    @property
+    def jwks(self) -> bytes:
+        if self._active is None:
+            self.load()
+        return self._jwks
+
+    async def _reload_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JWT_KEYS_RELOAD_SECONDS)
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as error:
+                self._logger.error(f"Signing keys reload failed: {error}")
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.load)
+        if self.algorithm != "HS256":
+            self._reload_task = asyncio.create_task(self._reload_periodically())
+
+    async def stop(self) -> None:
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+            self._reload_task = None
+
+    def collect(self):
+        return [("jwt_signing_keys", (), len(self._keys)),
+                ("jwt_signing_keys_reloads", (), self.reloads)]
+
+
+signing_keys = KeySet(settings.JWT_ALGORITHM, settings.JWT_KEYS_DIR)
+
+
+if __name__ == "__main__":
+    # Rotation: add a key here, every worker publishes it on its next reload and signs with it once it is active.
+    # Delete a retired key only after the access tokens it signed have expired
+    parser = argparse.ArgumentParser(description="Add a new signing key to JWT_KEYS_DIR")
+    parser.add_argument("--kid", default=new_kid())
+    arguments = parser.parse_args()
+    if not write_key(settings.JWT_KEYS_DIR, arguments.kid, generate_private_key(settings.JWT_ALGORITHM)):
+        parser.exit(1, f"Key {arguments.kid} already exists\n")
+    print(f"Added key {arguments.kid} to {settings.JWT_KEYS_DIR}")
@@ -0,0 +1,69 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Set, Tuple, Optional
+
+from core.config import settings
+from models.users import TokenData
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: OrderedDict[bytes, Tuple[TokenData, float]] = OrderedDict()
+        self._digests_by_user: Dict[str, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[TokenData]:
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        token_data, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(digest)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return token_data
+
+    def put(self, token: str, token_data: TokenData, expires_at: float) -> None:
+        if self._max_size <= 0:
+            return
+        digest = self._digest(token)
+        self._entries[digest] = (token_data, expires_at)
+        self._entries.move_to_end(digest)
+        self._digests_by_user.setdefault(token_data.id, set()).add(digest)
+        while len(self._entries) > self._max_size:
+            self._remove(next(iter(self._entries)))
+
+    def evict_user(self, user_id: str) -> None:
+        for digest in self._digests_by_user.pop(user_id, set()):
+            self._entries.pop(digest, None)
+
+    def _remove(self, digest: bytes) -> None:
+        token_data, _ = self._entries.pop(digest)
+        user_digests = self._digests_by_user.get(token_data.id)
+        if user_digests is not None:
+            user_digests.discard(digest)
+            if not user_digests:
+                del self._digests_by_user[token_data.id]
+
+    @property
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self._max_size, "hits": self.hits, "misses": self.misses}
+
+    def collect(self):
+        return [("token_cache_size", (), len(self._entries)),
+                ("token_cache_hits", (), self.hits),
+                ("token_cache_misses", (), self.misses)]
+
+
+verified_token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_SIZE)
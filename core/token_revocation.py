@@ -0,0 +1,95 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Callable, Awaitable, Iterable
+
+from core.config import settings
+from core.errors import UnauthorizedError
+from core.logger import logger_api
+from models.responde_model import LocationError
+from models.users import TokenData
+
+RevocationLoader = Callable[[Optional[datetime]], Awaitable[List[dict]]]
+
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenRevocationList:
+    # Entries only live as long as an access token issued before them, so both maps stay small and exact,
+    # a bloom filter would save little memory and turn false positives into spurious 401s
+    def __init__(self):
+        self._jtis: Dict[str, float] = {}
+        self._not_before: Dict[str, float] = {}
+        self._expires: Dict[str, float] = {}
+        self._cursor: Optional[datetime] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._logger = logger_api("token-revocation")
+        self.rejected = 0
+        self.synced_at: Optional[float] = None
+
+    def check(self, token_data: TokenData) -> None:
+        if (token_data.jti is not None and token_data.jti in self._jtis) or \
+                token_data.iat < self._not_before.get(token_data.id, 0):
+            self.rejected += 1
+            raise UnauthorizedError(message="Token has been revoked", location=LocationError.Headers)
+
+    def apply(self, documents: Iterable[dict]) -> None:
+        for document in documents:
+            expires_at = _timestamp(document["expires_at"])
+            if document.get("jti") is not None:
+                self._jtis[document["jti"]] = expires_at
+            elif document.get("not_before") is not None:
+                user_id = document["user_id"]
+                self._not_before[user_id] = max(self._not_before.get(user_id, 0), _timestamp(document["not_before"]))
+                self._expires[user_id] = max(self._expires.get(user_id, 0), expires_at)
+            updated_at = document["updated_at"]
+            if self._cursor is None or updated_at > self._cursor:
+                self._cursor = updated_at
+
+    def _purge(self) -> None:
+        now = time.time()
+        self._jtis = {jti: expires_at for jti, expires_at in self._jtis.items() if expires_at > now}
+        for user_id in [user_id for user_id, expires_at in self._expires.items() if expires_at <= now]:
+            del self._expires[user_id]
+            self._not_before.pop(user_id, None)
+
+    async def sync(self, loader: RevocationLoader) -> None:
+        # Re-reads a short overlap, a revocation written by another worker with a slightly older clock is not missed
+        since = self._cursor - timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS) \
+            if self._cursor is not None else None
+        self.apply(await loader(since))
+        self._purge()
+        self.synced_at = time.time()
+
+    async def _sync_periodically(self, loader: RevocationLoader) -> None:
+        while True:
+            await asyncio.sleep(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+            try:
+                await self.sync(loader)
+            except Exception as error:
+                self._logger.error(f"Token revocation sync failed: {error}")
+
+    async def start(self, loader: RevocationLoader) -> None:
+        await self.sync(loader)
+        self._sync_task = asyncio.create_task(self._sync_periodically(loader))
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    @property
+    def stats(self) -> dict:
+        return {"revoked_tokens": len(self._jtis), "revoked_users": len(self._not_before),
+                "rejected": self.rejected, "synced_at": self.synced_at}
+
+    def collect(self):
+        return [("token_revocation_tokens", (), len(self._jtis)),
+                ("token_revocation_users", (), len(self._not_before)),
+                ("token_revocation_rejected", (), self.rejected)]
+
+
+token_revocation_list = TokenRevocationList()
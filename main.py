@@ -1,30 +1,65 @@
+import functools
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
 
+from api.jwks.controllers.jwks_controller import jwks_router
 from api.routes import routes
 from core.config import settings
+from core.database import create_mongo_client, warm_up_pool, pool_metrics
+from core.document_cache import document_cache
+from core.dependencies import AppDependencies
+from core.metrics import metrics_registry
+from core.rate_limiter import login_rate_limiter
+from core.signing_keys import signing_keys
+from core.token_cache import verified_token_cache
+from core.token_revocation import token_revocation_list
+from repositories.indexes import ensure_all_indexes
+from repositories.revoked_tokens import RevokedTokensRepository
+from services.email_delivery_queue import email_delivery_queue
 from utils.app_exception_handler import app_exception_handler
+from utils.metrics_middleware import MetricsMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application starting...")
     env = settings.ENV
-    app.mongodb_client = AsyncIOMotorClient(settings.DB_CONNECTION)
+    app.mongodb_client = create_mongo_client()
     app.database = app.mongodb_client[settings.DB_NAME]
+    await warm_up_pool(app.mongodb_client)
+    await ensure_all_indexes(app.database)
+    app.dependencies = AppDependencies(app.database)
+    await signing_keys.start()
+    await token_revocation_list.start(functools.partial(RevokedTokensRepository.changed_since, app.database))
+    await email_delivery_queue.start()
+    await metrics_registry.start()
     print(f"Started successfully: {env}")
     yield
     print("Application closing...")
+    await metrics_registry.stop()
+    await token_revocation_list.stop()
+    await signing_keys.stop()
+    await email_delivery_queue.stop()
+    await document_cache.close()
+    await login_rate_limiter.close()
     app.mongodb_client.close()
 
 
 app = FastAPI(lifespan=lifespan, exception_handlers=app_exception_handler)
+app.add_middleware(MetricsMiddleware)
+metrics_registry.register_collector(pool_metrics.collect)
+metrics_registry.register_collector(verified_token_cache.collect)
+metrics_registry.register_collector(document_cache.collect)
+metrics_registry.register_collector(login_rate_limiter.collect)
+metrics_registry.register_collector(token_revocation_list.collect)
+metrics_registry.register_collector(signing_keys.collect)
 
 for route in routes:
     app.include_router(route, prefix=settings.API_STR)
+# Well known paths are resolved from the host root by gateways and JWT libraries
+app.include_router(jwks_router)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", reload=True)
@@ -6,7 +6,8 @@ from pydantic import BaseModel, Field, ConfigDict
 
 class BaseModelDB(BaseModel):
     __collection_name: str
-    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+    # Enums are stored by value at validation time, so model_dump(by_alias=True) is already a BSON document
+    model_config = ConfigDict(populate_by_name=True, extra="ignore", use_enum_values=True)
 
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from models.base_model import BaseModelDB
+
+
+class LoginAttemptsModel(BaseModelDB):
+    # Keyed by the normalized username or email, removed by the TTL index once expires_at passes.
+    # updated_at is the last failure, the lockout is derived from it and the failure count
+    _collection_name = 'login_attempts'
+    failures: int = 0
+    expires_at: datetime
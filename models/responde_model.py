@@ -14,6 +14,8 @@ class StatusRequest(Enum):
     FORBIDDEN = "FORBIDDEN", 403
     NOT_FOUND = "NOT_FOUND", 404
     METHOD_NOT_ALLOWED = "METHOD_NOT_ALLOWED", 405
+    CONFLICT = "CONFLICT", 409
+    TOO_MANY_REQUESTS = "TOO_MANY_REQUESTS", 429
     INTERNAL_SERVER_ERROR = "INTERNAL_SERVER_ERROR", 500
     SERVICE_UNAVAILABLE = "SERVICE_UNAVAILABLE", 503
 
@@ -49,6 +51,8 @@ class ResponseErrors(BaseModel):
     description: str
     message: str
     location: LocationError
+    # Position of the failed item in a bulk request body
+    index: Optional[int] = None
 
 
 class ResponseModel(BaseModel, Generic[DataType]):
@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Optional
+
+from models.base_model import BaseModelDB
+
+
+class RevokedTokensModel(BaseModelDB):
+    # Either one revoked jti, or every token of user_id issued before not_before
+    _collection_name = 'revoked_tokens'
+    user_id: str
+    jti: Optional[str] = None
+    not_before: Optional[datetime] = None
+    expires_at: datetime
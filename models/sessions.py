@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from models.base_model import BaseModelDB
+
+
+class SessionsModel(BaseModelDB):
+    # One document per logged in device, the refresh token itself is never stored, only its hash
+    _collection_name = 'sessions'
+    user_id: str
+    family_id: str
+    token_hash: str
+    expires_at: datetime
@@ -1,6 +1,4 @@
-from typing import List
-
-from pydantic import EmailStr, BaseModel
+from pydantic import EmailStr, BaseModel, Field, ConfigDict
 
 from models.base_model import BaseModelDB
 
@@ -13,9 +11,7 @@ class UsersModel(BaseModelDB):
     email: EmailStr
     password: str
     profile_picture: str = "/static/profile_pictures/default_profile_picture.png"
-    workspaces: List[object] = None
     user_verify_token: str | None = None
-    refresh_token: str | None = None
     password_reset_token: str | None = None
 
 
@@ -24,3 +20,18 @@ class TokenData(BaseModel):
     username: str
     full_name: str
     email: str
+    # Claims read back from a decoded token for revocation, never written into new tokens
+    jti: str | None = Field(default=None, exclude=True)
+    iat: float = Field(default=0, exclude=True)
+    fid: str | None = Field(default=None, exclude=True)
+
+
+class UserCredentials(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
+    id: str = Field(alias="_id")
+    username: str
+    full_name: str
+    email: str
+    password: str
+    is_verified: bool = False
@@ -0,0 +1,19 @@
+from enum import Enum
+
+from models.base_model import BaseModelDB
+
+
+class WorkspaceRole(str, Enum):
+    Owner = "owner"
+    Admin = "admin"
+    Member = "member"
+
+    def __str__(self):
+        return self.value
+
+
+class WorkspaceMembersModel(BaseModelDB):
+    _collection_name = 'workspace_members'
+    workspace_id: str
+    user_id: str
+    role: WorkspaceRole = WorkspaceRole.Member
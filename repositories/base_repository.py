@@ -1,24 +1,141 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import re
 from datetime import datetime
 from enum import Enum
-from typing import TypeVar, Generic, Type, List
+from typing import TypeVar, Generic, Type, List, AsyncIterator, Optional, Tuple, Dict, Set
 
-from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection, AsyncIOMotorCursor
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from core.errors import InvalidParameterError, NotFoundError
+from core.config import settings
+from core.document_cache import document_cache
+from core.errors import InvalidParameterError, NotFoundError, ConflictError, NotAvailableError, BaseErrors
+from core.metrics import timed_stage
 from models.responde_model import LocationError
 from schemas.api_response import ApiResponse
+from utils.search import normalize_search_key, search_ngrams, prefix_upper_bound, NGRAM_SIZE
 
 DBModel = TypeVar('DBModel', bound=BaseModel)
+OutputModel = TypeVar('OutputModel', bound=BaseModel)
+QueryShape = Tuple[dict, Optional[List[Tuple[str, int]]]]
+# Errors of a bulk operation, keyed by the position of the item in the operation list
+BulkErrors = Dict[int, BaseErrors]
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+@functools.lru_cache
+def projection_for(output_model: Type[BaseModel]) -> dict:
+    return {("_id" if field == "id" else field): 1 for field in output_model.model_fields}
+
+
+def _same_index(existing: dict, declared: dict) -> bool:
+    if existing["key"] != list(declared["key"].items()):
+        return False
+    options = {key: value for key, value in declared.items() if key not in ("key", "name")}
+    return all(existing.get(key) == value for key, value in options.items()) and \
+        existing.get("unique", False) == declared.get("unique", False)
+
+
+def search_indexes(fields: List[str]) -> List[IndexModel]:
+    # (key, _id) serves both the prefix range and the keyset order, the n-gram arrays only exist when enabled
+    indexes = [IndexModel([(f"search.{field}", ASCENDING), ("_id", ASCENDING)], name=f"search_{field}",
+                          partialFilterExpression={"is_deleted": False}) for field in fields]
+    if settings.SEARCH_NGRAMS:
+        indexes += [IndexModel([(f"search.{field}_ngrams", ASCENDING)], name=f"search_{field}_ngrams",
+                               partialFilterExpression={"is_deleted": False}) for field in fields]
+    return indexes
+
+
+def search_query_shapes(fields: List[str]) -> List[QueryShape]:
+    shapes = []
+    for field in fields:
+        sort = [(f"search.{field}", ASCENDING), ("_id", ASCENDING)]
+        shapes += [
+            ({f"search.{field}": {"$gte": "", "$lt": ""}, "is_deleted": False}, sort),
+            ({"$or": [{f"search.{field}": {"$gt": "", "$lt": ""}}, {f"search.{field}": "", "_id": {"$gt": ""}}],
+              "is_deleted": False}, sort),
+        ]
+        if settings.SEARCH_NGRAMS:
+            shapes.append(({f"search.{field}_ngrams": {"$all": [""]}, "is_deleted": False}, sort))
+    return shapes
 
 
 class BaseRepository(Generic[DBModel]):
     _entity_model = Type[DBModel]
+    _indexes: List[IndexModel] = []
+    # get_by_id goes through the shared document cache, writes through the repository invalidate it
+    _cached: bool = False
+    # Fields matched by search(), each one keeps a normalized copy under search.<field>, in listing priority order
+    _search_fields: List[str] = []
+    # Filters (and sorts) issued by the repository methods, used to check that every query is indexed
+    _query_shapes: List[QueryShape] = [
+        ({"_id": "", "is_deleted": False}, None),
+        ({"is_deleted": False}, [("_id", ASCENDING)]),
+        ({"_id": {"$in": [""]}, "is_deleted": False}, None),
+    ]
 
-    def __init__(self, db: AsyncIOMotorDatabase, api_response: ApiResponse):
-        self.collection: AsyncIOMotorCollection = db.get_collection(self._entity_model._collection_name.default)
+    def __init__(self, collection: AsyncIOMotorCollection, api_response: ApiResponse):
+        self.collection = collection
         self.api_response = api_response
 
+    @classmethod
+    def collection_name(cls) -> str:
+        return cls._entity_model._collection_name.default
+
+    @classmethod
+    async def ensure_indexes(cls, db: AsyncIOMotorDatabase) -> List[str]:
+        if not cls._indexes:
+            return []
+        collection = db.get_collection(cls.collection_name())
+        existing_indexes = await collection.index_information()
+        for index in cls._indexes:
+            name = index.document["name"]
+            if name in existing_indexes and not _same_index(existing_indexes[name], index.document):
+                await collection.drop_index(name)
+        return await collection.create_indexes(cls._indexes)
+
+    @classmethod
+    def to_document(cls, instance: BaseModel) -> dict:
+        document = instance.model_dump(by_alias=True)
+        if cls._search_fields:
+            document["search"] = cls._search_keys(document)
+        return document
+
+    @classmethod
+    def _search_keys(cls, data: dict) -> dict:
+        keys = {}
+        for field in cls._search_fields:
+            if data.get(field) is not None:
+                keys[field] = normalize_search_key(data[field])
+                if settings.SEARCH_NGRAMS:
+                    keys[f"{field}_ngrams"] = search_ngrams(keys[field])
+        return keys
+
+    @classmethod
+    async def backfill_search_keys(cls, db: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+        # For documents written before search existed, or after SEARCH_NGRAMS is switched on
+        if not cls._search_fields:
+            return 0
+        collection = db.get_collection(cls.collection_name())
+        updated = 0
+        operations = []
+        async for document in collection.find({}, {field: 1 for field in cls._search_fields}):
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {"search": cls._search_keys(document)}}))
+            if len(operations) == batch_size:
+                await collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        return updated
+
     @staticmethod
     def convert_enum_values(data):
         if isinstance(data, dict):
@@ -30,59 +147,277 @@ class BaseRepository(Generic[DBModel]):
         else:
             return data
 
+    @timed_stage("mongo.create")
     async def create(self, data_create: dict, raise_exception: bool = True, session=None) -> DBModel:
         self.api_response.logger.info("Creating instance in database")
         created_instance = self._entity_model.model_validate(data_create)
-        instance = self.convert_enum_values(created_instance.model_dump())
-        instance["_id"] = instance.pop("id")
-        await self.collection.insert_one(instance, session=session)
+        try:
+            await self.collection.insert_one(self.to_document(created_instance), session=session)
+        except DuplicateKeyError as error:
+            # The availability checks run before the insert, a concurrent request can still take the value first
+            raise self._not_available((error.details or {}).get("keyValue"))
         if not created_instance and raise_exception:
             raise InvalidParameterError(message="Instance not created", location=LocationError.Body)
         self.api_response.logger.info("Instance created successfully in database")
         return created_instance
 
-    async def get_by_id(self, _id: str, raise_exception: bool = True) -> DBModel | None:
+    @timed_stage("mongo.create_many")
+    async def create_many(self, data_create: List[dict]) -> Tuple[List[DBModel], BulkErrors]:
+        self.api_response.logger.info("Creating instances in database")
+        created_instances = [self._entity_model.model_validate(data) for data in data_create]
+        instances = [self.to_document(created_instance) for created_instance in created_instances]
+        errors = {}
+        if instances:
+            try:
+                await self.collection.insert_many(instances, ordered=False)
+            except BulkWriteError as bulk_error:
+                errors = self._bulk_errors(bulk_error)
+        self.api_response.logger.info(f"{len(instances) - len(errors)} instances created successfully in database")
+        return [instance for index, instance in enumerate(created_instances) if index not in errors], errors
+
+    @staticmethod
+    def _not_available(key_value: Optional[dict]) -> NotAvailableError:
+        return NotAvailableError(message=f"The value {key_value} is not available, it already exists",
+                                 location=LocationError.Body)
+
+    @staticmethod
+    def _bulk_errors(bulk_error: BulkWriteError) -> BulkErrors:
+        errors = {}
+        for write_error in bulk_error.details.get("writeErrors", []):
+            if write_error.get("code") == DUPLICATE_KEY_ERROR:
+                errors[write_error["index"]] = BaseRepository._not_available(write_error.get("keyValue"))
+            else:
+                errors[write_error["index"]] = InvalidParameterError(message=write_error.get("errmsg"),
+                                                                     location=LocationError.Body)
+        return errors
+
+    @timed_stage("mongo.bulk_write")
+    async def bulk_write(self, operations: list) -> BulkErrors:
+        # Unordered, a failing operation does not stop the rest of the batch
+        if not operations:
+            return {}
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as bulk_error:
+            return self._bulk_errors(bulk_error)
+        return {}
+
+    @timed_stage("mongo.get_many")
+    async def get_many(self, ids: List[str], output_model: Type[OutputModel]) -> Dict[str, OutputModel]:
+        self.api_response.logger.info("Getting instances by id from database")
+        cursor = self.collection.find({"_id": {"$in": ids}, "is_deleted": False}, projection_for(output_model))
+        return {instance["_id"]: output_model.model_validate(instance) async for instance in cursor}
+
+    async def _invalidate(self, ids: List[str]) -> None:
+        if self._cached:
+            await document_cache.invalidate(self.collection.name, ids)
+
+    async def _existing_ids(self, ids: List[str]) -> Set[str]:
+        cursor = self.collection.find({"_id": {"$in": ids}, "is_deleted": False}, {"_id": 1})
+        return {instance["_id"] async for instance in cursor}
+
+    @timed_stage("mongo.get_by_id")
+    async def get_by_id(self, _id: str, raise_exception: bool = True, use_cache: bool = True) -> DBModel | None:
+        # use_cache=False for reads that must see the latest write of any worker (tokens, password hashes)
         self.api_response.logger.info("Getting instance from database")
-        instance_found = await self.collection.find_one({"_id": _id, "is_deleted": False})
-        if not instance_found and raise_exception:
-            raise NotFoundError(message="Instance not found", location=LocationError.Path)
+        if self._cached and use_cache:
+            instance_found = await document_cache.get_or_load(
+                self.collection.name, _id, lambda: self.collection.find_one({"_id": _id, "is_deleted": False}))
+        else:
+            instance_found = await self.collection.find_one({"_id": _id, "is_deleted": False})
+        if not instance_found:
+            if raise_exception:
+                raise NotFoundError(message="Instance not found", location=LocationError.Path)
+            return None
         self.api_response.logger.info("Instance found successfully in database")
         return self._entity_model.model_validate(instance_found)
 
-    async def get_all(self, raise_exception: bool = True) -> List[DBModel] | None:
+    def _find_all(self, after: Optional[str] = None, output_model: Optional[Type[BaseModel]] = None,
+                  limit: Optional[int] = None) -> AsyncIOMotorCursor:
+        # Keyset pagination over the _id index, `after` is the id of the last instance of the previous page
+        query = {"is_deleted": False}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        projection = projection_for(output_model) if output_model else None
+        cursor = self.collection.find(query, projection).sort("_id", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit).batch_size(limit)
+        return cursor
+
+    @timed_stage("mongo.get_all")
+    async def get_all(self, raise_exception: bool = True, limit: Optional[int] = None, after: Optional[str] = None,
+                      output_model: Optional[Type[OutputModel]] = None) -> List[DBModel | OutputModel] | None:
         self.api_response.logger.info("Getting all instances from database")
-        instances_found = self.collection.find({"is_deleted": False})
-        list_instances = await instances_found.to_list()
-        if not list_instances and raise_exception:
+        model = output_model or self._entity_model
+        instances_found = self._find_all(after, output_model, limit)
+        list_instances = await instances_found.to_list(length=limit)
+        if not list_instances and after is None and raise_exception:
             raise NotFoundError(message="There are no instances", location=LocationError.Path)
         instances = []
         for instance in list_instances:
-            instances.append(self._entity_model.model_validate(instance))
+            instances.append(model.model_validate(instance))
         self.api_response.logger.info("Instances found successfully in database")
         return instances
 
-    async def patch(self, _id: str, data_update: BaseModel) -> DBModel:
+    async def stream_all(self, output_model: Type[OutputModel],
+                         after: Optional[str] = None) -> AsyncIterator[OutputModel]:
+        self.api_response.logger.info("Streaming all instances from database")
+        async for instance in self._find_all(after, output_model):
+            yield output_model.model_validate(instance)
+        self.api_response.logger.info("Instances streamed successfully from database")
+
+    def _search_filter(self, position: int, query: str, infix: bool,
+                       cursor: Optional[Tuple[str, str]]) -> dict:
+        key_field = f"search.{self._search_fields[position]}"
+        if infix:
+            # The n-grams narrow the candidates through the index, the regex drops the ones that only share n-grams
+            match = {"$regex": re.escape(query)}
+            search_filter = {key_field: match, f"{key_field}_ngrams": {"$all": search_ngrams(query)}}
+            upper_bound = {}
+        else:
+            bound = prefix_upper_bound(query)
+            upper_bound = {"$lt": bound} if bound is not None else {}
+            match = {"$gte": query, **upper_bound}
+            search_filter = {key_field: match} if cursor is None else {}
+        if cursor is not None:
+            # Both branches keep the prefix bounds, each one is a tight range of the (key, _id) index
+            last_key, last_id = cursor
+            search_filter["$or"] = [{key_field: {"$gt": last_key, **upper_bound}},
+                                    {key_field: last_key, "_id": {"$gt": last_id}}]
+        # A document is only listed under the first of the fields it matches, so the merged pages have no duplicates
+        for earlier_field in self._search_fields[:position]:
+            search_filter[f"search.{earlier_field}"] = {"$not": match}
+        search_filter["is_deleted"] = False
+        return search_filter
+
+    async def _search_cursor(self, query: str, infix: bool, after: str) -> Tuple[str, str]:
+        document = await self.collection.find_one({"_id": after, "is_deleted": False},
+                                                  {f"search.{field}": 1 for field in self._search_fields})
+        keys = (document or {}).get("search", {})
+        for field in self._search_fields:
+            key = keys.get(field)
+            if key is not None and (query in key if infix else key.startswith(query)):
+                return key, after
+        raise InvalidParameterError(message="The after instance does not match the search",
+                                    location=LocationError.Query)
+
+    @timed_stage("mongo.search")
+    async def search(self, query: str, limit: int, output_model: Type[OutputModel], after: Optional[str] = None,
+                     infix: bool = False) -> List[OutputModel]:
+        self.api_response.logger.info("Searching instances in database")
+        query = normalize_search_key(query)
+        if not query:
+            raise InvalidParameterError(message="The search query is empty", location=LocationError.Query)
+        if infix and not settings.SEARCH_NGRAMS:
+            raise InvalidParameterError(message="Infix search is not enabled", location=LocationError.Query)
+        if infix and len(query) < NGRAM_SIZE:
+            raise InvalidParameterError(message=f"Infix search needs at least {NGRAM_SIZE} characters",
+                                        location=LocationError.Query)
+        cursor = await self._search_cursor(query, infix, after) if after is not None else None
+        projection = {**projection_for(output_model), **{f"search.{field}": 1 for field in self._search_fields}}
+        # One index range per field, each already sorted by (key, _id), merged like a keyset page over all of them
+        found = await asyncio.gather(*(
+            self.collection.find(self._search_filter(position, query, infix, cursor), projection)
+            .sort([(f"search.{field}", ASCENDING), ("_id", ASCENDING)]).limit(limit).to_list(length=limit)
+            for position, field in enumerate(self._search_fields)))
+        merged = heapq.merge(*([(document["search"][field], document["_id"], document) for document in documents]
+                               for field, documents in zip(self._search_fields, found)))
+        instances = [output_model.model_validate(document) for _, _, document in itertools.islice(merged, limit)]
+        self.api_response.logger.info(f"{len(instances)} instances found in database")
+        return instances
+
+    def _build_patch(self, data: dict) -> dict:
+        # None clears optional fields, it is never written over a required one
+        to_set = {"updated_at": datetime.utcnow()}
+        to_unset = {}
+        for field, value in data.items():
+            if field in ("id", "_id", "created_at", "updated_at"):
+                continue
+            if value is None:
+                model_field = self._entity_model.model_fields.get(field)
+                if model_field is not None and not model_field.is_required():
+                    to_unset[field] = ""
+                continue
+            to_set[field] = value
+        for field, key in self._search_keys(to_set).items():
+            to_set[f"search.{field}"] = key
+        update = {"$set": to_set}
+        if to_unset:
+            update["$unset"] = to_unset
+        return update
+
+    @timed_stage("mongo.patch")
+    async def patch(self, _id: str, data_update: BaseModel | dict,
+                    expected_updated_at: Optional[datetime] = None) -> DBModel:
         self.api_response.logger.info("Patching instance in database")
-        instance_found = await self.get_by_id(_id)
-        data = data_update.model_dump(exclude_unset=True)
-        data_copy = instance_found.model_copy(update=data)
-        updated_instance = await self.update(_id, data_copy.model_dump())
+        if isinstance(data_update, BaseModel):
+            data_update = data_update.model_dump(exclude_unset=True)
+        query = {"_id": _id, "is_deleted": False}
+        if expected_updated_at is not None:
+            query["updated_at"] = expected_updated_at
+        update = self._build_patch(self.convert_enum_values(data_update))
+        try:
+            updated_instance = await self.collection.find_one_and_update(query, update,
+                                                                         return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError as error:
+            raise self._not_available((error.details or {}).get("keyValue"))
+        # Also on a conflict, the cached copy is the likely reason the caller had a stale updated_at
+        await self._invalidate([_id])
+        if not updated_instance:
+            if expected_updated_at is not None and \
+                    await self.collection.count_documents({"_id": _id, "is_deleted": False}, limit=1):
+                raise ConflictError(message="Instance was modified by another request", location=LocationError.Body)
+            raise NotFoundError(message="Instance not found", location=LocationError.Path)
         self.api_response.logger.info("Instance updated successfully in database")
         return self._entity_model.model_validate(updated_instance)
 
-    async def update(self, _id: str, data_update: dict, raise_exception: bool = True) -> DBModel:
-        self.api_response.logger.info("Updating instance in database")
-        data_update["updated_at"] = datetime.utcnow()
-        data_update["_id"] = data_update.pop("id")
-        update = await self.collection.update_one({"_id": _id}, {"$set": data_update})
-        if not update and raise_exception:
-            raise InvalidParameterError(message="Non updated instance", location=LocationError.Body)
-        updated_instance = await self.collection.find_one({"_id": _id})
-        return self._entity_model.model_validate(updated_instance)
+    @timed_stage("mongo.patch_many")
+    async def patch_many(self, updates: List[Tuple[str, BaseModel | dict]]) -> Tuple[Dict[int, DBModel], BulkErrors]:
+        self.api_response.logger.info("Patching instances in database")
+        operations = []
+        for _id, data_update in updates:
+            if isinstance(data_update, BaseModel):
+                data_update = data_update.model_dump(exclude_unset=True)
+            operations.append(UpdateOne({"_id": _id, "is_deleted": False},
+                                        self._build_patch(self.convert_enum_values(data_update))))
+        errors = await self.bulk_write(operations)
+        await self._invalidate([_id for _id, _ in updates])
+        ids = [_id for index, (_id, _) in enumerate(updates) if index not in errors]
+        cursor = self.collection.find({"_id": {"$in": ids}, "is_deleted": False})
+        found_instances = {instance["_id"]: instance async for instance in cursor}
+        updated_instances = {}
+        for index, (_id, _) in enumerate(updates):
+            if index in errors:
+                continue
+            if _id not in found_instances:
+                errors[index] = NotFoundError(message=f"Instance {_id} not found", location=LocationError.Body)
+                continue
+            updated_instances[index] = self._entity_model.model_validate(found_instances[_id])
+        self.api_response.logger.info(f"{len(updated_instances)} instances updated successfully in database")
+        return updated_instances, errors
 
+    @timed_stage("mongo.delete")
     async def delete(self, _id: str, raise_exception: bool = True) -> None:
         self.api_response.logger.info("Deleting instance from database")
         instance = await self.collection.find_one_and_delete({"_id": _id})
+        await self._invalidate([_id])
         if not instance and raise_exception:
             raise NotFoundError(message="Instance not found", location=LocationError.Path)
         self.api_response.logger.info("Instance deleted successfully in database")
+
+    @timed_stage("mongo.delete_many")
+    async def delete_many(self, ids: List[str], soft_delete: bool = False) -> BulkErrors:
+        self.api_response.logger.info("Deleting instances from database")
+        existing_ids = await self._existing_ids(ids)
+        errors = {index: NotFoundError(message=f"Instance {_id} not found", location=LocationError.Body)
+                  for index, _id in enumerate(ids) if _id not in existing_ids}
+        if existing_ids:
+            query = {"_id": {"$in": list(existing_ids)}}
+            if soft_delete:
+                await self.collection.update_many(query, {"$set": {"is_deleted": True,
+                                                                   "updated_at": datetime.utcnow()}})
+            else:
+                await self.collection.delete_many(query)
+            await self._invalidate(list(existing_ids))
+        self.api_response.logger.info(f"{len(existing_ids)} instances deleted successfully in database")
+        return errors
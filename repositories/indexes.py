@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional, Type
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from repositories.base_repository import BaseRepository
+from repositories.login_attempts import LoginAttemptsRepository
+from repositories.revoked_tokens import RevokedTokensRepository
+from repositories.sessions import SessionsRepository
+from repositories.users import UsersRepository
+from repositories.workspace_members import WorkspaceMembersRepository
+from repositories.workspaces import WorkspacesRepository
+
+REPOSITORIES: List[Type[BaseRepository]] = [UsersRepository, WorkspacesRepository, WorkspaceMembersRepository,
+                                             LoginAttemptsRepository, SessionsRepository, RevokedTokensRepository]
+LOCKS_COLLECTION = "locks"
+INDEXES_LOCK_ID = "ensure_indexes"
+# Taken over after this long, so a worker killed while reconciling does not block the next deploys
+INDEXES_LOCK_SECONDS = 600
+
+
+async def _acquire_indexes_lock(db: AsyncIOMotorDatabase) -> bool:
+    now = datetime.utcnow()
+    try:
+        # The upsert only inserts when no live lock matches, a live one makes it fail on the _id
+        await db.get_collection(LOCKS_COLLECTION).update_one(
+            {"_id": INDEXES_LOCK_ID, "expires_at": {"$lt": now}},
+            {"$set": {"expires_at": now + timedelta(seconds=INDEXES_LOCK_SECONDS)}}, upsert=True)
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def ensure_all_indexes(db: AsyncIOMotorDatabase) -> bool:
+    # Every worker runs the startup, only the one holding the lock reconciles so no two drop and build concurrently
+    if not await _acquire_indexes_lock(db):
+        return False
+    try:
+        for repository in REPOSITORIES:
+            await repository.ensure_indexes(db)
+    finally:
+        await db.get_collection(LOCKS_COLLECTION).delete_one({"_id": INDEXES_LOCK_ID})
+    return True
+
+
+def _plan_stages(plan) -> List[str]:
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for value in plan.values():
+        stages.extend(_plan_stages(value))
+    return stages
+
+
+async def explain_queries(db: AsyncIOMotorDatabase) -> bool:
+    all_indexed = True
+    for repository in REPOSITORIES:
+        collection = db.get_collection(repository.collection_name())
+        for query_filter, sort in repository._query_shapes:
+            cursor = collection.find(query_filter)
+            if sort:
+                cursor = cursor.sort(sort)
+            explanation = await cursor.explain()
+            stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+            indexed = "COLLSCAN" not in stages
+            all_indexed = all_indexed and indexed
+            print(f"{'OK' if indexed else 'COLLSCAN'} - {collection.name} - {query_filter} "
+                  f"sort={sort} - {' > '.join(stages)}")
+    return all_indexed
+
+
+async def main(create: bool, backfill_search: bool, backfill_owner: Optional[str]) -> int:
+    client = AsyncIOMotorClient(settings.DB_CONNECTION)
+    try:
+        db = client[settings.DB_NAME]
+        if create:
+            await ensure_all_indexes(db)
+        if backfill_search:
+            for repository in REPOSITORIES:
+                updated = await repository.backfill_search_keys(db)
+                if updated:
+                    print(f"Backfilled search keys of {updated} {repository.collection_name()}")
+        if backfill_owner is not None:
+            if not await db.get_collection(UsersRepository.collection_name()).find_one(
+                    {"_id": backfill_owner, "is_deleted": False}, {"_id": 1}):
+                print(f"User {backfill_owner} not found")
+                return 1
+            created = await WorkspaceMembersRepository.backfill_owners(db, backfill_owner)
+            print(f"Made {backfill_owner} the owner of {created} workspaces without owner")
+        return 0 if await explain_queries(db) else 1
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain every repository query and fail on collection scans")
+    parser.add_argument("--create", action="store_true", help="Create or reconcile the indexes before explaining")
+    parser.add_argument("--backfill-search", action="store_true",
+                        help="Recompute the search keys of every document, e.g. after enabling SEARCH_NGRAMS")
+    parser.add_argument("--backfill-owner", metavar="USER_ID",
+                        help="Make this user the owner of every workspace created before memberships existed, "
+                             "workspace writes require the owner or admin role")
+    arguments = parser.parse_args()
+    sys.exit(asyncio.run(main(arguments.create, arguments.backfill_search, arguments.backfill_owner)))
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+from core.config import settings
+from core.metrics import timed_stage
+from core.rate_limiter import locked_until
+from models.login_attempts import LoginAttemptsModel
+from repositories.base_repository import BaseRepository
+
+
+class LoginAttemptsRepository(BaseRepository[LoginAttemptsModel]):
+    _entity_model = LoginAttemptsModel
+    _indexes = [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    _query_shapes = [
+        ({"_id": ""}, None),
+    ]
+
+    @timed_stage("mongo.get_login_attempt")
+    async def get_attempt(self, account: str) -> LoginAttemptsModel | None:
+        attempt = await self.collection.find_one({"_id": account})
+        return LoginAttemptsModel.model_validate(attempt) if attempt else None
+
+    @timed_stage("mongo.record_login_failure")
+    async def record_failure(self, account: str) -> datetime | None:
+        self.api_response.logger.info("Recording failed login attempt")
+        now = datetime.utcnow()
+        # A single write, the lockout is derived from the returned count and the time of this failure
+        attempt = await self.collection.find_one_and_update(
+            {"_id": account},
+            {"$inc": {"failures": 1},
+             "$set": {"updated_at": now, "expires_at": now + timedelta(seconds=settings.LOGIN_FAILURES_TTL_SECONDS)},
+             "$setOnInsert": {"created_at": now, "is_deleted": False}},
+            projection={"failures": 1}, upsert=True, return_document=ReturnDocument.AFTER)
+        return locked_until(attempt["failures"], now)
+
+    @timed_stage("mongo.clear_login_attempts")
+    async def clear(self, account: str) -> None:
+        await self.collection.delete_one({"_id": account})
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+from core.metrics import timed_stage
+from core.token_cache import verified_token_cache
+from core.token_revocation import token_revocation_list
+from models.revoked_tokens import RevokedTokensModel
+from repositories.base_repository import BaseRepository
+from utils.tokens_jwt import ACCESS_TOKEN_EXPIRE_MINUTES
+
+
+class RevokedTokensRepository(BaseRepository[RevokedTokensModel]):
+    _entity_model = RevokedTokensModel
+    _indexes = [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ]
+    _query_shapes = [
+        ({}, [("updated_at", ASCENDING)]),
+        ({"updated_at": {"$gt": ""}}, [("updated_at", ASCENDING)]),
+    ]
+
+    @staticmethod
+    def _expires_at(now: datetime) -> datetime:
+        # Past this point every token the entry could reject has expired by itself
+        return now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    @timed_stage("mongo.revoke_token")
+    async def revoke_token(self, jti: str, user_id: str) -> None:
+        self.api_response.logger.info("Revoking access token")
+        now = datetime.utcnow()
+        document = {"user_id": user_id, "jti": jti, "expires_at": self._expires_at(now), "updated_at": now}
+        await self.collection.update_one(
+            {"_id": f"jti:{jti}"},
+            {"$set": document, "$setOnInsert": {"created_at": now, "is_deleted": False}}, upsert=True)
+        # Applied locally right away, the other workers pick it up on their next sync
+        token_revocation_list.apply([document])
+
+    @timed_stage("mongo.revoke_user_tokens")
+    async def revoke_user_tokens(self, user_ids: List[str]) -> None:
+        if not user_ids:
+            return
+        self.api_response.logger.info("Revoking access tokens of users")
+        now = datetime.utcnow()
+        documents = [{"user_id": user_id, "not_before": now, "expires_at": self._expires_at(now), "updated_at": now}
+                     for user_id in user_ids]
+        await self.collection.bulk_write(
+            [UpdateOne({"_id": f"user:{document['user_id']}"},
+                       {"$set": document, "$setOnInsert": {"created_at": now, "is_deleted": False}}, upsert=True)
+             for document in documents], ordered=False)
+        token_revocation_list.apply(documents)
+        for user_id in user_ids:
+            verified_token_cache.evict_user(user_id)
+
+    @classmethod
+    async def changed_since(cls, db: AsyncIOMotorDatabase, since: Optional[datetime]) -> List[dict]:
+        query = {"updated_at": {"$gt": since}} if since is not None else {}
+        cursor = db.get_collection(cls.collection_name()).find(
+            query, {"user_id": 1, "jti": 1, "not_before": 1, "expires_at": 1, "updated_at": 1}).sort("updated_at", 1)
+        return await cursor.to_list(length=None)
@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import List
+
+from pymongo import ASCENDING, IndexModel
+
+from core.metrics import timed_stage
+from models.sessions import SessionsModel
+from repositories.base_repository import BaseRepository
+
+
+class SessionsRepository(BaseRepository[SessionsModel]):
+    _entity_model = SessionsModel
+    _indexes = [
+        IndexModel([("family_id", ASCENDING)], name="family_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+    _query_shapes = [
+        ({"family_id": "", "token_hash": "", "expires_at": {"$gt": ""}}, None),
+        ({"family_id": ""}, None),
+        ({"user_id": ""}, None),
+        ({"user_id": {"$in": [""]}}, None),
+    ]
+
+    @timed_stage("mongo.rotate_session")
+    async def rotate(self, family_id: str, token_hash: str, new_token_hash: str, expires_at: datetime) -> bool:
+        # Single atomic compare-and-swap on the small session document, the users collection is not touched
+        now = datetime.utcnow()
+        session = await self.collection.find_one_and_update(
+            {"family_id": family_id, "token_hash": token_hash, "expires_at": {"$gt": now}},
+            {"$set": {"token_hash": new_token_hash, "expires_at": expires_at, "updated_at": now}},
+            projection={"_id": 1})
+        return session is not None
+
+    @timed_stage("mongo.revoke_session_family")
+    async def revoke_family(self, family_id: str) -> None:
+        self.api_response.logger.info("Revoking session family")
+        await self.collection.delete_one({"family_id": family_id})
+
+    @timed_stage("mongo.revoke_user_sessions")
+    async def revoke_user_sessions(self, user_id: str) -> int:
+        self.api_response.logger.info("Revoking user sessions")
+        result = await self.collection.delete_many({"user_id": user_id})
+        return result.deleted_count
+
+    @timed_stage("mongo.revoke_users_sessions")
+    async def revoke_users_sessions(self, user_ids: List[str]) -> int:
+        if not user_ids:
+            return 0
+        self.api_response.logger.info("Revoking sessions of users")
+        result = await self.collection.delete_many({"user_id": {"$in": user_ids}})
+        return result.deleted_count
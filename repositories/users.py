@@ -1,36 +1,68 @@
-from typing import Union
+from typing import Union, List, Set, Tuple
 
 from pydantic import EmailStr
+from pymongo import ASCENDING, IndexModel
 
 from core.errors import NotAvailableError, InvalidCredentialsError
+from core.metrics import timed_stage
 from models.responde_model import LocationError
-from models.users import UsersModel
-from repositories.base_repository import BaseRepository, DBModel
+from models.users import UsersModel, UserCredentials
+from repositories.base_repository import BaseRepository, projection_for, search_indexes, search_query_shapes
 
 
 class UsersRepository(BaseRepository[UsersModel]):
     _entity_model = UsersModel
+    _cached = True
+    _search_fields = ["username", "full_name"]
+    _indexes = [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True,
+                   partialFilterExpression={"is_deleted": False}),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True,
+                   partialFilterExpression={"is_deleted": False}),
+    ] + search_indexes(_search_fields)
+    _query_shapes = BaseRepository._query_shapes + [
+        ({"username": "", "is_deleted": False}, None),
+        ({"email": "", "is_deleted": False}, None),
+        ({"$or": [{"username": ""}, {"email": ""}], "is_deleted": False}, None),
+        ({"$or": [{"username": {"$in": [""]}}, {"email": {"$in": [""]}}], "is_deleted": False}, None),
+    ] + search_query_shapes(_search_fields)
 
+    @timed_stage("mongo.username_available")
     async def username_available(self, username: str, raise_exception: bool = True) -> None:
         self.api_response.logger.info("Checking availability")
-        username = await self.collection.find_one({'username': username})
+        username = await self.collection.find_one({'username': username, 'is_deleted': False})
         if username and raise_exception:
             raise NotAvailableError(message=f"The user {username} is not available, it already exists",
                                     location=LocationError.Body)
 
+    @timed_stage("mongo.email_available")
     async def email_available(self, email: EmailStr, raise_exception: bool = True) -> None:
         self.api_response.logger.info("Checking availability")
-        user = await self.collection.find_one({'email': email})
+        user = await self.collection.find_one({'email': email, 'is_deleted': False})
         if user and raise_exception:
             raise NotAvailableError(message=f'The email {email} is not available, it already exists',
                                     location=LocationError.Body)
 
-    async def confirm_if_username_or_email_exists(self, username_or_email: Union[str, EmailStr],
-                                                  raise_exception: bool = True) -> None:
-        user = await self.collection.find_one({"$or": [{'username': username_or_email}, {'email': username_or_email}]})
-        if not user and raise_exception:
-            raise InvalidCredentialsError(message="Invalid credentials", location=LocationError.Body)
+    @timed_stage("mongo.get_credentials")
+    async def get_credentials(self, username_or_email: Union[str, EmailStr],
+                              raise_exception: bool = True) -> UserCredentials | None:
+        self.api_response.logger.info("Getting credentials from database")
+        user = await self.collection.find_one({"$or": [{'username': username_or_email}, {'email': username_or_email}],
+                                               "is_deleted": False}, projection_for(UserCredentials))
+        if not user:
+            if raise_exception:
+                raise InvalidCredentialsError(message="Invalid credentials", location=LocationError.Body)
+            return None
+        return UserCredentials.model_validate(user)
 
-    async def get_by_username_or_email(self, username_or_email: Union[str, EmailStr]) -> DBModel:
-        user = await self.collection.find_one({"$or": [{'username': username_or_email}, {'email': username_or_email}]})
-        return self._entity_model.model_validate(user)
+    @timed_stage("mongo.unavailable_usernames_and_emails")
+    async def unavailable_usernames_and_emails(self, usernames: List[str],
+                                               emails: List[EmailStr]) -> Tuple[Set[str], Set[str]]:
+        self.api_response.logger.info("Checking availability of several users")
+        cursor = self.collection.find({"$or": [{"username": {"$in": usernames}}, {"email": {"$in": emails}}],
+                                       "is_deleted": False}, {"username": 1, "email": 1, "_id": 0})
+        unavailable_usernames, unavailable_emails = set(), set()
+        async for user in cursor:
+            unavailable_usernames.add(user["username"])
+            unavailable_emails.add(user["email"])
+        return unavailable_usernames, unavailable_emails
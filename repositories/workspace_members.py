@@ -0,0 +1,156 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Iterable
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+
+from core.errors import NotAvailableError, NotFoundError, ForbiddenError
+from core.metrics import timed_stage
+from models.responde_model import LocationError
+from models.workspace_members import WorkspaceMembersModel, WorkspaceRole
+from repositories.base_repository import BaseRepository
+from repositories.workspaces import WorkspacesRepository
+
+
+class WorkspaceMembersRepository(BaseRepository[WorkspaceMembersModel]):
+    _entity_model = WorkspaceMembersModel
+    # One index per direction of the many-to-many, each also serves the keyset pagination over the other id
+    _indexes = [
+        IndexModel([("user_id", ASCENDING), ("workspace_id", ASCENDING)], name="user_workspace_unique",
+                   unique=True, partialFilterExpression={"is_deleted": False}),
+        IndexModel([("workspace_id", ASCENDING), ("user_id", ASCENDING)], name="workspace_user"),
+    ]
+    _query_shapes = BaseRepository._query_shapes + [
+        ({"user_id": "", "workspace_id": "", "is_deleted": False}, None),
+        ({"user_id": "", "is_deleted": False}, [("workspace_id", ASCENDING)]),
+        ({"workspace_id": "", "is_deleted": False}, [("user_id", ASCENDING)]),
+        ({"workspace_id": {"$in": [""]}}, None),
+        ({"user_id": "", "workspace_id": {"$in": [""]}, "is_deleted": False}, None),
+        ({"user_id": {"$in": [""]}, "role": WorkspaceRole.Owner, "is_deleted": False}, None),
+        ({"workspace_id": {"$in": [""]}, "user_id": {"$nin": [""]}, "is_deleted": False}, None),
+        ({"user_id": {"$in": [""]}, "is_deleted": False}, None),
+    ]
+
+    @timed_stage("mongo.add_member")
+    async def add_member(self, workspace_id: str, user_id: str, role: WorkspaceRole) -> WorkspaceMembersModel:
+        try:
+            return await self.create({"workspace_id": workspace_id, "user_id": user_id, "role": role})
+        except NotAvailableError:
+            raise NotAvailableError(message=f"The user {user_id} is already a member of the workspace",
+                                    location=LocationError.Body)
+
+    @timed_stage("mongo.get_membership")
+    async def get_membership(self, workspace_id: str, user_id: str,
+                             raise_exception: bool = True) -> WorkspaceMembersModel | None:
+        self.api_response.logger.info("Getting membership from database")
+        membership = await self.collection.find_one({"user_id": user_id, "workspace_id": workspace_id,
+                                                     "is_deleted": False})
+        if not membership:
+            if raise_exception:
+                raise NotFoundError(message="Membership not found", location=LocationError.Path)
+            return None
+        return WorkspaceMembersModel.model_validate(membership)
+
+    async def check_role(self, workspace_id: str, user_id: str, roles: Iterable[WorkspaceRole]) -> WorkspaceRole:
+        # Served by the (user_id, workspace_id) index, a single document whatever the number of memberships
+        membership = await self.get_membership(workspace_id, user_id, raise_exception=False)
+        if membership is None or membership.role not in roles:
+            raise ForbiddenError(message="Access denied: Your role does not allow this action",
+                                 location=LocationError.Headers)
+        return membership.role
+
+    @timed_stage("mongo.get_roles")
+    async def get_roles(self, workspace_ids: List[str], user_id: str) -> Dict[str, WorkspaceRole]:
+        # Bulk counterpart of check_role, one $in query on the (user_id, workspace_id) index for the whole batch
+        cursor = self.collection.find({"user_id": user_id, "workspace_id": {"$in": workspace_ids}, "is_deleted": False},
+                                      {"workspace_id": 1, "role": 1})
+        return {membership["workspace_id"]: WorkspaceRole(membership["role"]) async for membership in cursor}
+
+    @timed_stage("mongo.get_user_workspaces")
+    async def get_user_workspaces(self, user_id: str, limit: int,
+                                  after: Optional[str] = None) -> List[WorkspaceMembersModel]:
+        self.api_response.logger.info("Getting user workspaces from database")
+        query = {"user_id": user_id, "is_deleted": False}
+        if after is not None:
+            query["workspace_id"] = {"$gt": after}
+        cursor = self.collection.find(query).sort("workspace_id", ASCENDING).limit(limit).batch_size(limit)
+        return [WorkspaceMembersModel.model_validate(membership) for membership in await cursor.to_list(length=limit)]
+
+    @timed_stage("mongo.get_workspace_members")
+    async def get_workspace_members(self, workspace_id: str, limit: int,
+                                    after: Optional[str] = None) -> List[WorkspaceMembersModel]:
+        self.api_response.logger.info("Getting workspace members from database")
+        query = {"workspace_id": workspace_id, "is_deleted": False}
+        if after is not None:
+            query["user_id"] = {"$gt": after}
+        cursor = self.collection.find(query).sort("user_id", ASCENDING).limit(limit).batch_size(limit)
+        return [WorkspaceMembersModel.model_validate(membership) for membership in await cursor.to_list(length=limit)]
+
+    @timed_stage("mongo.remove_member")
+    async def remove_member(self, workspace_id: str, user_id: str) -> None:
+        self.api_response.logger.info("Removing member from database")
+        membership = await self.collection.find_one_and_delete({"user_id": user_id, "workspace_id": workspace_id,
+                                                                "is_deleted": False})
+        if not membership:
+            raise NotFoundError(message="Membership not found", location=LocationError.Path)
+
+    @timed_stage("mongo.remove_workspaces_members")
+    async def remove_workspaces_members(self, workspace_ids: List[str]) -> None:
+        await self.collection.delete_many({"workspace_id": {"$in": workspace_ids}})
+
+    @timed_stage("mongo.get_owned_workspaces")
+    async def get_owned_workspaces(self, user_ids: List[str]) -> List[str]:
+        cursor = self.collection.find({"user_id": {"$in": user_ids}, "role": WorkspaceRole.Owner, "is_deleted": False},
+                                      {"workspace_id": 1})
+        return [membership["workspace_id"] async for membership in cursor]
+
+    @timed_stage("mongo.transfer_ownership")
+    async def transfer_ownership(self, workspace_ids: List[str], leaving_user_ids: List[str]) -> List[str]:
+        # Each workspace goes to its oldest admin, or its oldest member, returns the workspaces nobody is left in
+        cursor = self.collection.find({"workspace_id": {"$in": workspace_ids}, "user_id": {"$nin": leaving_user_ids},
+                                       "is_deleted": False}, {"workspace_id": 1, "role": 1, "created_at": 1})
+        successors: Dict[str, dict] = {}
+        async for membership in cursor:
+            current = successors.get(membership["workspace_id"])
+            if current is None or self._succession_rank(membership) < self._succession_rank(current):
+                successors[membership["workspace_id"]] = membership
+        promoted = [membership["_id"] for membership in successors.values()
+                    if membership["role"] != WorkspaceRole.Owner]
+        if promoted:
+            await self.collection.update_many({"_id": {"$in": promoted}},
+                                              {"$set": {"role": WorkspaceRole.Owner, "updated_at": datetime.utcnow()}})
+        return [workspace_id for workspace_id in workspace_ids if workspace_id not in successors]
+
+    @staticmethod
+    def _succession_rank(membership: dict) -> tuple:
+        role = WorkspaceRole(membership["role"])
+        return role != WorkspaceRole.Owner, role != WorkspaceRole.Admin, membership["created_at"]
+
+    @timed_stage("mongo.remove_users_members")
+    async def remove_users_members(self, user_ids: List[str]) -> None:
+        # Soft deleted in line with the users, the unique membership index only covers live documents
+        await self.collection.update_many({"user_id": {"$in": user_ids}, "is_deleted": False},
+                                          {"$set": {"is_deleted": True, "updated_at": datetime.utcnow()}})
+
+    @classmethod
+    async def backfill_owners(cls, db: AsyncIOMotorDatabase, owner_id: str, batch_size: int = 1000) -> int:
+        # Workspaces created before memberships existed have no owner, nobody could update or delete them. Their
+        # creator was never recorded, the operator names the user that takes them over
+        members = db.get_collection(cls.collection_name())
+        owned = set(await members.distinct("workspace_id", {"role": WorkspaceRole.Owner, "is_deleted": False}))
+        created = 0
+        memberships = []
+        async for workspace in db.get_collection(WorkspacesRepository.collection_name()).find({"is_deleted": False},
+                                                                                              {"_id": 1}):
+            if workspace["_id"] in owned:
+                continue
+            memberships.append(cls.to_document(WorkspaceMembersModel(workspace_id=workspace["_id"], user_id=owner_id,
+                                                                     role=WorkspaceRole.Owner)))
+            if len(memberships) == batch_size:
+                await members.insert_many(memberships, ordered=False)
+                created += len(memberships)
+                memberships = []
+        if memberships:
+            await members.insert_many(memberships, ordered=False)
+            created += len(memberships)
+        return created
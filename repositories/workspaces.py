@@ -1,15 +1,38 @@
+from typing import List, Set
+
+from pymongo import ASCENDING, IndexModel
+
 from core.errors import NotAvailableError
+from core.metrics import timed_stage
 from models.responde_model import LocationError
 from models.workspaces import WorkspacesModel
-from repositories.base_repository import BaseRepository
+from repositories.base_repository import BaseRepository, search_indexes, search_query_shapes
 
 
 class WorkspacesRepository(BaseRepository[WorkspacesModel]):
     _entity_model = WorkspacesModel
+    _cached = True
+    _search_fields = ["workspace_name"]
+    _indexes = [
+        IndexModel([("workspace_name", ASCENDING)], name="workspace_name_unique", unique=True,
+                   partialFilterExpression={"is_deleted": False}),
+    ] + search_indexes(_search_fields)
+    _query_shapes = BaseRepository._query_shapes + [
+        ({"workspace_name": "", "is_deleted": False}, None),
+        ({"workspace_name": {"$in": [""]}, "is_deleted": False}, None),
+    ] + search_query_shapes(_search_fields)
 
+    @timed_stage("mongo.workspace_available")
     async def workspace_available(self, workspace_name: str, raise_exception: bool = True) -> None:
         self.api_response.logger.info("Checking availability")
-        workspace = await self.collection.find_one({"workspace_name": workspace_name})
+        workspace = await self.collection.find_one({"workspace_name": workspace_name, "is_deleted": False})
         if workspace and raise_exception:
             raise NotAvailableError(message=f"The workspace {workspace} is not available, it already exists",
                                     location=LocationError.Body)
+
+    @timed_stage("mongo.unavailable_workspace_names")
+    async def unavailable_workspace_names(self, workspace_names: List[str]) -> Set[str]:
+        self.api_response.logger.info("Checking availability of several workspaces")
+        cursor = self.collection.find({"workspace_name": {"$in": workspace_names}, "is_deleted": False},
+                                      {"workspace_name": 1, "_id": 0})
+        return {workspace["workspace_name"] async for workspace in cursor}
@@ -1,8 +1,9 @@
 import uuid
-from typing import Any
+from typing import Any, Optional
 
 from core.errors import BaseErrors
 from core.logger import logger_api
+from core.metrics import current_trace
 from models.responde_model import StatusRequest, ResponseErrors, ResponseModel
 
 
@@ -11,14 +12,17 @@ class ApiResponse:
         self._status = StatusRequest.OK
         self._data = None
         self._errors = []
-        self._process_id = str(uuid.uuid4())
+        # The request trace id doubles as process id so logs and stage timings can be correlated
+        trace = current_trace.get()
+        self._process_id = trace.process_id if trace is not None else str(uuid.uuid4())
         self._logger = logger_api(self._process_id)
 
-    def add_error(self, error: BaseErrors):
+    def add_error(self, error: BaseErrors, index: Optional[int] = None):
         self._errors.append(ResponseErrors(
             description=error.description,
             message=error.message,
             location=error.location,
+            index=index,
         ))
 
     @property
@@ -49,12 +53,19 @@ class ApiResponse:
     def data(self, data: Any):
         self._data = data
 
-    @property
-    def set_result(self):
-        response = ResponseModel(
+    def _build_result(self) -> ResponseModel:
+        return ResponseModel(
             status=self._status.value,
             data=self._data,
             errors=self._errors,
             process_id=self._process_id
-        ).model_dump()
+        )
+
+    @property
+    def set_result(self):
+        response = self._build_result().model_dump()
         return response
+
+    @property
+    def json_result(self) -> bytes:
+        return self._build_result().model_dump_json().encode()
@@ -0,0 +1,39 @@
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+from core.config import settings
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def run(host: str, port: int, workers: int) -> None:
+    # Workers are spawned, each one imports main and opens its own Motor client in the lifespan hook.
+    # On SIGTERM uvicorn stops accepting connections and drains in-flight requests before the lifespan
+    # shutdown closes the client.
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        backlog=settings.SERVER_BACKLOG,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or os.cpu_count() or 1)
+    arguments = parser.parse_args()
+    run(arguments.host, arguments.port, arguments.workers)
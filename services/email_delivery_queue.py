@@ -0,0 +1,142 @@
+import asyncio
+import smtplib
+from email.mime.text import MIMEText
+from typing import Dict, List, Tuple, Optional
+
+from core.config import settings
+from core.errors import ServiceUnavailableError
+from core.logger import logger_api
+from core.metrics import stage_timer
+from models.responde_model import LocationError
+
+QueuedEmail = Tuple[MIMEText, int]
+
+
+class SmtpConnection:
+    def __init__(self):
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        if settings.SMTP_USE_TLS:
+            server.starttls()
+            server.ehlo()
+        if settings.SMTP_PASSWORD:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
+
+    def send_batch(self, batch: List[QueuedEmail]) -> Tuple[List[QueuedEmail], List[Tuple[QueuedEmail, Exception]],
+                                                             Optional[Exception]]:
+        # Runs in a worker thread, returns the emails that still have to be delivered and the ones a retry can not fix
+        failed = []
+        rejected = []
+        last_error = None
+        for index, queued_email in enumerate(batch):
+            message, _ = queued_email
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                self._server.sendmail(settings.SMTP_USERNAME, message['To'], message.as_bytes())
+            except smtplib.SMTPRecipientsRefused as error:
+                failed.append(queued_email)
+                last_error = error
+            except (smtplib.SMTPException, OSError) as error:
+                # The connection is no longer usable, the rest of the batch is retried on a new one
+                self.close()
+                return failed + batch[index:], rejected, error
+            except Exception as error:
+                # The message itself can not be sent, e.g. a non ASCII address smtplib can not encode
+                self.close()
+                rejected.append((queued_email, error))
+        return failed, rejected, last_error
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+
+class EmailDeliveryQueue:
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._connections: List[SmtpConnection] = []
+        self._workers: List[asyncio.Task] = []
+        self._retries: Dict[QueuedEmail, asyncio.TimerHandle] = {}
+        self._logger = logger_api("email-delivery")
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.SMTP_QUEUE_MAX_SIZE)
+        self._connections = [SmtpConnection() for _ in range(settings.SMTP_POOL_SIZE)]
+        self._workers = [asyncio.create_task(self._worker(connection)) for connection in self._connections]
+        self._logger.info(f"Email delivery started with {settings.SMTP_POOL_SIZE} SMTP connections")
+
+    async def stop(self) -> None:
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.SMTP_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._logger.error(f"Email delivery stopped with {self._queue.qsize()} pending emails")
+        for (message, attempt), handle in self._retries.items():
+            handle.cancel()
+            self._logger.error(f"Email to {message['To']} dropped at shutdown, retry {attempt + 1} was pending")
+        self._retries = {}
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for connection in self._connections:
+            await asyncio.to_thread(connection.close)
+        self._workers = []
+        self._connections = []
+        self._queue = None
+
+    def enqueue(self, message: MIMEText) -> None:
+        if self._queue is None:
+            raise ServiceUnavailableError(message="Email delivery is not running", location=LocationError.Server)
+        try:
+            self._queue.put_nowait((message, 0))
+        except asyncio.QueueFull:
+            raise ServiceUnavailableError(message="Too many pending emails, try again later",
+                                          location=LocationError.Server)
+
+    def _retry(self, queued_email: QueuedEmail) -> None:
+        self._retries.pop(queued_email, None)
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(queued_email)
+        except asyncio.QueueFull:
+            self._logger.error(f"Email to {queued_email[0]['To']} dropped, delivery queue is full")
+
+    async def _worker(self, connection: SmtpConnection) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < settings.SMTP_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                with stage_timer("smtp.send_batch"):
+                    failed, rejected, error = await asyncio.to_thread(connection.send_batch, batch)
+                for (message, _), message_error in rejected:
+                    self._logger.error(f"Email to {message['To']} dropped, it can not be sent: {message_error!r}")
+                for message, attempt in failed:
+                    if attempt + 1 >= settings.SMTP_MAX_RETRIES:
+                        self._logger.error(f"Email to {message['To']} dropped after {attempt + 1} attempts: {error}")
+                        continue
+                    delay = settings.SMTP_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                    self._logger.error(f"Email to {message['To']} failed, retrying in {delay}s: {error}")
+                    queued_email = (message, attempt + 1)
+                    self._retries[queued_email] = loop.call_later(delay, self._retry, queued_email)
+            except Exception as error:
+                # The worker outlives any single batch, a dead worker would stop delivery for good
+                self._logger.error(f"Email batch of {len(batch)} dropped: {error!r}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+email_delivery_queue = EmailDeliveryQueue()
@@ -1,44 +1,67 @@
-import smtplib
 from email.mime.text import MIMEText
+from typing import Dict, Iterable, Iterator, Tuple
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment
 from pydantic import EmailStr
 
 from core.config import settings
+from core.errors import ServiceUnavailableError
+from services.email_delivery_queue import email_delivery_queue
+
+# user id, email, verification token and full name of each recipient
+VerificationRecipient = Tuple[str, EmailStr, str, str]
 
 
 class EmailSendingService:
-    def __init__(self):
-        self.server = settings.SMTP_SERVER
-        self.port = settings.SMTP_PORT
+    def __init__(self, env: Environment):
         self.username = settings.SMTP_USERNAME
-        self.password = settings.SMTP_PASSWORD
-        self.env = Environment(loader=FileSystemLoader('templates'))
+        self.env = env
+        self.reset_password_template = self.env.get_template('email_to_reset_password.html')
+        self.verify_user_template = self.env.get_template('email_to_verify_user.html')
 
-    async def send_email_to_reset_password(self, user_id: str, email: EmailStr, token: str,
-                                           user_fullname: str) -> MIMEText:
-        url = f'https://joker_task/reset-password/id={user_id}&token={token}'
-        template = self.env.get_template('email_to_reset_password.html')
-        html_content = template.render(name=user_fullname, url=url)
+    def _build_message(self, html_content: str, subject: str, email: EmailStr) -> MIMEText:
         message = MIMEText(html_content, "html")
-        message['Subject'] = "Reset Password"
+        message['Subject'] = subject
+        message['From'] = self.username
         message['To'] = email
+        return message
+
+    def render_reset_password(self, user_id: str, email: EmailStr, token: str, user_fullname: str) -> MIMEText:
+        url = f'https://joker_task/reset-password/id={user_id}&token={token}'
+        html_content = self.reset_password_template.render(name=user_fullname, url=url)
+        return self._build_message(html_content, "Reset Password", email)
+
+    def render_verify_user(self, user_id: str, email: EmailStr, token: str, user_fullname: str) -> MIMEText:
+        url = f'https://joker_task/verify-user/id={user_id}&token={token}'
+        html_content = self.verify_user_template.render(name=user_fullname, url=url)
+        return self._build_message(html_content, "User verification", email)
+
+    def render_verify_users(self, recipients: Iterable[VerificationRecipient]) -> Iterator[MIMEText]:
+        for user_id, email, token, user_fullname in recipients:
+            yield self.render_verify_user(user_id, email, token, user_fullname)
+
+    async def send_email_to_reset_password(self, user_id: str, email: EmailStr, token: str,
+                                           user_fullname: str) -> MIMEText:
+        message = self.render_reset_password(user_id, email, token, user_fullname)
         await self._send_email(message)
+        return message
 
     async def send_email_to_verify_user(self, user_id: str, email: EmailStr, token: str,
                                         user_fullname: str) -> MIMEText:
-        url = f'https://joker_task/verify-user/id={user_id}&token={token}'
-        template = self.env.get_template('email_to_verify_user.html')
-        html_content = template.render(name=user_fullname, url=url)
-        message = MIMEText(html_content, "html")
-        message['Subject'] = "User verification"
-        message['To'] = email
+        message = self.render_verify_user(user_id, email, token, user_fullname)
         await self._send_email(message)
+        return message
+
+    async def send_emails_to_verify_users(
+            self, recipients: Iterable[VerificationRecipient]) -> Dict[int, ServiceUnavailableError]:
+        # The users already exist when their emails are queued, a failed enqueue is returned by recipient position
+        errors = {}
+        for position, message in enumerate(self.render_verify_users(recipients)):
+            try:
+                await self._send_email(message)
+            except ServiceUnavailableError as error:
+                errors[position] = error
+        return errors
 
     async def _send_email(self, message: MIMEText):
-        mailServer = smtplib.SMTP(self.server, self.port)
-        mailServer.starttls()
-        mailServer.ehlo()
-        mailServer.login(self.username, self.password)
-        mailServer.sendmail(self.username, message['To'], message.as_string())
-        mailServer.close()
+        email_delivery_queue.enqueue(message)
@@ -0,0 +1,31 @@
+import argparse
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, ModuleLoader
+
+from core.config import settings
+
+TEMPLATES_DIR = 'templates'
+
+
+def build_template_environment() -> Environment:
+    # Templates compiled ahead of time with `python -m services.email_templates` skip parsing entirely
+    if settings.EMAIL_TEMPLATES_COMPILED_DIR:
+        loader = ModuleLoader(settings.EMAIL_TEMPLATES_COMPILED_DIR)
+    else:
+        loader = FileSystemLoader(TEMPLATES_DIR)
+    bytecode_cache = None
+    if settings.EMAIL_TEMPLATES_BYTECODE_CACHE_DIR:
+        bytecode_cache = FileSystemBytecodeCache(settings.EMAIL_TEMPLATES_BYTECODE_CACHE_DIR)
+    return Environment(loader=loader, bytecode_cache=bytecode_cache, auto_reload=False)
+
+
+def compile_templates(target: str) -> None:
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+    env.compile_templates(target, zip=None, filter_func=lambda name: name.endswith('.html'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the email templates into Python modules")
+    parser.add_argument("target", help="Directory where the compiled templates are written")
+    arguments = parser.parse_args()
+    compile_templates(arguments.target)
@@ -0,0 +1,8 @@
+import os
+
+# core.config reads the required settings at import time, the values only have to be valid
+for name, value in {"ENV": "test", "DB_CONNECTION": "mongodb://localhost:27017", "DB_NAME": "joker_task_test",
+                    "SECRET_KEY": "test-secret", "SECRET_KEY_REFRESH": "test-secret-refresh",
+                    "SMTP_SERVER": "localhost", "SMTP_PORT": "8025", "SMTP_USERNAME": "test@example.com",
+                    "SMTP_PASSWORD": ""}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from core.errors import BaseErrors, InvalidTokenError, NotFoundError, TooManyRequestsError, UnauthorizedError
+from models.responde_model import LocationError, ResponseErrors, ResponseModel, StatusRequest
+from utils.error_registry import error_metadata, render_error
+
+
+def expected_body(error: BaseErrors, process_id: str) -> dict:
+    return ResponseModel(status=str(error.status), errors=[
+        ResponseErrors(description=error.description, message=error.message, location=error.location)],
+        process_id=process_id).model_dump(mode="json")
+
+
+@pytest.mark.parametrize("error", [
+    NotFoundError(message="User not found", location=LocationError.Path),
+    UnauthorizedError(message="Token has been revoked", location=LocationError.Headers),
+    InvalidTokenError(message='Invalid "token" \\ ñ', location=LocationError.Body),
+    TooManyRequestsError(message="Try again later", location=LocationError.Body),
+])
+def test_render_error_matches_response_model(error):
+    status_code, content = render_error(error, "process-1")
+    assert status_code == error.status.code
+    assert json.loads(content) == expected_body(error, "process-1")
+
+
+def test_error_metadata_is_cached_per_class():
+    assert error_metadata(NotFoundError) is error_metadata(NotFoundError)
+    assert error_metadata(NotFoundError) is not error_metadata(UnauthorizedError)
+
+
+def test_plain_base_error_uses_instance_status():
+    assert error_metadata(BaseErrors) is None
+    error = BaseErrors(status=StatusRequest.CONFLICT, description="Conflict", message="Stale document",
+                       location=LocationError.Body)
+    status_code, content = render_error(error, "process-2")
+    assert status_code == 409
+    assert json.loads(content) == expected_body(error, "process-2")
+
+
+def test_instance_overriding_class_status_is_not_rendered_from_template():
+    error = NotFoundError(message="Gone", location=LocationError.Path)
+    error.status = StatusRequest.FORBIDDEN
+    status_code, content = render_error(error, "process-3")
+    assert status_code == 403
+    assert json.loads(content)["status"] == "FORBIDDEN"
@@ -0,0 +1,137 @@
+import asyncio
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from core import rate_limiter
+from core.config import settings
+from core.errors import TooManyRequestsError
+from core.rate_limiter import InMemoryRateLimitBackend, LoginRateLimiter, RedisRateLimitBackend, locked_until, \
+    lockout_seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(time=lambda: now[0], monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    for name, value in {"LOGIN_RATE_WINDOW_SECONDS": 60, "LOGIN_MAX_ATTEMPTS_PER_IP": 3,
+                        "LOGIN_MAX_ATTEMPTS_PER_ACCOUNT": 2, "BULK_SIGNUP_MAX_REQUESTS_PER_IP": 1,
+                        "LOGIN_LOCKOUT_THRESHOLD": 5, "LOGIN_LOCKOUT_BASE_SECONDS": 2,
+                        "LOGIN_LOCKOUT_MAX_SECONDS": 900}.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_lockout_seconds_doubles_past_threshold(limits):
+    assert lockout_seconds(4) == 0
+    assert lockout_seconds(5) == 2
+    assert lockout_seconds(7) == 8
+    assert lockout_seconds(10_000) == 900
+
+
+def test_locked_until(limits):
+    last_failure = datetime(2024, 1, 1)
+    assert locked_until(4, last_failure) is None
+    assert locked_until(6, last_failure) == last_failure + timedelta(seconds=4)
+
+
+def test_in_memory_backend_counts_hits_in_window(clock):
+    backend = InMemoryRateLimitBackend(4, 100)
+    assert [asyncio.run(backend.hit("key", 60)) for _ in range(3)] == [1, 2, 3]
+    assert asyncio.run(backend.hit("other", 60)) == 1
+
+
+def test_in_memory_backend_slides_previous_window(clock):
+    backend = InMemoryRateLimitBackend(4, 100)
+    clock[0] = 600.0
+    for _ in range(10):
+        asyncio.run(backend.hit("key", 60))
+    clock[0] = 690.0
+    # Half way through the next window, half of the previous hits still count
+    assert asyncio.run(backend.hit("key", 60)) == 6
+    clock[0] = 780.0
+    assert asyncio.run(backend.hit("key", 60)) == 1
+
+
+def test_in_memory_backend_evicts_expired_keys_first(clock):
+    backend = InMemoryRateLimitBackend(1, 2)
+    asyncio.run(backend.hit("old", 60))
+    clock[0] += 180
+    asyncio.run(backend.hit("a", 60))
+    asyncio.run(backend.hit("b", 60))
+    asyncio.run(backend.hit("a", 60))
+    assert asyncio.run(backend.hit("a", 60)) == 3
+    assert asyncio.run(backend.hit("b", 60)) == 2
+
+
+def test_check_rejects_past_account_and_ip_limits(clock, limits):
+    limiter = LoginRateLimiter(InMemoryRateLimitBackend(4, 100))
+    for _ in range(2):
+        asyncio.run(limiter.check("10.0.0.1", "joker"))
+    with pytest.raises(TooManyRequestsError):
+        asyncio.run(limiter.check("10.0.0.1", "joker"))
+    with pytest.raises(TooManyRequestsError):
+        asyncio.run(limiter.check("10.0.0.1", "batman"))
+    asyncio.run(limiter.check("10.0.0.2", "batman"))
+    assert limiter.rejected == 2
+
+
+def test_check_bulk_signup_limits_by_address(clock, limits):
+    limiter = LoginRateLimiter(InMemoryRateLimitBackend(4, 100))
+    asyncio.run(limiter.check_bulk_signup("10.0.0.1"))
+    with pytest.raises(TooManyRequestsError):
+        asyncio.run(limiter.check_bulk_signup("10.0.0.1"))
+    asyncio.run(limiter.check_bulk_signup("10.0.0.2"))
+    asyncio.run(limiter.check_bulk_signup(None))
+    asyncio.run(limiter.check_bulk_signup(None))
+
+
+def test_lockout_is_remembered_until_it_expires(clock, limits):
+    limiter = LoginRateLimiter(InMemoryRateLimitBackend(4, 100))
+    lockout = datetime.utcfromtimestamp(clock[0] + 30)
+    with pytest.raises(TooManyRequestsError):
+        limiter.check_lockout("joker", lockout)
+    # Later guesses are rejected before the login attempt lookup
+    with pytest.raises(TooManyRequestsError):
+        asyncio.run(limiter.check(None, "joker"))
+    clock[0] += 31
+    asyncio.run(limiter.check(None, "joker"))
+    limiter.check_lockout("joker", None)
+
+
+def test_forget_drops_the_lockout(clock, limits):
+    limiter = LoginRateLimiter(InMemoryRateLimitBackend(4, 100))
+    limiter.remember_lockout("joker", datetime.utcfromtimestamp(clock[0] + 30))
+    asyncio.run(limiter.forget("joker"))
+    asyncio.run(limiter.check(None, "joker"))
+
+
+def test_in_memory_backend_always_reports_failures(limits):
+    # Failures on other workers are invisible here, the login attempt record has to be read every time
+    limiter = LoginRateLimiter(InMemoryRateLimitBackend(4, 100))
+    assert asyncio.run(limiter.has_failures("joker"))
+    asyncio.run(limiter.forget("joker"))
+    assert asyncio.run(limiter.has_failures("joker"))
+
+
+def test_redis_backend_shares_failure_hint_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first = LoginRateLimiter(RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server)))
+    second = LoginRateLimiter(RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server)))
+
+    async def scenario():
+        assert not await second.has_failures("joker")
+        await first.remember_failure("joker")
+        assert await second.has_failures("joker")
+        await second.forget("joker")
+        assert not await first.has_failures("joker")
+        assert await first._backend.hit("key", 60) == 1
+        assert await second._backend.hit("key", 60) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import sys
+
+import bson
+
+from utils.search import prefix_upper_bound, normalize_search_key
+
+
+def test_prefix_upper_bound_increments_last_code_point():
+    assert prefix_upper_bound("abc") == "abd"
+    assert prefix_upper_bound("joker") > "joker\U0010ffff"
+
+
+def test_prefix_upper_bound_strips_last_code_point():
+    assert prefix_upper_bound("a" + chr(sys.maxunicode)) == "b"
+    assert prefix_upper_bound("a" + chr(sys.maxunicode) * 3) == "b"
+
+
+def test_prefix_upper_bound_without_bound():
+    assert prefix_upper_bound(chr(sys.maxunicode)) is None
+    assert prefix_upper_bound(chr(sys.maxunicode) * 2) is None
+
+
+def test_prefix_upper_bound_skips_surrogates():
+    bound = prefix_upper_bound("a\ud7ff")
+    assert bound == "a\ue000"
+    bson.encode({"$lt": bound})
+
+
+def test_prefix_upper_bound_orders_like_bson_bytes():
+    for prefix in ("a", "a\ud7ff", "é", "z" + chr(sys.maxunicode)):
+        bound = prefix_upper_bound(prefix)
+        assert prefix.encode() < bound.encode()
+        assert (prefix + chr(sys.maxunicode)).encode() < bound.encode()
+
+
+def test_normalize_search_key():
+    assert normalize_search_key("  José   Núñez ") == "jose nunez"
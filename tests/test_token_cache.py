@@ -0,0 +1,65 @@
+import time
+
+from core.token_cache import VerifiedTokenCache
+from models.users import TokenData
+
+
+def token_data(user_id="user-1") -> TokenData:
+    return TokenData(id=user_id, username=user_id, full_name=user_id, email=f"{user_id}@example.com")
+
+
+def test_get_returns_cached_token_data():
+    cache = VerifiedTokenCache(10)
+    cache.put("token", token_data(), time.time() + 60)
+    assert cache.get("token").id == "user-1"
+    assert cache.get("other") is None
+    assert cache.stats == {"size": 1, "max_size": 10, "hits": 1, "misses": 1}
+
+
+def test_expired_entries_are_dropped():
+    cache = VerifiedTokenCache(10)
+    cache.put("token", token_data(), time.time() - 1)
+    assert cache.get("token") is None
+    assert cache.stats["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerifiedTokenCache(2)
+    expires_at = time.time() + 60
+    cache.put("first", token_data("user-1"), expires_at)
+    cache.put("second", token_data("user-2"), expires_at)
+    cache.get("first")
+    cache.put("third", token_data("user-3"), expires_at)
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+
+def test_evict_user_drops_all_their_tokens():
+    cache = VerifiedTokenCache(10)
+    expires_at = time.time() + 60
+    cache.put("first", token_data("user-1"), expires_at)
+    cache.put("second", token_data("user-1"), expires_at)
+    cache.put("other", token_data("user-2"), expires_at)
+    cache.evict_user("user-1")
+    assert cache.get("first") is None
+    assert cache.get("second") is None
+    assert cache.get("other") is not None
+    cache.evict_user("unknown")
+
+
+def test_evicted_entry_is_forgotten_for_its_user():
+    cache = VerifiedTokenCache(1)
+    expires_at = time.time() + 60
+    cache.put("first", token_data("user-1"), expires_at)
+    cache.put("second", token_data("user-2"), expires_at)
+    cache.evict_user("user-2")
+    assert cache.stats["size"] == 0
+    assert cache._digests_by_user == {}
+
+
+def test_zero_size_disables_the_cache():
+    cache = VerifiedTokenCache(0)
+    cache.put("token", token_data(), time.time() + 60)
+    assert cache.get("token") is None
+    assert cache.stats["size"] == 0
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.errors import UnauthorizedError
+from core.token_revocation import TokenRevocationList
+from models.users import TokenData
+
+
+def token(jti=None, iat=0.0, user_id="user-1") -> TokenData:
+    return TokenData(id=user_id, username="joker", full_name="Joker", email="joker@example.com", jti=jti, iat=iat)
+
+
+def revoked_token(jti, updated_at, expires_in=3600) -> dict:
+    return {"jti": jti, "user_id": "user-1", "updated_at": updated_at,
+            "expires_at": datetime.utcnow() + timedelta(seconds=expires_in)}
+
+
+def revoked_user(user_id, not_before, updated_at, expires_in=3600) -> dict:
+    return {"user_id": user_id, "not_before": not_before, "updated_at": updated_at,
+            "expires_at": datetime.utcnow() + timedelta(seconds=expires_in)}
+
+
+def test_check_rejects_revoked_jti():
+    revocations = TokenRevocationList()
+    revocations.apply([revoked_token("revoked", datetime.utcnow())])
+    with pytest.raises(UnauthorizedError):
+        revocations.check(token(jti="revoked"))
+    revocations.check(token(jti="other"))
+    revocations.check(token())
+    assert revocations.rejected == 1
+
+
+def test_check_rejects_tokens_issued_before_user_revocation():
+    revocations = TokenRevocationList()
+    now = datetime.utcnow()
+    revocations.apply([revoked_user("user-1", now, now)])
+    with pytest.raises(UnauthorizedError):
+        revocations.check(token(iat=time.time() - 60))
+    revocations.check(token(iat=time.time() + 1))
+    revocations.check(token(iat=time.time() - 60, user_id="user-2"))
+
+
+def test_apply_keeps_latest_user_revocation():
+    revocations = TokenRevocationList()
+    now = datetime.utcnow()
+    revocations.apply([revoked_user("user-1", now, now), revoked_user("user-1", now - timedelta(hours=1), now)])
+    with pytest.raises(UnauthorizedError):
+        revocations.check(token(iat=time.time() - 1))
+
+
+def test_sync_reads_from_cursor_minus_overlap(monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS", 5)
+    revocations = TokenRevocationList()
+    updated_at = datetime(2024, 1, 1, 12)
+    calls = []
+
+    async def loader(since):
+        calls.append(since)
+        return [revoked_token("first", updated_at)] if since is None else []
+
+    asyncio.run(revocations.sync(loader))
+    asyncio.run(revocations.sync(loader))
+    assert calls == [None, updated_at - timedelta(seconds=5)]
+    assert revocations.synced_at is not None
+
+
+def test_sync_purges_expired_entries():
+    revocations = TokenRevocationList()
+    now = datetime.utcnow()
+    documents = [revoked_token("expired", now, expires_in=-1), revoked_token("live", now),
+                 revoked_user("user-2", now, now, expires_in=-1)]
+
+    async def loader(since):
+        return documents if since is None else []
+
+    asyncio.run(revocations.sync(loader))
+    assert revocations.stats["revoked_tokens"] == 1
+    assert revocations.stats["revoked_users"] == 0
+    revocations.check(token(jti="expired"))
+    revocations.check(token(iat=time.time() - 60, user_id="user-2"))
+
+
+def test_failed_sync_keeps_periodic_sync_running(monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_SYNC_SECONDS", 0.01)
+    revocations = TokenRevocationList()
+    calls = []
+
+    async def loader(since):
+        calls.append(since)
+        if len(calls) == 2:
+            raise RuntimeError("mongo is down")
+        return [revoked_token(f"jti-{len(calls)}", datetime.utcnow())]
+
+    async def scenario():
+        await revocations.start(loader)
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+        await revocations.stop()
+
+    asyncio.run(scenario())
+    with pytest.raises(UnauthorizedError):
+        revocations.check(token(jti="jti-3"))
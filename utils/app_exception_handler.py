@@ -1,45 +1,22 @@
-from fastapi import Request
-from fastapi.responses import JSONResponse
+import uuid
 
-from core.errors import UnauthorizedError, InvalidTokenError, InvalidCredentialsError, InvalidParameterError
-from schemas.api_response import ApiResponse
+from fastapi import Request, Response
 
+from core.errors import BaseErrors
+from core.logger import logger_api
+from core.metrics import current_trace
+from utils.error_registry import render_error
 
-async def auth_validation_error_handler(request: Request, exception: UnauthorizedError):
-    api_response = ApiResponse()
-    api_response.status = exception.status
-    api_response.add_error(exception)
-    api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
 
-
-async def invalid_token_error_handler(request: Request, exception: InvalidTokenError):
-    api_response = ApiResponse()
-    api_response.status = exception.status
-    api_response.add_error(exception)
-    api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
-
-
-async def invalid_credentials_error_handler(request: Request, exception: InvalidCredentialsError):
-    api_response = ApiResponse()
-    api_response.status = exception.status
-    api_response.add_error(exception)
-    api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
-
-
-async def invalid_password_error_handler(request: Request, exception: InvalidParameterError):
-    api_response = ApiResponse()
-    api_response.status = exception.status
-    api_response.add_error(exception)
-    api_response.logger.error(exception)
-    return JSONResponse(content=api_response.set_result, status_code=exception.status.code)
+async def base_error_handler(request: Request, exception: BaseErrors):
+    trace = current_trace.get()
+    process_id = trace.process_id if trace is not None else str(uuid.uuid4())
+    logger_api(process_id).error(exception)
+    status_code, content = render_error(exception, process_id)
+    return Response(content=content, status_code=status_code, media_type="application/json")
 
 
+# Starlette resolves handlers through the exception MRO, so every BaseErrors subclass lands here
 app_exception_handler = {
-    UnauthorizedError: auth_validation_error_handler,
-    InvalidTokenError: invalid_token_error_handler,
-    InvalidCredentialsError: invalid_credentials_error_handler,
-    InvalidParameterError: invalid_password_error_handler,
+    BaseErrors: base_error_handler,
 }
@@ -0,0 +1,41 @@
+import functools
+import json
+from typing import Type, Tuple
+
+from core.errors import BaseErrors
+from models.responde_model import StatusRequest, LocationError
+
+
+def _json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class ErrorMetadata:
+    __slots__ = ("status", "description", "_body_prefix")
+
+    def __init__(self, status: StatusRequest, description: str):
+        self.status = status
+        self.description = description
+        # Same key order as ResponseModel / ResponseErrors
+        self._body_prefix = (b'{"status":' + _json(status.value) + b',"data":null,"errors":[{"description":' +
+                             _json(description) + b',"message":')
+
+    def render(self, message: str, location: LocationError, process_id: str) -> bytes:
+        return b"".join((self._body_prefix, _json(message), b',"location":', _json(str(location)),
+                         b',"index":null}],"process_id":', _json(process_id), b'}'))
+
+
+@functools.lru_cache(maxsize=None)
+def error_metadata(error_class: Type[BaseErrors]) -> ErrorMetadata | None:
+    status = getattr(error_class, "status", None)
+    if not isinstance(status, StatusRequest):
+        return None
+    return ErrorMetadata(status, error_class.description)
+
+
+def render_error(error: BaseErrors, process_id: str) -> Tuple[int, bytes]:
+    metadata = error_metadata(type(error))
+    if metadata is None or metadata.status is not error.status or metadata.description != error.description:
+        # Plain BaseErrors carry their status on the instance, they can not be prebuilt per class
+        metadata = ErrorMetadata(error.status, error.description)
+    return metadata.status.code, metadata.render(error.message, error.location, process_id)
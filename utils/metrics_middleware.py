@@ -0,0 +1,47 @@
+import time
+
+from core.config import settings
+from core.logger import logger_api
+from core.metrics import RequestTrace, current_trace, metrics_registry
+from models.responde_model import StatusRequest
+
+_STATUS_LABELS = {status.code: status.value for status in StatusRequest}
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware, the trace is visible to the endpoint, its dependencies and the stage timers
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        status_code = StatusRequest.INTERNAL_SERVER_ERROR.code
+        start = time.perf_counter()
+
+        async def send_with_trace(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-process-id", trace.process_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            duration = time.perf_counter() - start
+            current_trace.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            labels = (("route", path), ("method", scope["method"]),
+                      ("status", _STATUS_LABELS.get(status_code, str(status_code))))
+            metrics_registry.inc("http_requests_total", labels)
+            metrics_registry.observe("http_request_duration_seconds", labels, duration)
+            if duration >= settings.METRICS_SLOW_REQUEST_SECONDS:
+                stages = ", ".join(f"{stage}={stage_duration * 1000:.1f}ms" for stage, stage_duration in trace.stages)
+                logger_api(trace.process_id).warning(f"Slow request {scope['method']} {path} "
+                                                     f"took {duration * 1000:.1f}ms: {stages}")
@@ -2,60 +2,52 @@ import functools
 
 from fastapi import Request, Response
 
-from core.errors import InvalidParameterError, UnauthorizedError, ForbiddenError, NotFoundError, \
-    InvalidCredentialsError, UnExpectedError, InvalidTokenError, NotAvailableError
+from core.errors import BaseErrors, UnExpectedError
 from models.responde_model import LocationError
+from utils.error_registry import render_error
 
 
-def response_handler(raw_response: bool = False):
+def _json_response(content: bytes, status_code: int, response: Response) -> Response:
+    json_response = Response(content=content, status_code=status_code, media_type="application/json")
+    json_response.raw_headers.extend(response.raw_headers)
+    return json_response
+
+
+def response_handler(raw_response: bool = False, json_bytes: bool = True):
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(request: Request, response: Response, *args, **kwargs):
             api_response = kwargs.get("api_response")
+            error = None
             try:
                 result = await func(request, response, *args, **kwargs)
+                if isinstance(result, Response):
+                    return result
                 if result:
                     api_response.data = result
 
-            except InvalidParameterError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
-                api_response.logger.error(error)
-            except UnauthorizedError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
-                api_response.logger.error(error)
-            except ForbiddenError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
-                api_response.logger.error(error)
-            except NotFoundError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
-                api_response.logger.error(error)
-            except InvalidCredentialsError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
+            except BaseErrors as handled_error:
+                error = handled_error
                 api_response.logger.error(error)
-            except InvalidTokenError as error:
-                api_response.status = error.status
-                api_response.add_error(error)
-                api_response.logger.error(error)
-            except NotAvailableError as error:
+            except Exception as unexpected_error:
+                error = UnExpectedError(message=unexpected_error.__str__(), location=LocationError.Server)
+                api_response.logger.error(unexpected_error)
+
+            json_bytes_response = json_bytes and not raw_response
+            if error is not None and json_bytes_response:
+                status_code, content = render_error(error, api_response.process_id)
+                return _json_response(content, status_code, response)
+            if error is not None:
                 api_response.status = error.status
                 api_response.add_error(error)
-                api_response.logger.error(error)
-            except Exception as error:
-                unexpected_error = UnExpectedError(message=error.__str__(), location=LocationError.Server)
-                api_response.status = unexpected_error.status
-                api_response.add_error(unexpected_error)
-                api_response.logger.error(error)
 
             response.status_code = api_response.status.code
             if raw_response:
                 return api_response.data
-            else:
-                return api_response.set_result
+            if json_bytes_response:
+                # Returning a Response skips FastAPI's revalidation, the annotation still documents the endpoint
+                return _json_response(api_response.json_result, response.status_code, response)
+            return api_response.set_result
 
         return wrapper
 
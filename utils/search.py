@@ -0,0 +1,29 @@
+import sys
+import unicodedata
+from typing import List, Optional
+
+NGRAM_SIZE = 3
+SURROGATES = range(0xD800, 0xE000)
+
+
+def normalize_search_key(value: str) -> str:
+    # Case and accent insensitive, "José  Núñez" and "jose nunez" share the same key
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def search_ngrams(key: str) -> List[str]:
+    return sorted({key[index:index + NGRAM_SIZE] for index in range(len(key) - NGRAM_SIZE + 1)})
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    # Smallest string after every string starting with prefix, code point order is also the BSON byte order.
+    # The last code point can not be incremented, a prefix made only of it has no upper bound
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    if code_point in SURROGATES:
+        # Surrogates can not be encoded in UTF-8, U+E000 is the next code point BSON accepts
+        code_point = SURROGATES.stop
+    return prefix[:-1] + chr(code_point)
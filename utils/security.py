@@ -1,18 +1,63 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import bcrypt
 
-from core.errors import InvalidParameterError, UnauthorizedError
+from core.config import settings
+from core.errors import InvalidParameterError, UnauthorizedError, ServiceUnavailableError
+from core.metrics import stage_timer
 from models.responde_model import LocationError
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hashing_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending_hashing_jobs = 0
+
+
+def _reserve_hashing_jobs(count: int) -> None:
+    global _pending_hashing_jobs
+    if _pending_hashing_jobs + count > settings.PASSWORD_HASH_MAX_PENDING:
+        raise ServiceUnavailableError(message="Too many password operations in progress, try again later",
+                                      location=LocationError.Server)
+    _pending_hashing_jobs += count
+
+
+async def _run_reserved_hashing_job(func, *args):
+    global _pending_hashing_jobs
+    try:
+        loop = asyncio.get_running_loop()
+        with stage_timer("bcrypt"):
+            return await loop.run_in_executor(_hashing_executor, func, *args)
+    finally:
+        _pending_hashing_jobs -= 1
+
+
+async def _run_hashing_job(func, *args):
+    _reserve_hashing_jobs(1)
+    return await _run_reserved_hashing_job(func, *args)
+
 
 async def hash_password(password: str):
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    hashed = await _run_hashing_job(bcrypt.hashpw, password_bytes, salt)
     return hashed.decode('utf-8')
 
 
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    # The whole batch is reserved against the pending jobs limit up front, a batch the pool can not take gets the
+    # 503 before any hash starts instead of queueing ahead of logins
+    _reserve_hashing_jobs(len(passwords))
+    hashed = await asyncio.gather(*(_run_reserved_hashing_job(bcrypt.hashpw, password.encode('utf-8'),
+                                                              bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS))
+                                    for password in passwords))
+    return [password.decode('utf-8') for password in hashed]
+
+
 async def compare_password(hashed_password: str, plain_password: str) -> None:
-    if not bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8')):
+    password_matches = await _run_hashing_job(bcrypt.checkpw, plain_password.encode('utf-8'),
+                                              hashed_password.encode('utf-8'))
+    if not password_matches:
         raise InvalidParameterError(message="Invalid credentials", location=LocationError.Body)
 
 
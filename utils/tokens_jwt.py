@@ -1,4 +1,7 @@
+import hashlib
 import secrets
+import time
+import uuid
 from datetime import datetime, timedelta
 from enum import Enum
 
@@ -6,11 +9,13 @@ from jose import jwt, ExpiredSignatureError, JWTError
 
 from core.config import settings
 from core.errors import InvalidTokenError
+from core.metrics import timed_stage
+from core.signing_keys import signing_keys
 from models.responde_model import LocationError
 
-SECRET_KEY = settings.SECRET_KEY
+# Refresh tokens are only ever verified by this service, they keep a shared secret of their own
 SECRET_KEY_REFRESH = settings.SECRET_KEY_REFRESH
-ALGORITHM = "HS256"
+REFRESH_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
@@ -20,25 +25,34 @@ class TokenType(str, Enum):
     refresh_token = "refresh_token"
 
 
+@timed_stage("jwt.encode")
 async def create_token(data: dict, token_type: TokenType):
-    to_encode = data.copy()
+    # jti identifies a single token in the denylist, iat compares it with a user's revocation epoch
+    to_encode = {**data, "jti": uuid.uuid4().hex, "iat": time.time()}
     if token_type == TokenType.access_token:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        key = signing_keys.signing_key
+        encoded_jwt = jwt.encode(to_encode, key.private_key, algorithm=key.algorithm,
+                                 headers={"kid": key.kid} if key.kid is not None else None)
     if token_type == TokenType.refresh_token:
         expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY_REFRESH, algorithm=ALGORITHM)
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY_REFRESH, algorithm=REFRESH_ALGORITHM)
     return encoded_jwt
 
 
+@timed_stage("jwt.decode")
 async def decode_token(token: str, token_type: TokenType):
     try:
         if token_type == TokenType.access_token:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            key = signing_keys.verification_key(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise InvalidTokenError(message="Unknown signing key", location=LocationError.Headers)
+            # The algorithm comes from our key, never from the token header
+            payload = jwt.decode(token, key.public_key, algorithms=[key.algorithm])
         if token_type == TokenType.refresh_token:
-            payload = jwt.decode(token, SECRET_KEY_REFRESH, algorithms=[ALGORITHM])
+            payload = jwt.decode(token, SECRET_KEY_REFRESH, algorithms=[REFRESH_ALGORITHM])
         if not payload.get("id"):
             raise InvalidTokenError(message="Invalid token", location=LocationError.Headers)
         return payload
@@ -51,3 +65,8 @@ async def decode_token(token: str, token_type: TokenType):
 
 def create_random_token():
     return secrets.token_urlsafe()
+
+
+def hash_token(token: str) -> str:
+    # Signed tokens can not be guessed, a fast digest is enough to keep them out of the database
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()